@@ -0,0 +1,124 @@
+import argparse
+import time
+import numpy as np
+import torch
+from concurrent.futures import ThreadPoolExecutor
+from detector.model import SteganoDetector, set_threads, DETECT_BATCH_SIZE, DETECT_WORKERS
+
+# Inference modes compared by benchmark(), as SteganoDetector options;
+# the first one is the reference the deltas are measured against
+BENCHMARK_MODES = {
+    'eager': {},
+    'channels_last': {'channels_last': True},
+    'torchscript': {'script': True},
+    'dynamic_int8': {'quantize': 'dynamic'},
+    'static_int8': {'quantize': 'static'},
+    'static_int8_script': {'quantize': 'static', 'script': True},
+}
+
+def _spread(n, count):
+    """Up to count indices spread evenly over range(n) (covers every class folder)"""
+    return np.unique(np.linspace(0, n - 1, min(n, count)).astype(int)) if n else np.zeros(0, int)
+
+def benchmark(model_path, val_dir, modes=None, batch_size=DETECT_BATCH_SIZE, threads=None,
+              interop_threads=None, limit=256, calibration_size=32, latency_samples=32):
+    """
+    Compare inference modes on a labelled validation folder
+
+    Images are decoded and preprocessed once and shared by every mode, so
+    the timings cover the model alone.
+
+    Args:
+        model_path (str): Checkpoint to load for every mode
+        val_dir (str): Folder with clean/lsb/dct/dwt subfolders (as SteganoDataset)
+        modes (list): Names from BENCHMARK_MODES (default: all)
+        batch_size (int): Images per forward pass for the throughput run
+        threads (int): Intra-op CPU threads for every mode
+        interop_threads (int): Inter-op CPU threads for every mode
+        limit (int): Validation images used, spread across the folder
+        calibration_size (int): Images used to calibrate static quantization
+        latency_samples (int): Single-image forward passes timed for latency
+
+    Returns:
+        list: One dict per mode with latency_ms (median, batch of 1),
+        throughput (images/s), accuracy, and accuracy_delta, agreement and
+        max_prob_delta against the first mode; or mode and error on failure
+    """
+    from detector.dataset import SteganoDataset
+
+    set_threads(threads, interop_threads)
+    dataset = SteganoDataset(val_dir)
+    if not dataset.image_paths:
+        raise ValueError(f"No labelled images under {val_dir}")
+    picked = _spread(len(dataset), limit)
+    paths = [dataset.image_paths[i] for i in picked]
+    labels = torch.tensor([dataset.labels[i] for i in picked])
+    calibration = [dataset.image_paths[i] for i in _spread(len(dataset), calibration_size)]
+
+    base = SteganoDetector()
+    with ThreadPoolExecutor(DETECT_WORKERS) as pool:
+        inputs = torch.stack(list(pool.map(base._image_tensor, paths)))
+
+    results, reference = [], None
+    for name in modes or list(BENCHMARK_MODES):
+        try:
+            detector = SteganoDetector(model_path, calibration=calibration, **BENCHMARK_MODES[name])
+            for _ in range(2):  # warm-up (also lets TorchScript specialise)
+                detector._predict(inputs[:batch_size])
+
+            times = []
+            for i in range(min(latency_samples, len(inputs))):
+                start = time.perf_counter()
+                detector._predict(inputs[i:i + 1])
+                times.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            probs = torch.cat([detector._predict(inputs[i:i + batch_size])
+                               for i in range(0, len(inputs), batch_size)])
+            elapsed = time.perf_counter() - start
+        except Exception as e:
+            results.append({'mode': name, 'error': str(e)})
+            continue
+
+        predicted = probs.argmax(dim=1)
+        row = {
+            'mode': name,
+            'latency_ms': 1000 * float(np.median(times)),
+            'throughput': len(inputs) / elapsed,
+            'accuracy': (predicted == labels).float().mean().item()
+        }
+        if reference is None:
+            reference = row, probs, predicted
+        ref_row, ref_probs, ref_predicted = reference
+        row['accuracy_delta'] = row['accuracy'] - ref_row['accuracy']
+        row['agreement'] = (predicted == ref_predicted).float().mean().item()
+        row['max_prob_delta'] = (probs - ref_probs).abs().max().item()
+        results.append(row)
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare CPU inference modes of the detector')
+    parser.add_argument('val_dir', help='Validation folder with clean/lsb/dct/dwt subfolders')
+    parser.add_argument('--model', '-m', help='Path to trained model', default=None)
+    parser.add_argument('--modes', nargs='+', choices=list(BENCHMARK_MODES), default=None,
+                        help='Modes to compare (default: all; the first is the reference)')
+    parser.add_argument('--batch-size', type=int, default=DETECT_BATCH_SIZE, help='Images per inference batch')
+    parser.add_argument('--threads', type=int, default=None, help='Intra-op CPU threads')
+    parser.add_argument('--interop-threads', type=int, default=None, help='Inter-op CPU threads')
+    parser.add_argument('--limit', type=int, default=256, help='Validation images to use')
+
+    args = parser.parse_args()
+    results = benchmark(args.model, args.val_dir, args.modes, args.batch_size, args.threads,
+                        args.interop_threads, args.limit)
+
+    print(f"{'mode':<20}{'latency ms':>12}{'img/s':>10}{'accuracy':>10}{'acc delta':>11}{'agree':>8}{'prob delta':>12}")
+    for row in results:
+        if 'error' in row:
+            print(f"{row['mode']:<20}  failed: {row['error']}")
+            continue
+        print(f"{row['mode']:<20}{row['latency_ms']:>12.2f}{row['throughput']:>10.1f}"
+              f"{row['accuracy']:>10.2%}{row['accuracy_delta']:>+11.2%}{row['agreement']:>8.2%}"
+              f"{row['max_prob_delta']:>12.4f}")
+
+if __name__ == "__main__":
+    main()
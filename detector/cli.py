@@ -1,39 +1,46 @@
 import argparse
 import sys
 import os
-from detector.model import SteganoDetector
+from detector.model import SteganoDetector, DETECT_BATCH_SIZE
 
 def main():
     parser = argparse.ArgumentParser(description='Steganography Detection Tool')
-    parser.add_argument('image_path', help='Path to the image to analyze')
+    parser.add_argument('image_paths', nargs='+', metavar='image_path', help='Path(s) of the image(s) to analyze')
     parser.add_argument('--model', '-m', help='Path to trained model', default=None)
+    parser.add_argument('--batch-size', type=int, default=DETECT_BATCH_SIZE, help='Images per inference batch')
     
     args = parser.parse_args()
     
-    if not os.path.exists(args.image_path):
-        print(f"Error: Image file '{args.image_path}' not found")
-        sys.exit(1)
+    for image_path in args.image_paths:
+        if not os.path.exists(image_path):
+            print(f"Error: Image file '{image_path}' not found")
+            sys.exit(1)
     
     # Initialize detector
     detector = SteganoDetector(args.model)
     
-    # Perform detection
-    print(f"Analyzing image: {args.image_path}")
-    result = detector.detect(args.image_path)
+    # Perform detection (batched; results arrive in input order)
+    failed = False
+    results = detector.detect_many(args.image_paths, batch_size=args.batch_size)
+    for image_path, result in zip(args.image_paths, results):
+        print(f"Analyzing image: {image_path}")
+        if 'error' in result:
+            print(f"Error: {result['error']}")
+            failed = True
+            continue
+        
+        # Display results
+        print("\n" + "="*50)
+        print("STEGANOGRAPHY DETECTION RESULTS")
+        print("="*50)
+        print(f"Prediction: {result['prediction']}")
+        print(f"Confidence: {result['confidence']:.2%}")
+        print("\nDetailed Probabilities:")
+        for technique, probability in result['probabilities'].items():
+            print(f"  {technique}: {probability:.2%}")
     
-    if 'error' in result:
-        print(f"Error: {result['error']}")
+    if failed:
         sys.exit(1)
-    
-    # Display results
-    print("\n" + "="*50)
-    print("STEGANOGRAPHY DETECTION RESULTS")
-    print("="*50)
-    print(f"Prediction: {result['prediction']}")
-    print(f"Confidence: {result['confidence']:.2%}")
-    print("\nDetailed Probabilities:")
-    for technique, probability in result['probabilities'].items():
-        print(f"  {technique}: {probability:.2%}")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
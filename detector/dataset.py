@@ -90,4 +90,30 @@ def create_data_loaders(data_dir, batch_size=32, num_workers=4):
         shuffle=False, num_workers=num_workers
     )
     
-    return train_loader, val_loader
\ No newline at end of file
+    return train_loader, val_loader
+
+def build_feature_matrix(image_dir, store_dir=None, workers=None):
+    """
+    Hand-crafted feature matrix of a labelled folder (same layout as SteganoDataset)
+    
+    With store_dir, features come from a FeatureStore there, so only images
+    not seen before (by content) are decoded and extracted.
+    
+    Returns:
+        tuple: (features (n, dim) float64, labels (n,) int64, image paths);
+        images without usable features are left out
+    """
+    from detector.features import FeatureExtractor
+    from detector.store import FeatureStore
+    
+    dataset = SteganoDataset(image_dir)
+    paths, labels = dataset.image_paths, np.array(dataset.labels, dtype=np.int64)
+    if store_dir is not None:
+        features, ok = FeatureStore(store_dir).features_for(paths, workers)
+        features = np.asarray(features)[ok]
+    else:
+        vectors = [FeatureExtractor.extract_all_features(p) for p in paths]
+        width = next((v.size for v in vectors if v is not None), 0)
+        ok = np.array([v is not None and v.size == width for v in vectors], dtype=bool)
+        features = np.array([v for v, good in zip(vectors, ok) if good]).reshape(-1, width)
+    return features, labels[ok], [p for p, good in zip(paths, ok) if good]
@@ -2,84 +2,260 @@ import numpy as np
 import cv2
 from scipy import stats
 import pywt
+from scipy.fftpack import dct
+
+# Orthonormal 8x8 DCT-II matrix: dct(dct(B.T).T) == DCT_MATRIX @ B @ DCT_MATRIX.T
+DCT_MATRIX = dct(np.eye(8), norm='ortho', axis=0)
+
+# Coefficients smaller than this are rounding noise of the matrix product
+# (e.g. every AC coefficient of a flat block) and are set to exactly zero
+DCT_ZERO_TOL = 1e-6
+
+# Mid-frequency coefficients summarised by the DCT features, as (row, col)
+MID_FREQ = [(3, 4), (4, 3), (4, 4)]
+MID_ROWS, MID_COLS = (np.array(axis) for axis in zip(*MID_FREQ))
+
+# Optional per-coefficient histograms of the rounded coefficients over
+# integer bins -HIST_RANGE..HIST_RANGE (outliers land in the edge bins)
+HIST_RANGE = 8
+
+# Block rows transformed at a time, bounding the float temporaries
+DCT_STRIP_BLOCKS = 64
+
+# Feature families, in output order, that extract_all_features concatenates
+# by default (see FeatureExtractor.register for adding more)
+DEFAULT_FEATURES = ('lsb', 'dct')
+
+class FeatureContext:
+    """
+    One decoded grayscale image plus the intermediates feature extractors share
+    
+    Intermediates (the LSB plane, the mid-frequency block-DCT coefficients)
+    are computed on first use and kept, so every extractor run against the
+    same context reuses them instead of decoding or transforming again.
+    """
+    
+    def __init__(self, gray):
+        self.gray = gray
+        self._cache = {}
+    
+    @classmethod
+    def load(cls, image):
+        """
+        Build a context from a path, encoded bytes, a file-like object or an array
+        
+        Returns:
+            FeatureContext: Context, or None if the image cannot be decoded
+        """
+        if isinstance(image, str):
+            gray = cv2.imread(image, cv2.IMREAD_GRAYSCALE)
+        else:
+            from stego_tools.utils.io_utils import IOUtils
+            try:
+                gray = IOUtils.decode_image(image, cv2.IMREAD_GRAYSCALE)
+            except ValueError:
+                return None
+        return None if gray is None else cls(gray)
+    
+    def shared(self, name, make):
+        """Intermediate name, computed once with make(self)"""
+        if name not in self._cache:
+            self._cache[name] = make(self)
+        return self._cache[name]
+    
+    @property
+    def lsb(self):
+        """Least significant bit plane (uint8 0/1)"""
+        return self.shared('lsb', lambda ctx: ctx.gray & 1)
+    
+    @property
+    def dct_mid(self):
+        """(block rows, block cols, len(MID_FREQ)) float64 coefficients, or None"""
+        return self.shared('dct_mid', lambda ctx: FeatureExtractor.mid_freq_coeffs(ctx.gray))
 
 class FeatureExtractor:
     """Extract features for steganography detection"""
     
+    # name -> function(FeatureContext) returning a 1-D feature array or None
+    extractors = {}
+    # name -> version, bumped whenever a family's output changes
+    versions = {}
+    
+    @staticmethod
+    def register(name, version=1):
+        """
+        Decorator adding a feature family to the registry
+        
+        The function receives a FeatureContext and should build on its
+        shared intermediates (ctx.gray, ctx.lsb, ctx.dct_mid, or new ones
+        via ctx.shared) rather than decoding the image itself. Bump version
+        whenever its output changes, so stored features are recomputed.
+        """
+        def wrap(fn):
+            FeatureExtractor.extractors[name] = fn
+            FeatureExtractor.versions[name] = version
+            return fn
+        return wrap
+    
+    @staticmethod
+    def signature(features=DEFAULT_FEATURES):
+        """Identifies the output of extract_all_features(..., features), e.g. 'lsb@1+dct@1'"""
+        return '+'.join(f"{name}@{FeatureExtractor.versions[name]}" for name in features)
+    
     @staticmethod
     def extract_lsb_features(image_path):
         """Extract LSB-specific features"""
-        img = cv2.imread(image_path, cv2.IMREAD_GRAYSCALE)
-        if img is None:
+        ctx = FeatureContext.load(image_path)
+        return None if ctx is None else FeatureExtractor.extractors['lsb'](ctx)
+    
+    @staticmethod
+    def extract_dct_features(image_path, histograms=False):
+        """Extract DCT-specific features"""
+        ctx = FeatureContext.load(image_path)
+        if ctx is None:
             return None
+        return FeatureExtractor.dct_features(ctx, histograms)
+    
+    @staticmethod
+    def mid_freq_coeffs(img):
+        """
+        MID_FREQ block-DCT coefficients of every full 8x8 block of a gray image
         
-        # LSB plane analysis
-        lsb_plane = img & 1
-        
-        # Statistical features
-        features = []
-        
-        # LSB distribution
-        hist, _ = np.histogram(lsb_plane, bins=2, density=True)
-        features.extend(hist)
-        
-        # Correlation features
-        height, width = img.shape
-        horizontal_corr = np.corrcoef(lsb_plane[:-1, :].flatten(), 
-                                    lsb_plane[1:, :].flatten())[0,1]
-        vertical_corr = np.corrcoef(lsb_plane[:, :-1].flatten(), 
-                                  lsb_plane[:, 1:].flatten())[0,1]
+        Blocks are transformed as (rows, cols, 8, 8) batches with DCT_MATRIX,
+        one strip of DCT_STRIP_BLOCKS block rows at a time; only the matrix
+        rows needed for MID_FREQ are applied on the left.
         
-        features.extend([horizontal_corr, vertical_corr])
+        Returns:
+            np.ndarray: (block rows, block cols, len(MID_FREQ)) float64
+            array, or None if the image has no full block
+        """
+        bh, bw = img.shape[0] // 8, img.shape[1] // 8
+        if bh == 0 or bw == 0:
+            return None
         
-        return np.nan_to_num(features)
+        # Left-multiply by the needed DCT rows only, then pick each
+        # coefficient's (row, col) with fancy indexing
+        rows, row_index = np.unique(MID_ROWS, return_inverse=True)
+        left, right = DCT_MATRIX[rows], DCT_MATRIX.T
+        coeffs = np.empty((bh, bw, len(MID_FREQ)), dtype=np.float64)
+        for r0 in range(0, bh, DCT_STRIP_BLOCKS):
+            r1 = min(bh, r0 + DCT_STRIP_BLOCKS)
+            strip = img[r0*8:r1*8, :bw*8].astype(np.float64)
+            blocks = strip.reshape(r1 - r0, 8, bw, 8).swapaxes(1, 2)
+            partial = left @ blocks @ right
+            coeffs[r0:r1] = partial[:, :, row_index, MID_COLS]
+        coeffs[np.abs(coeffs) < DCT_ZERO_TOL] = 0
+        return coeffs
     
     @staticmethod
-    def extract_dct_features(image_path):
-        """Extract DCT-specific features"""
-        img = cv2.imread(image_path, cv2.IMREAD_GRAYSCALE)
-        if img is None:
-            return None
-        
-        # DCT coefficient analysis
-        from scipy.fftpack import dct
-        features = []
+    def dct_features(img, histograms=False):
+        """
+        Moments of the mid-frequency block-DCT coefficients of a gray image
         
-        # Process in 8x8 blocks
-        for i in range(0, img.shape[0]-7, 8):
-            for j in range(0, img.shape[1]-7, 8):
-                block = img[i:i+8, j:j+8].astype(np.float32)
-                dct_block = dct(dct(block.T, norm='ortho').T, norm='ortho')
-                
-                # Extract mid-frequency coefficients
-                mid_freq = [dct_block[3,4], dct_block[4,3], dct_block[4,4]]
-                features.extend(mid_freq)
+        Args:
+            img (np.ndarray or FeatureContext): 2-D grayscale image, or a
+                context whose shared coefficients are reused
+            histograms (bool): Also return, per MID_FREQ coefficient, the
+                fraction of blocks in each rounded-value bin
+                (2 * HIST_RANGE + 1 bins each)
         
-        # Statistical moments of DCT coefficients
-        if len(features) > 0:
-            stats_features = [
-                np.mean(features),
-                np.std(features),
-                stats.skew(features),
-                stats.kurtosis(features)
-            ]
-            return np.nan_to_num(stats_features)
+        Returns:
+            np.ndarray: [mean, std, skew, kurtosis] of all gathered
+            coefficients, followed by the histograms if requested;
+            None if the image has no full block
+        """
+        ctx = img if isinstance(img, FeatureContext) else FeatureContext(img)
+        features = FeatureExtractor.extractors['dct'](ctx)
+        if features is None or not histograms:
+            return features
+        return np.concatenate([features, FeatureExtractor.extractors['dct_hist'](ctx)])
+    
+    @staticmethod
+    def correlation(x, y):
+        """
+        Pearson correlation of two equally shaped arrays, from sums and dot products
         
-        return None
+        Unlike np.corrcoef on flattened copies, nothing image-sized is
+        materialised as float; constant or empty inputs give nan, as
+        corrcoef does.
+        """
+        n = x.size
+        if n == 0:
+            return np.nan
+        sx, sy = float(np.sum(x, dtype=np.int64)), float(np.sum(y, dtype=np.int64))
+        sxx = float(np.einsum('ij,ij->', x, x, dtype=np.int64))
+        syy = float(np.einsum('ij,ij->', y, y, dtype=np.int64))
+        sxy = float(np.einsum('ij,ij->', x, y, dtype=np.int64))
+        cov = sxy - sx * sy / n
+        var = (sxx - sx * sx / n) * (syy - sy * sy / n)
+        return cov / np.sqrt(var) if var > 0 else np.nan
     
     @staticmethod
-    def extract_all_features(image_path):
-        """Extract comprehensive feature set"""
-        all_features = []
+    def extract_all_features(image_path, features=DEFAULT_FEATURES):
+        """
+        Extract comprehensive feature set
         
-        # LSB features
-        lsb_feats = FeatureExtractor.extract_lsb_features(image_path)
-        if lsb_feats is not None:
-            all_features.extend(lsb_feats)
+        The image is decoded once and every requested family runs on the
+        same FeatureContext; families returning None are skipped.
         
-        # DCT features
-        dct_feats = FeatureExtractor.extract_dct_features(image_path)
-        if dct_feats is not None:
-            all_features.extend(dct_feats)
+        Args:
+            image_path: Path, encoded bytes, file-like object or array
+            features (tuple): Registered family names, in output order
         
-        return np.array(all_features) if all_features else None
\ No newline at end of file
+        Returns:
+            np.ndarray: Concatenated features, or None if there are none
+        """
+        ctx = FeatureContext.load(image_path)
+        if ctx is None:
+            return None
+        all_features = []
+        for name in features:
+            feats = FeatureExtractor.extractors[name](ctx)
+            if feats is not None:
+                all_features.extend(feats)
+        return np.array(all_features) if all_features else None
+
+@FeatureExtractor.register('lsb')
+def _lsb_features(ctx):
+    """LSB plane balance and neighbour correlations"""
+    lsb = ctx.lsb
+    
+    # LSB distribution, as np.histogram(lsb, bins=2, density=True) gives it
+    # (a constant plane puts everything in the upper bin)
+    n, ones = lsb.size, int(np.count_nonzero(lsb))
+    if 0 < ones < n:
+        hist = [2.0 * (n - ones) / n, 2.0 * ones / n]
+    else:
+        hist = [0.0, 2.0]
+    
+    # Correlation features
+    horizontal_corr = FeatureExtractor.correlation(lsb[:-1, :], lsb[1:, :])
+    vertical_corr = FeatureExtractor.correlation(lsb[:, :-1], lsb[:, 1:])
+    return np.nan_to_num(hist + [horizontal_corr, vertical_corr])
+
+@FeatureExtractor.register('dct', version=2)
+def _dct_moments(ctx):
+    """Moments of the mid-frequency block-DCT coefficients"""
+    coeffs = ctx.dct_mid
+    if coeffs is None:
+        return None
+    values = coeffs.reshape(-1).astype(np.float64)
+    return np.nan_to_num([
+        np.mean(values),
+        np.std(values),
+        stats.skew(values),
+        stats.kurtosis(values)
+    ])
+
+@FeatureExtractor.register('dct_hist', version=2)
+def _dct_histograms(ctx):
+    """Per-coefficient histograms of the rounded mid-frequency coefficients"""
+    coeffs = ctx.dct_mid
+    if coeffs is None:
+        return None
+    per_coeff = coeffs.reshape(-1, len(MID_FREQ))
+    nbins = 2 * HIST_RANGE + 1
+    bins = np.clip(np.rint(per_coeff), -HIST_RANGE, HIST_RANGE).astype(np.intp) + HIST_RANGE
+    bins += np.arange(len(MID_FREQ)) * nbins
+    counts = np.bincount(bins.ravel(), minlength=nbins * len(MID_FREQ))
+    return counts / per_coeff.shape[0]
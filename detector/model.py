@@ -1,22 +1,101 @@
+import os
+from collections import deque
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor
 import torch
 import torch.nn as nn
-from models.tri_tool_minimal import TriToolSteganoDetector
+
+CLASSES = ['Clean', 'LSB', 'DCT', 'DWT']
+
+# detect_many defaults: images per forward pass, and preprocessing threads
+DETECT_BATCH_SIZE = 16
+DETECT_WORKERS = min(4, os.cpu_count() or 1)
+
+# Model input size, and files load_model reads as TorchScript archives
+INPUT_SIZE = 256
+TORCHSCRIPT_SUFFIXES = ('.ts', '.pts', '.torchscript')
+
+def set_threads(threads=None, interop_threads=None):
+    """
+    Pin torch's CPU thread pools (process-wide)
+    
+    Args:
+        threads (int): Intra-op threads (torch.set_num_threads)
+        interop_threads (int): Inter-op threads; torch only accepts this
+            before its first parallel work, later calls are reported and ignored
+    """
+    if threads:
+        torch.set_num_threads(threads)
+    if interop_threads and torch.get_num_interop_threads() != interop_threads:
+        try:
+            torch.set_num_interop_threads(interop_threads)
+        except RuntimeError as e:
+            print(f"Could not set inter-op threads: {e}")
+
+class TriToolSteganoDetector(nn.Module):
+    """
+    CNN classifying an image into CLASSES (clean or one of the tri-tool techniques)
+    
+    Strided conv/batch-norm/ReLU stages over the normalised RGB input,
+    global average pooling and a linear classifier; plain modules only,
+    so the model traces for TorchScript and FX static quantization.
+    """
+    
+    def __init__(self, num_classes=len(CLASSES), widths=(16, 32, 64, 128)):
+        super().__init__()
+        layers, channels = [], 3
+        for width in widths:
+            layers += [
+                nn.Conv2d(channels, width, 3, stride=2, padding=1, bias=False),
+                nn.BatchNorm2d(width),
+                nn.ReLU(inplace=True)
+            ]
+            channels = width
+        self.features = nn.Sequential(*layers)
+        self.pool = nn.AdaptiveAvgPool2d(1)
+        self.classifier = nn.Linear(channels, num_classes)
+    
+    def forward(self, x):
+        return self.classifier(torch.flatten(self.pool(self.features(x)), 1))
 
 class SteganoDetector:
     """Steganography detection wrapper"""
     
-    def __init__(self, model_path=None, device='cpu'):
+    def __init__(self, model_path=None, device='cpu', quantize=None, script=False,
+                 channels_last=False, threads=None, interop_threads=None, calibration=None):
+        """
+        Args:
+            model_path (str): Checkpoint, or a TorchScript archive (TORCHSCRIPT_SUFFIXES)
+            device (str): Torch device
+            quantize (str): None, 'dynamic' (int8 Linear layers) or 'static'
+                (int8 throughout, calibrated on calibration); CPU only
+            script (bool): Trace and freeze the model into a TorchScript graph
+            channels_last (bool): Run the model and its inputs in channels_last layout
+            threads (int): Intra-op CPU threads (see set_threads)
+            interop_threads (int): Inter-op CPU threads (see set_threads)
+            calibration (iterable): Images for static quantization
+        """
+        set_threads(threads, interop_threads)
         self.device = device
+        self.channels_last = channels_last
         self.model = TriToolSteganoDetector()
+        self._transform = None
         
         if model_path:
             self.load_model(model_path)
         else:
             self.model.to(device)
+            self.model.eval()
+        if quantize or script or channels_last:
+            self.optimize(quantize, script, calibration)
     
     def load_model(self, model_path):
         """Load trained model"""
         try:
+            if model_path.endswith(TORCHSCRIPT_SUFFIXES):
+                self.model = torch.jit.load(model_path, map_location=self.device)
+                self.model.eval()
+                return True
             checkpoint = torch.load(model_path, map_location=self.device)
             self.model.load_state_dict(checkpoint['model_state_dict'])
             self.model.to(self.device)
@@ -26,45 +105,193 @@ class SteganoDetector:
             print(f"Error loading model: {e}")
             return False
     
-    def preprocess_image(self, image_path):
-        """Preprocess image for model input"""
-        from PIL import Image
-        import torchvision.transforms as transforms
+    def optimize(self, quantize=None, script=False, calibration=None):
+        """
+        Convert the loaded model for faster CPU inference
+        
+        Args:
+            quantize (str): None, 'dynamic' or 'static' (see __init__)
+            script (bool): Trace and freeze into TorchScript afterwards
+            calibration (iterable): Images run through the model to pick
+                static quantization ranges (required for 'static')
         
-        transform = transforms.Compose([
-            transforms.Resize((256, 256)),
-            transforms.ToTensor(),
-            transforms.Normalize(mean=[0.485, 0.456, 0.406], 
-                               std=[0.229, 0.224, 0.225])
-        ])
+        Raises:
+            ValueError: For an unknown quantize mode, missing calibration
+                images, quantizing off the CPU or re-quantizing TorchScript
+        """
+        model = self.model
+        is_script = isinstance(model, torch.jit.ScriptModule)
+        if quantize is not None:
+            if quantize not in ('dynamic', 'static'):
+                raise ValueError(f"Unknown quantization mode: {quantize}")
+            if str(self.device) != 'cpu':
+                raise ValueError("int8 quantization runs on the CPU only")
+            if is_script:
+                raise ValueError("Quantize the eager model before exporting it to TorchScript")
+        if self.channels_last and not is_script:
+            model = model.to(memory_format=torch.channels_last)
         
-        image = Image.open(image_path).convert('RGB')
-        return transform(image).unsqueeze(0)
+        if quantize == 'dynamic':
+            model = torch.ao.quantization.quantize_dynamic(model, {nn.Linear}, dtype=torch.qint8)
+        elif quantize == 'static':
+            from torch.ao.quantization import get_default_qconfig_mapping
+            from torch.ao.quantization.quantize_fx import prepare_fx, convert_fx
+            if not calibration:
+                raise ValueError("Static int8 quantization needs calibration images")
+            qconfig = get_default_qconfig_mapping(torch.backends.quantized.engine)
+            prepared = prepare_fx(model, qconfig, (self._example_batch(),))
+            with torch.inference_mode():
+                for batch in self._batches(calibration, DETECT_BATCH_SIZE):
+                    prepared(batch)
+            model = convert_fx(prepared)
+        
+        if script and not is_script:
+            model = self._script(model)
+        self.model = model
+    
+    def export_torchscript(self, path):
+        """Save the (optimized) model as a frozen TorchScript archive that load_model reads back"""
+        model = self.model
+        if not isinstance(model, torch.jit.ScriptModule):
+            model = self._script(model)
+        torch.jit.save(model, path)
+    
+    def _script(self, model):
+        """Traced, frozen TorchScript version of an eager model"""
+        with torch.no_grad():
+            traced = torch.jit.trace(model.eval(), self._example_batch())
+        return torch.jit.freeze(traced)
+    
+    def _example_batch(self):
+        """One zero input batch in the model's layout"""
+        batch = torch.zeros(1, 3, INPUT_SIZE, INPUT_SIZE, device=self.device)
+        if self.channels_last:
+            batch = batch.contiguous(memory_format=torch.channels_last)
+        return batch
+    
+    def _batches(self, images, batch_size):
+        """Preprocessed, stacked input batches of an iterable of images"""
+        images = iter(images)
+        while True:
+            chunk = [self._image_tensor(image) for image in islice(images, batch_size)]
+            if not chunk:
+                return
+            batch = torch.stack(chunk).to(self.device)
+            if self.channels_last:
+                batch = batch.contiguous(memory_format=torch.channels_last)
+            yield batch
+    
+    @property
+    def transform(self):
+        """Input transform, built once per detector"""
+        if self._transform is None:
+            import torchvision.transforms as transforms
+            self._transform = transforms.Compose([
+                transforms.Resize((INPUT_SIZE, INPUT_SIZE)),
+                transforms.ToTensor(),
+                transforms.Normalize(mean=[0.485, 0.456, 0.406], 
+                                   std=[0.229, 0.224, 0.225])
+            ])
+        return self._transform
     
-    def detect(self, image_path):
-        """Detect steganography in image"""
+    def preprocess_image(self, image):
+        """Preprocess image for model input
+        
+        image is a path, encoded bytes, a binary file-like object or a BGR
+        np.ndarray; in-memory images are decoded with cv2.imdecode.
+        """
+        return self._image_tensor(image).unsqueeze(0)
+    
+    def _image_tensor(self, image):
+        """(3, 256, 256) input tensor of one image (thread-safe)"""
+        from PIL import Image
+        import cv2
+        from stego_tools.utils.io_utils import IOUtils
+        
+        if isinstance(image, str):
+            image = Image.open(image).convert('RGB')
+        else:
+            img = IOUtils.decode_image(image)
+            image = Image.fromarray(cv2.cvtColor(img, cv2.COLOR_BGR2RGB))
+        return self.transform(image)
+    
+    def _predict(self, batch):
+        """Class probabilities of an (N, 3, H, W) batch, on the CPU"""
+        with torch.inference_mode():
+            batch = batch.to(self.device)
+            if self.channels_last:
+                batch = batch.contiguous(memory_format=torch.channels_last)
+            outputs = self.model(batch)
+            return torch.softmax(outputs.float(), dim=1).cpu()
+    
+    @staticmethod
+    def _result(probabilities):
+        """Result dict of one row of class probabilities"""
+        probs = probabilities.tolist()
+        predicted_class = max(range(len(probs)), key=probs.__getitem__)
+        return {
+            'prediction': CLASSES[predicted_class],
+            'confidence': probs[predicted_class],
+            'probabilities': dict(zip(CLASSES, probs))
+        }
+    
+    def detect(self, image):
+        """Detect steganography in an image (path, bytes, file-like object or BGR array)"""
         try:
-            # Preprocess image
-            input_tensor = self.preprocess_image(image_path)
-            input_tensor = input_tensor.to(self.device)
-            
-            # Run inference
-            with torch.no_grad():
-                outputs = self.model(input_tensor)
-                probabilities = torch.softmax(outputs, dim=1)
-                predicted_class = torch.argmax(outputs, dim=1).item()
-            
-            # Class mapping
-            classes = ['Clean', 'LSB', 'DCT', 'DWT']
-            confidence = probabilities[0][predicted_class].item()
-            
-            return {
-                'prediction': classes[predicted_class],
-                'confidence': confidence,
-                'probabilities': {
-                    cls: prob.item() for cls, prob in zip(classes, probabilities[0])
-                }
-            }
+            # Preprocess image and run inference
+            probabilities = self._predict(self.preprocess_image(image))
+            return self._result(probabilities[0])
             
         except Exception as e:
-            return {'error': str(e)}
\ No newline at end of file
+            return {'error': str(e)}
+    
+    def detect_many(self, images, batch_size=DETECT_BATCH_SIZE, workers=DETECT_WORKERS):
+        """
+        Detect steganography in many images, batched
+        
+        Images are decoded and preprocessed by a thread pool while the
+        previous batch runs through the model; up to two batches are
+        prepared ahead, so any iterable (even an unbounded one) is consumed
+        lazily with bounded memory.
+        
+        Args:
+            images (iterable): Paths, encoded bytes, file-like objects or BGR arrays
+            batch_size (int): Images per forward pass
+            workers (int): Preprocessing threads
+        
+        Yields:
+            dict: One detect()-style result per image, in input order; an
+            image that fails yields {'error': ...} without stopping the rest
+        """
+        images = iter(images)
+        pending = deque()
+        pool = ThreadPoolExecutor(max(1, workers))
+        
+        def fill():
+            for image in islice(images, max(0, 2 * batch_size - len(pending))):
+                pending.append(pool.submit(self._image_tensor, image))
+        
+        try:
+            fill()
+            while pending:
+                futures = [pending.popleft() for _ in range(min(batch_size, len(pending)))]
+                fill()  # the next batch decodes while this one runs
+                
+                tensors, results = [], []
+                for future in futures:
+                    try:
+                        tensors.append(future.result())
+                        results.append(None)
+                    except Exception as e:
+                        results.append({'error': str(e)})
+                if tensors:
+                    try:
+                        rows = iter(self._predict(torch.stack(tensors)))
+                        results = [r if r is not None else self._result(next(rows)) for r in results]
+                    except Exception as e:
+                        results = [r if r is not None else {'error': str(e)} for r in results]
+                yield from results
+        finally:
+            for future in pending:
+                future.cancel()
+            pool.shutdown(wait=True)
\ No newline at end of file
@@ -0,0 +1,343 @@
+import os
+import json
+import hashlib
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from detector.features import FeatureExtractor, DEFAULT_FEATURES
+
+# Layout of a FeatureStore directory:
+#   meta.json          feature signature, vector width and current generation
+#   features.<gen>.bin float64 matrix, one row per vector, read via np.memmap
+#   index.<gen>.bin    append-only (sha256 digest, row) records; row -1 is a
+#                      tombstone and the last record for a digest wins
+# Rows are only ever appended; compact() writes a new generation and
+# switches to it by rewriting meta.json, so a crash leaves either the old
+# or the new files in use. One writer per store at a time.
+INDEX_DTYPE = np.dtype([('digest', 'S32'), ('row', '<i8')])
+FEATURE_DTYPE = np.dtype('<f8')
+HASH_CHUNK = 1 << 20
+COMPACT_CHUNK = 1 << 16
+
+class FeatureStore:
+    """
+    Persistent, content-addressed store of extract_all_features vectors
+
+    Vectors are keyed by the SHA-256 of the image file, so renamed or
+    copied images are never recomputed. The store is bound to the
+    signature of its feature families (FeatureExtractor.signature): opening
+    it with a different signature, e.g. after a family's version was
+    bumped, discards every stored row.
+    """
+
+    def __init__(self, root, features=DEFAULT_FEATURES):
+        """
+        Open (or create) a store
+
+        Args:
+            root (str): Store directory
+            features (tuple): Feature families, as for extract_all_features
+        """
+        self.root = root
+        self.features = tuple(features)
+        self.signature = FeatureExtractor.signature(self.features)
+        os.makedirs(root, exist_ok=True)
+        self._matrix = None
+        meta = self._read_meta()
+        if meta is None or meta.get('signature') != self.signature:
+            self.clear()
+        else:
+            self.dim, self.generation = meta['dim'], meta['generation']
+            self._load()
+
+    # ---- hashing ----
+    @staticmethod
+    def digest(image):
+        """
+        SHA-256 of an image's encoded content
+
+        Args:
+            image: Path, encoded bytes or binary file-like object
+
+        Returns:
+            bytes: 32-byte digest
+        """
+        h = hashlib.sha256()
+        if isinstance(image, str):
+            with open(image, 'rb') as f:
+                for chunk in iter(lambda: f.read(HASH_CHUNK), b''):
+                    h.update(chunk)
+        elif hasattr(image, 'read'):
+            for chunk in iter(lambda: image.read(HASH_CHUNK), b''):
+                h.update(chunk)
+        else:
+            h.update(image)
+        return h.digest()
+
+    # ---- lookups ----
+    def __len__(self):
+        return self._keys.size
+
+    def __contains__(self, digest):
+        return self.rows([digest])[0] >= 0
+
+    @property
+    def matrix(self):
+        """Read-only memmap of every stored row, in storage order (dead rows included)"""
+        if self._matrix is None:
+            if self._nrows == 0:
+                self._matrix = np.empty((0, self.dim or 0), dtype=FEATURE_DTYPE)
+            else:
+                self._matrix = np.memmap(self._path('features'), dtype=FEATURE_DTYPE, mode='r',
+                                         shape=(self._nrows, self.dim))
+        return self._matrix
+
+    def rows(self, digests):
+        """
+        Storage rows of the given digests
+
+        Args:
+            digests (list): 32-byte digests
+
+        Returns:
+            np.ndarray: int64 row per digest, -1 where not stored
+        """
+        digests = np.asarray(digests, dtype='S32')
+        if self._keys.size == 0 or digests.size == 0:
+            return np.full(digests.shape, -1, dtype=np.int64)
+        # Search on the leading 8 bytes (same order as the full keys, and
+        # much faster than comparing 32-byte strings); only digests sharing
+        # a prefix with another key need the full search
+        pos = np.searchsorted(self._prefix, _prefix(digests))
+        pos = np.minimum(pos, self._keys.size - 1)
+        hit = self._keys[pos] == digests
+        retry = np.flatnonzero(~hit)
+        if retry.size:
+            pos[retry] = np.minimum(np.searchsorted(self._keys, digests[retry]), self._keys.size - 1)
+            hit[retry] = self._keys[pos[retry]] == digests[retry]
+        return np.where(hit, self._rows[pos], -1)
+
+    def get_many(self, digests):
+        """
+        Stored vectors of the given digests
+
+        A run of consecutive rows (e.g. after compact(order=...)) is
+        returned as a single memmap slice; anything else is gathered with
+        one fancy index.
+
+        Args:
+            digests (list): 32-byte digests
+
+        Returns:
+            tuple: ((len(digests), dim) float64 array with NaN rows for
+            missing digests, boolean mask of the digests found)
+        """
+        rows = self.rows(digests)
+        found = rows >= 0
+        if found.all() and rows.size and rows[-1] - rows[0] == rows.size - 1 \
+                and np.all(np.diff(rows) == 1):
+            return self.matrix[rows[0]:rows[-1] + 1], found
+        out = np.full((rows.size, self.dim or 0), np.nan)
+        out[found] = self.matrix[rows[found]]
+        return out, found
+
+    # ---- updates ----
+    def add_many(self, digests, vectors):
+        """
+        Append vectors for digests not stored yet
+
+        Args:
+            digests (list): 32-byte digests
+            vectors (array-like): (len(digests), dim) feature vectors
+
+        Raises:
+            ValueError: If the vector width differs from the store's
+        """
+        vectors = np.asarray(vectors, dtype=FEATURE_DTYPE)
+        digests = np.asarray(digests, dtype='S32')
+        if digests.size == 0:
+            return
+        if vectors.ndim != 2 or vectors.shape[0] != digests.size:
+            raise ValueError("Expected one feature vector per digest")
+        if self.dim is None:
+            self.dim = vectors.shape[1]
+            self._write_meta()
+        if vectors.shape[1] != self.dim:
+            raise ValueError(f"Feature vectors have {vectors.shape[1]} values, the store holds {self.dim}")
+
+        # Content-addressed: skip digests already stored or repeated in the batch
+        _, first = np.unique(digests, return_index=True)
+        keep = np.sort(first)
+        keep = keep[self.rows(digests[keep]) < 0]
+        if keep.size == 0:
+            return
+        records = np.empty(keep.size, dtype=INDEX_DTYPE)
+        records['digest'] = digests[keep]
+        records['row'] = self._nrows + np.arange(keep.size)
+
+        # Data before index: a crash in between only leaves unreferenced rows
+        with open(self._path('features'), 'ab') as f:
+            f.write(np.ascontiguousarray(vectors[keep]).tobytes())
+        with open(self._path('index'), 'ab') as f:
+            f.write(records.tobytes())
+        self._nrows += keep.size
+        self._matrix = None
+        self._merge(records)
+
+    def discard(self, digests):
+        """Forget the given digests (their rows are reclaimed by compact)"""
+        digests = np.unique(np.asarray(digests, dtype='S32'))
+        digests = digests[self.rows(digests) >= 0]
+        if digests.size == 0:
+            return
+        records = np.empty(digests.size, dtype=INDEX_DTYPE)
+        records['digest'], records['row'] = digests, -1
+        with open(self._path('index'), 'ab') as f:
+            f.write(records.tobytes())
+        self._merge(records)
+
+    def features_for(self, images, workers=None):
+        """
+        Feature matrix for a list of images, computing only those not stored
+
+        Args:
+            images (list): Image paths
+            workers (int): Threads extracting missing features (None: serial)
+
+        Returns:
+            tuple: ((len(images), dim) float64 array, boolean mask of the
+            images that have features; undecodable images and vectors of
+            the wrong width are NaN rows and are not stored)
+        """
+        digests = [self.digest(path) for path in images]
+        missing = np.flatnonzero(self.rows(digests) < 0)
+        extract = lambda i: FeatureExtractor.extract_all_features(images[i], self.features)
+        if workers:
+            with ThreadPoolExecutor(workers) as pool:
+                computed = list(pool.map(extract, missing))
+        else:
+            computed = [extract(i) for i in missing]
+
+        width = self.dim
+        if width is None:
+            width = next((v.size for v in computed if v is not None), None)
+        fresh = [(digests[i], v) for i, v in zip(missing, computed) if v is not None and v.size == width]
+        if fresh:
+            self.add_many([d for d, _ in fresh], np.stack([v for _, v in fresh]))
+        return self.get_many(digests)
+
+    def compact(self, order=None):
+        """
+        Rewrite the store without dead rows
+
+        Args:
+            order (list): Optional digests to place first, in this order,
+                so that get_many(order) becomes a single memmap slice
+        """
+        keys, rows = self._keys, self._rows
+        if order is not None:
+            order = np.asarray(order, dtype='S32')
+            _, first = np.unique(order, return_index=True)
+            order = order[np.sort(first)]
+            order = order[self.rows(order) >= 0]
+            rest = keys[~np.isin(keys, order)]
+            keys = np.concatenate([order, rest[np.argsort(self.rows(rest), kind='stable')]])
+        else:
+            keys = keys[np.argsort(rows, kind='stable')]
+        rows = self.rows(keys)
+
+        generation = self.generation + 1
+        with open(self._path('features', generation), 'wb') as f:
+            for i in range(0, rows.size, COMPACT_CHUNK):
+                f.write(np.ascontiguousarray(self.matrix[rows[i:i + COMPACT_CHUNK]]).tobytes())
+        records = np.empty(keys.size, dtype=INDEX_DTYPE)
+        records['digest'], records['row'] = keys, np.arange(keys.size)
+        records.tofile(self._path('index', generation))
+        self._switch(generation)
+
+    def clear(self):
+        """Drop every stored row (also done on a signature change)"""
+        self.dim = None
+        generation = getattr(self, 'generation', self._read_generation()) + 1
+        open(self._path('features', generation), 'wb').close()
+        open(self._path('index', generation), 'wb').close()
+        self._switch(generation)
+
+    def info(self):
+        """Summary of the store's size"""
+        return {
+            'signature': self.signature,
+            'dim': self.dim,
+            'live': len(self),
+            'rows': self._nrows,
+            'dead': self._nrows - len(self),
+            'bytes': self._nrows * (self.dim or 0) * FEATURE_DTYPE.itemsize
+        }
+
+    # ---- internals ----
+    def _path(self, name, generation=None):
+        generation = self.generation if generation is None else generation
+        return os.path.join(self.root, f"{name}.{generation}.bin")
+
+    def _read_meta(self):
+        try:
+            with open(os.path.join(self.root, 'meta.json'), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _read_generation(self):
+        meta = self._read_meta()
+        return meta.get('generation', 0) if meta else 0
+
+    def _write_meta(self):
+        meta = {'signature': self.signature, 'dim': self.dim, 'generation': self.generation}
+        tmp = os.path.join(self.root, 'meta.json.tmp')
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        os.replace(tmp, os.path.join(self.root, 'meta.json'))
+
+    def _switch(self, generation):
+        """Make generation current (meta.json is the commit point) and delete older files"""
+        self.generation = generation
+        self._matrix = None
+        self._write_meta()
+        for name in os.listdir(self.root):
+            stem = name.split('.')
+            if len(stem) == 3 and stem[0] in ('features', 'index') and stem[2] == 'bin' \
+                    and stem[1] != str(generation):
+                os.remove(os.path.join(self.root, name))
+        self._load()
+
+    def _load(self):
+        """Read the index (last record per digest wins) and trim torn appends"""
+        width = (self.dim or 0) * FEATURE_DTYPE.itemsize
+        size = os.path.getsize(self._path('features'))
+        self._nrows = size // width if width else 0
+        if width and size % width:
+            with open(self._path('features'), 'r+b') as f:
+                f.truncate(self._nrows * width)
+        with open(self._path('index'), 'rb') as f:
+            data = f.read()
+        whole = len(data) - len(data) % INDEX_DTYPE.itemsize
+        records = np.frombuffer(data[:whole], dtype=INDEX_DTYPE)
+        records = records[records['row'] < self._nrows]
+        self._keys = np.empty(0, dtype='S32')
+        self._rows = np.empty(0, dtype=np.int64)
+        self._merge(records)
+
+    def _merge(self, records):
+        """Fold index records into the sorted key/row arrays"""
+        keys = np.concatenate([self._keys, records['digest']])
+        rows = np.concatenate([self._rows, records['row']])
+        # np.unique keeps the first occurrence, so search the reversed arrays
+        keys, rows = keys[::-1], rows[::-1]
+        keys, last = np.unique(keys, return_index=True)
+        rows = rows[last]
+        live = rows >= 0
+        self._keys, self._rows = keys[live], rows[live]
+        self._prefix = _prefix(self._keys)
+
+def _prefix(digests):
+    """Leading 8 bytes of each digest as a big-endian integer"""
+    head = np.ascontiguousarray(digests, dtype='S32').view(np.uint8).reshape(-1, 32)[:, :8]
+    return np.ascontiguousarray(head).view('>u8').ravel().astype(np.uint64)
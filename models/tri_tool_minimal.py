@@ -1,15 +1,21 @@
 # File: steg_project/tri_tool_minimal.py
-# One-file LSB + DCT-QIM + DWT-QIM GUI with auto-detect decode.
+# One-file LSB + DCT-QIM + DWT-QIM + JPEG-coefficient GUI with auto-detect decode.
 # Deps: pip install opencv-python numpy pywavelets
 
-import os, sys
+import io, os, re, sys, json, time, shutil, struct, base64, hashlib, argparse, threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, FIRST_COMPLETED, wait
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qsl
+from array import array
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 
 import numpy as np
 import cv2
 
-# Try PyWavelets for DWT. If missing, we disable DWT in the GUI.
+# Try PyWavelets for DWT. If missing, the built-in Haar backend still covers
+# the default WAVELET; any other wavelet disables DWT in the GUI.
 try:
     import pywt
     HAS_PYWT = True
@@ -38,19 +44,143 @@ def bits_to_bytes(bits):
             out.append(acc); acc = 0; n = 0
     return bytes(out)
 
-def load_bgr(path: str):
-    img = cv2.imread(path, cv2.IMREAD_COLOR)
+# Decoded images and derived planes ("bgr", "gray", "y") shared by capacity
+# checks, hide, reveal and auto-detect. Keyed by (path, mtime, size, plane) so
+# a rewritten file is never served stale; least recently used entries are
+# evicted once IMAGE_CACHE_BYTES is exceeded. Cached arrays are read-only:
+# copy before modifying. Every access holds _IMAGE_CACHE_LOCK; planes are
+# built outside it, so concurrent misses on one key may both decode.
+IMAGE_CACHE_BYTES = 256 << 20
+_IMAGE_CACHE = OrderedDict()
+_IMAGE_CACHE_LOCK = threading.Lock()
+IMAGE_CACHE_STATS = {"hits": 0, "misses": 0}
+
+def cached_plane(path: str, plane: str, make):
+    """Return the cached plane of path, building it with make(path) on a miss."""
+    st = os.stat(path)
+    key = (os.path.abspath(path), st.st_mtime_ns, st.st_size, plane)
+    with _IMAGE_CACHE_LOCK:
+        if key in _IMAGE_CACHE:
+            _IMAGE_CACHE.move_to_end(key)
+            IMAGE_CACHE_STATS["hits"] += 1
+            return _IMAGE_CACHE[key]
+        IMAGE_CACHE_STATS["misses"] += 1
+    arr = make(path)
+    arr.setflags(write=False)
+    if arr.nbytes > IMAGE_CACHE_BYTES:
+        return arr
+    with _IMAGE_CACHE_LOCK:
+        if key in _IMAGE_CACHE:  # another thread built it meanwhile
+            _IMAGE_CACHE.move_to_end(key)
+            return _IMAGE_CACHE[key]
+        _IMAGE_CACHE[key] = arr
+        used = sum(a.nbytes for a in _IMAGE_CACHE.values())
+        while used > IMAGE_CACHE_BYTES:
+            used -= _IMAGE_CACHE.popitem(last=False)[1].nbytes
+    return arr
+
+def forget_image(path: str):
+    """Drop every cached plane of path (all versions)."""
+    path = os.path.abspath(path)
+    with _IMAGE_CACHE_LOCK:
+        for key in [k for k in _IMAGE_CACHE if k[0] == path]:
+            del _IMAGE_CACHE[key]
+
+def image_cache_info() -> dict:
+    """Hit/miss counters plus current entry count and size in bytes."""
+    with _IMAGE_CACHE_LOCK:
+        return dict(IMAGE_CACHE_STATS, entries=len(_IMAGE_CACHE),
+                    bytes=sum(a.nbytes for a in _IMAGE_CACHE.values()), budget=IMAGE_CACHE_BYTES)
+
+def clear_image_cache():
+    with _IMAGE_CACHE_LOCK:
+        _IMAGE_CACHE.clear()
+        IMAGE_CACHE_STATS.update(hits=0, misses=0)
+
+def _imread(path: str, flags):
+    img = cv2.imread(path, flags)
     if img is None:
         raise ValueError(f"Failed to read image: {path}")
     return img
 
+def load_bgr(path: str):
+    """Cached, read-only BGR decode."""
+    return cached_plane(path, "bgr", lambda p: _imread(p, cv2.IMREAD_COLOR))
+
 def imread_gray(path: str):
-    img = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+    """Cached, read-only grayscale decode (OpenCV's own, not derived from BGR)."""
+    return cached_plane(path, "gray", lambda p: _imread(p, cv2.IMREAD_GRAYSCALE))
+
+def load_y(path: str):
+    """Cached, read-only YCrCb luma plane of load_bgr(path)."""
+    # extractChannel gives an owned plane; a [:,:,0] view would keep the
+    # whole YCrCb array alive behind an entry that reports a third of it
+    return cached_plane(path, "y", lambda p: cv2.extractChannel(cv2.cvtColor(load_bgr(p), cv2.COLOR_BGR2YCrCb), 0))
+
+def read_source(src) -> bytes:
+    """Encoded image bytes from a bytes-like or binary file-like object."""
+    if hasattr(src, "read"):
+        return src.read()
+    return bytes(src)
+
+def decode_image(src, flags=cv2.IMREAD_COLOR):
+    """In-memory counterpart of cv2.imread.
+
+    Arrays pass through (gray and BGR are converted to match flags); bytes
+    and file-like objects are decoded with cv2.imdecode.
+    """
+    if isinstance(src, np.ndarray):
+        if flags == cv2.IMREAD_COLOR and src.ndim == 2:
+            return cv2.cvtColor(src, cv2.COLOR_GRAY2BGR)
+        if flags == cv2.IMREAD_GRAYSCALE and src.ndim == 3:
+            return cv2.cvtColor(src, cv2.COLOR_BGR2GRAY)
+        return src
+    img = cv2.imdecode(np.frombuffer(read_source(src), dtype=np.uint8), flags)
     if img is None:
-        raise ValueError(f"Failed to read image: {path}")
+        raise ValueError("Failed to decode image bytes.")
     return img
 
+def encode_image(img, ext: str = ".png") -> bytes:
+    """In-memory counterpart of cv_imwrite: the image encoded with cv2.imencode."""
+    ok, buf = cv2.imencode(ext, img)
+    if not ok:
+        raise ValueError(f"Failed to encode image as {ext}")
+    return buf.tobytes()
+
+# Array cores write into a caller-supplied out= buffer (or the input itself
+# when out is img) and keep their float working planes in per-thread
+# scratch buffers that are reused across calls, so a steady stream of
+# same-sized embeds allocates nothing proportional to the image.
+# stego_tools/utils/buffers.py (BufferUtils) mirrors these helpers.
+_SCRATCH = threading.local()
+
+def scratch(name: str, shape, dtype=np.float32):
+    """Per-thread reusable buffer viewed as shape (contents undefined); grows, never shrinks."""
+    pool = _SCRATCH.__dict__
+    n = int(np.prod(shape))
+    buf = pool.get((name, np.dtype(dtype)))
+    if buf is None or buf.size < n:
+        buf = pool[(name, np.dtype(dtype))] = np.empty(n, dtype)
+    return buf[:n].reshape(shape)
+
+def clear_scratch():
+    """Release this thread's scratch buffers."""
+    _SCRATCH.__dict__.clear()
+
+def output_buffer(img, out=None):
+    """Destination of an embed: a copy of img, or out filled with img (nothing to copy if out is img)."""
+    if out is None:
+        return img.copy()
+    if out.shape != img.shape or out.dtype != img.dtype:
+        raise ValueError(f"out must be {img.dtype} {img.shape}, got {out.dtype} {out.shape}")
+    if not out.flags.c_contiguous or not out.flags.writeable:
+        raise ValueError("out must be a writable C-contiguous array")
+    if out is not img:
+        np.copyto(out, img)
+    return out
+
 def cv_imwrite(path: str, img) -> bool:
+    forget_image(path)
     folder = os.path.dirname(path)
     if folder:
         os.makedirs(folder, exist_ok=True)
@@ -72,54 +202,470 @@ def cv_imwrite(path: str, img) -> bool:
     except Exception:
         return False
 
+# ---------------- Image headers ----------------
+# Capacity only depends on the cover's dimensions (load_bgr always yields 3
+# channels), so it is read from the file header without decoding pixels.
+# Every capacity formula is symmetric in height/width, so EXIF rotation,
+# which OpenCV applies on load, does not matter.
+JPEG_SOF = set(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+def _jpeg_size(f):
+    f.seek(2)
+    while True:
+        byte = f.read(1)
+        if not byte:
+            return None
+        if byte != b"\xff":
+            continue
+        marker = f.read(1)
+        while marker == b"\xff":
+            marker = f.read(1)
+        if not marker or marker[0] in (0xD9, 0xDA):
+            return None
+        if 0xD0 <= marker[0] <= 0xD7 or marker[0] == 0x01:
+            continue
+        length, = struct.unpack(">H", f.read(2))
+        if marker[0] in JPEG_SOF:
+            h, w = struct.unpack(">xHH", f.read(5))
+            return h, w
+        f.seek(length - 2, os.SEEK_CUR)
+
+def _tiff_size(f, head):
+    e = "<" if head[:2] == b"II" else ">"
+    f.seek(struct.unpack(e + "I", head[4:8])[0])
+    n, = struct.unpack(e + "H", f.read(2))
+    dims = {}
+    for _ in range(n):
+        tag, typ, _, raw = struct.unpack(e + "HHI4s", f.read(12))
+        if tag in (256, 257) and typ in (3, 4):
+            dims[tag] = struct.unpack(e + ("H" if typ == 3 else "I"), raw[:2 if typ == 3 else 4])[0]
+    return (dims[257], dims[256]) if len(dims) == 2 else None
+
+def _webp_size(head):
+    chunk = head[12:16]
+    if chunk == b"VP8X":
+        return 1 + int.from_bytes(head[27:30], "little"), 1 + int.from_bytes(head[24:27], "little")
+    if chunk == b"VP8L":
+        bits = int.from_bytes(head[21:25], "little")
+        return 1 + ((bits >> 14) & 0x3FFF), 1 + (bits & 0x3FFF)
+    if chunk == b"VP8 ":
+        w, h = struct.unpack("<HH", head[26:30])
+        return h & 0x3FFF, w & 0x3FFF
+    return None
+
+def image_size(path: str):
+    """(height, width) of an image from its header; other formats fall back to a decode."""
+    with open(path, "rb") as f:
+        size = header_size(f)
+    return size if size else load_bgr(path).shape[:2]
+
+def header_size(f):
+    """(height, width) read from the header of a seekable binary file, or None."""
+    size = None
+    head = f.read(32)
+    if head[:8] == b"\x89PNG\r\n\x1a\n" and head[12:16] == b"IHDR":
+        w, h = struct.unpack(">II", head[16:24]); size = h, w
+    elif head[:2] == b"\xff\xd8":
+        size = _jpeg_size(f)
+    elif head[:2] == b"BM":
+        if struct.unpack_from("<I", head, 14)[0] == 12:
+            w, h = struct.unpack_from("<HH", head, 18)
+        else:
+            w, h = struct.unpack_from("<ii", head, 18)
+        size = abs(h), w
+    elif head[:6] in (b"GIF87a", b"GIF89a"):
+        w, h = struct.unpack_from("<HH", head, 6); size = h, w
+    elif head[:4] in (b"II*\x00", b"MM\x00*"):
+        size = _tiff_size(f, head)
+    elif head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        size = _webp_size(head)
+    elif head[:2] in (b"P5", b"P6"):
+        fields = re.match(rb"P[56](?:\s+(?:#[^\n]*\n\s*)*(\d+))(?:\s+(?:#[^\n]*\n\s*)*(\d+))",
+                          head + f.read(480))
+        if fields:
+            size = int(fields.group(2)), int(fields.group(1))
+    return size
+
 # ---------------- LSB ----------------
+# Header is always 1 bit per channel; the magic's digit records how many
+# low bits per channel carry the payload ("LSB1" is the original format).
 MAGIC_LSB = b"LSB1"
 HEADER_BITS = 64
+LSB_MAX_BITS = 4
+
+def lsb_magic(bits_per_channel: int) -> bytes:
+    if not 1 <= bits_per_channel <= LSB_MAX_BITS:
+        raise ValueError(f"bits_per_channel must be 1..{LSB_MAX_BITS}.")
+    return b"LSB" + str(bits_per_channel).encode()
+
+def pack_chunks(data: bytes, k: int):
+    """Split data into k-bit values (MSB first), zero-padding the last one."""
+    bits = np.unpackbits(np.frombuffer(data, dtype=np.uint8))
+    pad = (-bits.size) % k
+    if pad:
+        bits = np.concatenate([bits, np.zeros(pad, dtype=np.uint8)])
+    weights = (1 << np.arange(k-1, -1, -1)).astype(np.uint8)
+    return (bits.reshape(-1, k) * weights).sum(axis=1, dtype=np.uint8)
+
+def unpack_chunks(values, k: int, nbytes: int) -> bytes:
+    """Inverse of pack_chunks: the low k bits of each value, MSB first."""
+    shifts = np.arange(k-1, -1, -1, dtype=np.uint8)
+    bits = (np.asarray(values, dtype=np.uint8)[:, None] >> shifts) & 1
+    return np.packbits(bits.ravel()[:nbytes*8]).tobytes()
+
+# Keyed scatter: with a key, header/payload slot i lives at perm(i), where perm
+# is a 4-round Feistel network over the index domain with cycle-walking, so
+# positions are computed per payload slot without an image-sized permutation.
+SCATTER_ROUNDS = 4
+SCATTER_BATCH = 1 << 16
 
-def lsb_capacity_bytes(image_path: str) -> int:
-    img = load_bgr(image_path)
-    flat = img.flatten()
-    return max(0, (flat.size - HEADER_BITS)//8)
+def _mix64(x):
+    # splitmix64 finalizer, vectorized over uint64 arrays (wrap-around intended)
+    x = x + np.uint64(0x9E3779B97F4A7C15)
+    x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
 
-def lsb_hide(cover_path: str, out_path: str, text: str, encoding="utf-8"):
+def _feistel(x, half: int, round_keys):
+    mask = np.uint64((1 << half) - 1)
+    sh = np.uint64(half)
+    left, right = x >> sh, x & mask
+    for rk in round_keys:
+        left, right = right, left ^ (_mix64(right ^ rk) & mask)
+    return (left << sh) | right
+
+def scatter_positions(n: int, start: int, stop: int, key: str):
+    """Keyed permutation of [0, n) evaluated at slots start..stop-1."""
+    digest = hashlib.sha256(key.encode("utf-8") + n.to_bytes(8, "big")).digest()
+    round_keys = np.frombuffer(digest, dtype=">u8").astype(np.uint64)[:SCATTER_ROUNDS]
+    half = max(1, ((n - 1).bit_length() + 1)//2)
+    out = np.empty(max(0, stop - start), dtype=np.int64)
+    for b in range(start, stop, SCATTER_BATCH):
+        x = np.arange(b, min(stop, b + SCATTER_BATCH), dtype=np.uint64)
+        x = _feistel(x, half, round_keys)
+        walk = np.flatnonzero(x >= n)
+        while walk.size:  # cycle-walk values that fall outside the domain
+            x[walk] = _feistel(x[walk], half, round_keys)
+            walk = walk[x[walk] >= n]
+        out[b - start:b - start + x.size] = x
+    return out
+
+def lsb_positions(n: int, start: int, stop: int, key=None):
+    """Carrier indices for slots start..stop-1: sequential, or scattered by key."""
+    if key is None:
+        return slice(start, stop)
+    return scatter_positions(n, start, stop, key)
+
+def lsb_capacity_bytes(image_path: str, bits_per_channel: int = 1) -> int:
+    return lsb_capacity_for(*image_size(image_path), bits_per_channel)
+
+def lsb_capacity_for(h: int, w: int, bits_per_channel: int = 1) -> int:
+    return max(0, (h*w*3 - HEADER_BITS)*bits_per_channel//8)
+
+def lsb_hide(cover_path: str, out_path: str, text: str, encoding="utf-8", bits_per_channel: int = 1, key=None):
+    """LSB-embed a cover file into out_path.
+
+    Uncompressed covers written to their own format (see lsb_streamable) go
+    through lsb_hide_mmap without being decoded; the rest are decoded.
+    """
+    if lsb_streamable(cover_path, out_path):
+        return lsb_hide_mmap(cover_path, out_path, text, encoding, bits_per_channel, key)
+    img = lsb_hide_array(load_bgr(cover_path), text, encoding, bits_per_channel, key)
+    if not cv_imwrite(out_path, img):
+        raise ValueError(f"Failed to write: {out_path}")
+
+def lsb_hide_array(img, text: str, encoding="utf-8", bits_per_channel: int = 1, key=None, out=None):
+    """LSB-embed into a BGR array and return the stego array.
+
+    Writes into out (see output_buffer; pass out=img to embed in place),
+    otherwise into a copy. Beyond out, peak extra memory is O(payload):
+    the packed chunks, plus for keyed positions 8 bytes per carrier and
+    about 64 more per carrier of the SCATTER_BATCH being scattered.
+    """
+    k = bits_per_channel
+    magic = lsb_magic(k)
     data = text.encode(encoding)
-    img = load_bgr(cover_path).copy()
-    flat = img.flatten()
-    payload = MAGIC_LSB + len(data).to_bytes(4, "big") + data
-    needed = len(payload)*8
-    if needed > flat.size:
+    header = pack_chunks(magic + len(data).to_bytes(4, "big"), 1)
+    chunks = pack_chunks(data, k)
+    if HEADER_BITS + chunks.size > img.size:
         raise ValueError(f"Not enough capacity (need {len(data)} bytes).")
-    i = 0
-    for bit in bytes_to_bits(payload):
-        flat[i] = (flat[i] & 0xFE) | bit
-        i += 1
-    out_img = flat.reshape(img.shape)
-    if not cv_imwrite(out_path, out_img):
-        raise ValueError(f"Failed to write: {out_path}")
+    img = output_buffer(img, out)
+    flat = img.ravel()
+    pos = lsb_positions(flat.size, 0, HEADER_BITS, key)
+    flat[pos] = (flat[pos] & 0xFE) | header
+    pos = lsb_positions(flat.size, HEADER_BITS, HEADER_BITS + chunks.size, key)
+    flat[pos] = (flat[pos] & np.uint8((0xFF << k) & 0xFF)) | chunks
+    return img
+
+def lsb_reveal(stego_path: str, encoding="utf-8", errors="replace", key=None) -> str:
+    """LSB-reveal a file; uncompressed images are read through lsb_reveal_mmap."""
+    if lsb_streamable(stego_path):
+        return lsb_reveal_mmap(stego_path, encoding, errors, key)
+    return lsb_reveal_array(load_bgr(stego_path), encoding, errors, key)
 
-def lsb_reveal(stego_path: str, encoding="utf-8", errors="replace") -> str:
-    img = load_bgr(stego_path)
-    flat = img.flatten()
+def lsb_reveal_array(img, encoding="utf-8", errors="replace", key=None) -> str:
+    flat = img.reshape(-1)
     if flat.size < HEADER_BITS:
         raise ValueError("Image too small for header.")
-    header = bits_to_bytes([flat[i] & 1 for i in range(HEADER_BITS)])
-    if len(header) < 8 or header[:4] != MAGIC_LSB:
+    header = unpack_chunks(flat[lsb_positions(flat.size, 0, HEADER_BITS, key)] & 1, 1, HEADER_BITS//8)
+    if header[:3] != MAGIC_LSB[:3] or header[3:4] not in b"1234":
         raise ValueError("No valid LSB payload (bad header).")
+    k = int(header[3:4])
     length = int.from_bytes(header[4:8], "big")
-    total = HEADER_BITS + length*8
-    if total > flat.size:
+    count = -(-length*8 // k)
+    if HEADER_BITS + count > flat.size:
         raise ValueError("Truncated LSB payload.")
-    data_bits = [flat[i] & 1 for i in range(HEADER_BITS, HEADER_BITS + length*8)]
-    return bits_to_bytes(data_bits).decode(encoding, errors=errors)
+    values = flat[lsb_positions(flat.size, HEADER_BITS, HEADER_BITS + count, key)] & ((1 << k) - 1)
+    return unpack_chunks(values, k, length).decode(encoding, errors=errors)
+
+# ---------------- LSB streaming (uncompressed covers) ----------------
+# For huge BMP/PPM/uncompressed-TIFF covers the pixel bytes are memory-mapped
+# and only the bytes that carry header/payload bits are touched, so memory
+# use is O(payload). Logical order matches load_bgr(): rows top-down, B,G,R.
+# lsb_hide()/lsb_reveal() take this path on their own whenever the file can
+# be mapped (and, for hiding, the output keeps the cover's format).
+
+def _bmp_layout(f):
+    hdr = f.read(54)
+    if len(hdr) < 54 or hdr[:2] != b"BM":
+        raise ValueError("Not a BMP file.")
+    offset, = struct.unpack_from("<I", hdr, 10)
+    w, h, _, bpp, comp = struct.unpack_from("<iiHHI", hdr, 18)
+    if comp != 0 or bpp not in (24, 32):
+        raise ValueError("Only uncompressed 24/32-bit BMP can be streamed.")
+    stride = ((w*bpp + 31)//32)*4
+    rows = np.arange(abs(h), dtype=np.int64)
+    if h > 0:  # bottom-up
+        rows = rows[::-1]
+    return offset + rows*stride, w, bpp//8, (0, 1, 2)
+
+def _ppm_layout(f):
+    head = f.read(512)
+    if head[:2] != b"P6":
+        raise ValueError("Only binary (P6) PPM can be streamed.")
+    fields, pos = [], 2
+    while len(fields) < 3:
+        while head[pos:pos+1].isspace():
+            pos += 1
+        if head[pos:pos+1] == b"#":
+            pos = head.index(b"\n", pos)
+            continue
+        start = pos
+        while not head[pos:pos+1].isspace():
+            pos += 1
+        fields.append(int(head[start:pos]))
+    w, h, maxval = fields
+    if maxval != 255:  # OpenCV rescales other ranges, so raw bytes would not match load_bgr()
+        raise ValueError("Only 8-bit (maxval 255) PPM can be streamed.")
+    offset = pos + 1
+    return offset + np.arange(h, dtype=np.int64)*w*3, w, 3, (2, 1, 0)
+
+def _tiff_layout(f):
+    head = f.read(8)
+    if head[:4] not in (b"II*\x00", b"MM\x00*"):
+        raise ValueError("Not a TIFF file.")
+    e = "<" if head[:2] == b"II" else ">"
+    ifd, = struct.unpack(e + "I", head[4:8])
+    f.seek(ifd)
+    n, = struct.unpack(e + "H", f.read(2))
+    sizes = {3: ("H", 2), 4: ("I", 4)}
+    tags = {}
+    for _ in range(n):
+        tag, typ, count, raw = struct.unpack(e + "HHI4s", f.read(12))
+        if typ not in sizes:
+            continue
+        fmt, width = sizes[typ]
+        if count*width <= 4:
+            vals = struct.unpack(e + fmt*count, raw[:count*width])
+        else:
+            here = f.tell()
+            f.seek(struct.unpack(e + "I", raw)[0])
+            vals = struct.unpack(e + fmt*count, f.read(count*width))
+            f.seek(here)
+        tags[tag] = vals
+    w, h = tags[256][0], tags[257][0]
+    spp = tags.get(277, (1,))[0]  # alpha TIFFs are premultiplied by OpenCV, so RGB only
+    if (tags.get(259, (1,))[0] != 1 or tags.get(262, (0,))[0] != 2 or spp != 3
+            or any(b != 8 for b in tags.get(258, (8,))) or tags.get(284, (1,))[0] != 1
+            or tags.get(274, (1,))[0] != 1 or 273 not in tags):
+        raise ValueError("Only uncompressed, chunky 8-bit RGB TIFF can be streamed.")
+    rps = tags.get(278, (h,))[0]
+    strips = np.asarray(tags[273], dtype=np.int64)
+    rows = np.arange(h, dtype=np.int64)
+    return strips[rows//rps] + (rows % rps)*w*3, w, 3, (2, 1, 0)
+
+RAW_LAYOUTS = {".bmp": _bmp_layout, ".ppm": _ppm_layout, ".tif": _tiff_layout, ".tiff": _tiff_layout}
+
+def lsb_streamable(path: str, out_path=None) -> bool:
+    """True if path is an uncompressed image the mmap LSB path can map and out_path (if given) keeps its format."""
+    parse = RAW_LAYOUTS.get(os.path.splitext(path)[1].lower())
+    if parse is None or (out_path and RAW_LAYOUTS.get(os.path.splitext(out_path)[1].lower()) is not parse):
+        return False
+    try:
+        raw_pixel_layout(path)
+    except (ValueError, KeyError, IndexError, struct.error, OSError):
+        return False
+    return True
+
+def raw_pixel_layout(path: str):
+    """Return (row_offsets, width, bytes_per_pixel, bgr_channel_map) for an uncompressed image."""
+    parse = RAW_LAYOUTS.get(os.path.splitext(path)[1].lower())
+    if parse is None:
+        raise ValueError(f"Streaming LSB needs a BMP/PPM/TIFF file: {path}")
+    with open(path, "rb") as f:
+        return parse(f)
+
+def raw_offsets(layout, idx):
+    """Map logical load_bgr() flat indices to byte offsets in the file."""
+    row_offsets, w, bpp, chmap = layout
+    row, rem = np.divmod(idx, w*3)
+    col, ch = np.divmod(rem, 3)
+    return row_offsets[row] + col*bpp + np.asarray(chmap, dtype=np.int64)[ch]
+
+def _raw_slots(n, start, stop, key):
+    pos = lsb_positions(n, start, stop, key)
+    return np.arange(pos.start, pos.stop, dtype=np.int64) if isinstance(pos, slice) else pos
+
+def lsb_hide_mmap(cover_path: str, out_path, text: str, encoding="utf-8", bits_per_channel: int = 1, key=None):
+    """LSB-embed into an uncompressed cover without decoding it.
+
+    Writes into a copy at out_path, or in place when out_path is None or
+    the cover itself. Output is readable by lsb_reveal().
+    """
+    k = bits_per_channel
+    magic = lsb_magic(k)
+    data = text.encode(encoding)
+    layout = raw_pixel_layout(cover_path)
+    total = layout[0].size*layout[1]*3
+    header = pack_chunks(magic + len(data).to_bytes(4, "big"), 1)
+    chunks = pack_chunks(data, k)
+    if HEADER_BITS + chunks.size > total:
+        raise ValueError(f"Not enough capacity (need {len(data)} bytes).")
+    target = cover_path
+    if out_path and os.path.abspath(out_path) != os.path.abspath(cover_path):
+        folder = os.path.dirname(out_path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        shutil.copyfile(cover_path, out_path)
+        target = out_path
+    forget_image(target)
+    mm = np.memmap(target, dtype=np.uint8, mode="r+")
+    try:
+        pos = raw_offsets(layout, _raw_slots(total, 0, HEADER_BITS, key))
+        mm[pos] = (mm[pos] & 0xFE) | header
+        pos = raw_offsets(layout, _raw_slots(total, HEADER_BITS, HEADER_BITS + chunks.size, key))
+        mm[pos] = (mm[pos] & np.uint8((0xFF << k) & 0xFF)) | chunks
+        mm.flush()
+    finally:
+        del mm
+
+def lsb_reveal_mmap(stego_path: str, encoding="utf-8", errors="replace", key=None) -> str:
+    """Read an LSB payload from an uncompressed image touching only its carrier bytes."""
+    layout = raw_pixel_layout(stego_path)
+    total = layout[0].size*layout[1]*3
+    if total < HEADER_BITS:
+        raise ValueError("Image too small for header.")
+    mm = np.memmap(stego_path, dtype=np.uint8, mode="r")
+    try:
+        header = unpack_chunks(mm[raw_offsets(layout, _raw_slots(total, 0, HEADER_BITS, key))] & 1, 1, HEADER_BITS//8)
+        if header[:3] != MAGIC_LSB[:3] or header[3:4] not in b"1234":
+            raise ValueError("No valid LSB payload (bad header).")
+        k = int(header[3:4])
+        length = int.from_bytes(header[4:8], "big")
+        count = -(-length*8 // k)
+        if HEADER_BITS + count > total:
+            raise ValueError("Truncated LSB payload.")
+        pos = raw_offsets(layout, _raw_slots(total, HEADER_BITS, HEADER_BITS + count, key))
+        values = mm[pos] & ((1 << k) - 1)
+    finally:
+        del mm
+    return unpack_chunks(values, k, length).decode(encoding, errors=errors)
+
+# ---------------- QIM helpers ----------------
+def qim_embed(coeffs, bits, step):
+    """Vectorized QIM: snap each coefficient to a multiple of step whose parity is its bit."""
+    q = np.rint(coeffs/step)
+    away = np.where(coeffs >= 0, 1, -1)
+    q = np.where((q.astype(np.int64) & 1) != bits, q + away, q)
+    q = np.where((q == 0) & (bits == 1), away, q)
+    return (q*step).astype(coeffs.dtype)
+
+def qim_extract(coeffs, step):
+    """Parity of the nearest multiple of step (0 for the zero bin), as uint8 bits."""
+    return (np.rint(coeffs/step).astype(np.int64) & 1).astype(np.uint8)
 
 # ---------------- DCT-QIM ----------------
 MAGIC_DCT = b"DCT1"
 COEFF_POSITIONS = [(3,3), (4,3), (3,4), (2,3), (3,2), (4,4)]
 DELTA = 12.0
+_DCT_BASIS = {}
+
+def dct_basis(n: int = 8):
+    """Orthonormal DCT-II matrix C (same scaling as cv2.dct: dct(X) == C @ X @ C.T), built once."""
+    C = _DCT_BASIS.get(n)
+    if C is None:
+        k, x = np.arange(n)[:, None], np.arange(n)[None, :]
+        C = np.sqrt(2.0/n)*np.cos(np.pi*(2*x + 1)*k/(2*n))
+        C[0] /= np.sqrt(2.0)
+        C = _DCT_BASIS[n] = C.astype(np.float32)
+    return C
+
+def plane_blocks(plane, nblocks=None):
+    """First nblocks 8x8 blocks of plane in raster order, as an (N, 8, 8) array."""
+    bw = plane.shape[1]//8
+    if nblocks is None:
+        nblocks = (plane.shape[0]//8)*bw
+    rows = -(-nblocks // bw)
+    blocks = plane[:rows*8, :bw*8].reshape(rows, 8, bw, 8).swapaxes(1, 2).reshape(-1, 8, 8)
+    return blocks[:nblocks]
+
+def put_blocks(plane, blocks):
+    """Write (N, 8, 8) blocks back into plane in raster order (inverse of plane_blocks)."""
+    bw = plane.shape[1]//8
+    full, rest = divmod(blocks.shape[0], bw)
+    if full:
+        plane[:full*8, :bw*8] = blocks[:full*bw].reshape(full, bw, 8, 8).swapaxes(1, 2).reshape(full*8, bw*8)
+    if rest:
+        plane[full*8:full*8+8, :rest*8] = blocks[full*bw:].swapaxes(0, 1).reshape(8, rest*8)
+
+def block_dct(blocks):
+    C = dct_basis()
+    return C @ blocks @ C.T
+
+def block_idct(coeffs):
+    C = dct_basis()
+    return C.T @ coeffs @ C
+
+def dct_coeffs_at(blocks, positions):
+    """Only the listed (r, c) DCT coefficients of each block, as an (N, len(positions)) array."""
+    C = dct_basis()
+    rows, cols = np.array(positions).T
+    return np.einsum("ki,nik->nk", C[rows], blocks @ C[cols].T)
+
+_DCT_PATTERNS = {}
+
+def dct_patterns(positions):
+    """Pixel-domain 8x8 basis image of each listed coefficient, cached per position list.
+
+    Since the DCT is linear, changing coefficient (r, c) by d changes the
+    block by d * outer(C[r], C[c]), so embedding needs no inverse transform.
+    """
+    key = tuple(positions)
+    P = _DCT_PATTERNS.get(key)
+    if P is None:
+        C = dct_basis()
+        rows, cols = np.array(positions).T
+        P = _DCT_PATTERNS[key] = C[rows][:, :, None]*C[cols][:, None, :]
+    return P
+
+# Reveal works in chunks of blocks/coefficients so memory stays bounded and
+# only the region covered by the header and the declared length is touched.
+REVEAL_CHUNK = 1 << 14
 
 def dct_capacity_bytes(image_path: str) -> int:
-    img = load_bgr(image_path)
-    h, w = img.shape[:2]
+    return dct_capacity_for(*image_size(image_path))
+
+def dct_capacity_for(h: int, w: int) -> int:
     H8, W8 = (h//8)*8, (w//8)*8
     if H8 == 0 or W8 == 0: return 0
     blocks = (H8//8)*(W8//8)
@@ -127,11 +673,22 @@ def dct_capacity_bytes(image_path: str) -> int:
     return max(0, cap_bits//8)
 
 def dct_hide(cover_path: str, out_path: str, text: str, encoding="utf-8"):
+    out_img = dct_hide_array(load_bgr(cover_path), text, encoding)
+    if not cv_imwrite(out_path, out_img):
+        raise ValueError(f"Failed to write: {out_path}")
+
+def dct_hide_array(img, text: str, encoding="utf-8", out=None):
+    """DCT-QIM-embed into the luma of a BGR array; returns the stego BGR array.
+
+    Writes into out (see output_buffer; pass out=img to embed in place),
+    otherwise into a copy. Only the 8-pixel block rows that carry the
+    payload go through YCrCb and back; the rest of the image is left
+    untouched. Those rows live in per-thread scratch (3 uint8 + 1 float32
+    per pixel), so beyond out, peak extra memory is about 7*8*W bytes per
+    payload block row, plus O(payload) for the block coefficients.
+    """
     data = text.encode(encoding)
-    img = load_bgr(cover_path)
-    ycrcb = cv2.cvtColor(img, cv2.COLOR_BGR2YCrCb)
-    Y = ycrcb[:,:,0].astype(np.float32)
-    h, w = Y.shape
+    h, w = img.shape[:2]
     H8, W8 = (h//8)*8, (w//8)*8
     if H8 == 0 or W8 == 0:
         raise ValueError("Image must be at least 8x8.")
@@ -141,168 +698,1204 @@ def dct_hide(cover_path: str, out_path: str, text: str, encoding="utf-8"):
     needed = len(payload)*8
     if needed > capacity_bits:
         raise ValueError(f"Not enough capacity (need {len(data)} bytes).")
-    bit_it = bytes_to_bits(payload)
-    Yw = Y.copy()
-    done = False
-    for i in range(0, H8, 8):
-        for j in range(0, W8, 8):
-            dct = cv2.dct(Yw[i:i+8, j:j+8] - 128.0)
-            for (r,c) in COEFF_POSITIONS:
-                try:
-                    bit = next(bit_it)
-                except StopIteration:
-                    done = True; break
-                coeff = dct[r,c]
-                q = int(np.rint(coeff/DELTA))
-                if (q & 1) != bit:
-                    q += 1 if coeff >= 0 else -1
-                if q == 0 and bit == 1:
-                    q = 1 if coeff >= 0 else -1
-                dct[r,c] = float(q*DELTA)
-            Yw[i:i+8, j:j+8] = cv2.idct(dct) + 128.0
-            if done: break
-        if done: break
-    ycrcb[:,:,0] = np.clip(Yw, 0, 255).astype(np.uint8)
-    out_img = cv2.cvtColor(ycrcb, cv2.COLOR_YCrCb2BGR)
-    if not cv_imwrite(out_path, out_img):
-        raise ValueError(f"Failed to write: {out_path}")
+    bits = np.unpackbits(np.frombuffer(payload, dtype=np.uint8))
+    nblocks = -(-needed // len(COEFF_POSITIONS))
+    rows = -(-nblocks // (W8//8))*8
+    img = output_buffer(img, out)
+    ycrcb = cv2.cvtColor(img[:rows], cv2.COLOR_BGR2YCrCb, dst=scratch("dct_ycrcb", (rows, w, 3), np.uint8))
+    Y = scratch("dct_y", (rows, w))
+    Y[...] = ycrcb[:,:,0]
+    # Only the payload blocks are touched: their target coefficients come from
+    # dot products, and the QIM change is added back as basis patterns
+    blocks = plane_blocks(Y, nblocks)
+    coeffs = dct_coeffs_at(blocks - 128.0, COEFF_POSITIONS)
+    delta = np.zeros_like(coeffs).ravel()
+    delta[:needed] = qim_embed(coeffs.ravel()[:needed], bits, DELTA) - coeffs.ravel()[:needed]
+    blocks += np.einsum("nk,kij->nij", delta.reshape(coeffs.shape), dct_patterns(COEFF_POSITIONS))
+    put_blocks(Y, blocks)
+    ycrcb[:,:,0] = np.clip(Y, 0, 255, out=Y)
+    cv2.cvtColor(ycrcb, cv2.COLOR_YCrCb2BGR, dst=img[:rows])
+    return img
+
+def dct_block_bits(Y, first: int, stop: int):
+    """QIM bits of blocks first..stop-1 (raster order) of a luma plane, converting only the rows they span."""
+    bw = Y.shape[1]//8
+    r0, r1 = first//bw, -(-stop//bw)
+    Y = Y[r0*8:r1*8].astype(np.float32)
+    blocks = plane_blocks(Y, stop - r0*bw)[first - r0*bw:]
+    return qim_extract(dct_coeffs_at(blocks - 128.0, COEFF_POSITIONS).ravel(), DELTA)
+
+def dct_read_bits(Y, start: int, stop: int):
+    """Payload bits start..stop-1 of a luma plane, transforming only the blocks that hold them."""
+    npos = len(COEFF_POSITIONS)
+    first, last = start//npos, -(-stop//npos)
+    parts = [dct_block_bits(Y, b, min(last, b + REVEAL_CHUNK)) for b in range(first, last, REVEAL_CHUNK)]
+    bits = np.concatenate(parts) if parts else np.zeros(0, dtype=np.uint8)
+    return bits[start - first*npos:stop - first*npos]
 
 def dct_reveal(stego_path: str, encoding="utf-8", errors="replace") -> str:
-    img = load_bgr(stego_path)
-    ycrcb = cv2.cvtColor(img, cv2.COLOR_BGR2YCrCb)
-    Y = ycrcb[:,:,0].astype(np.float32)
+    return dct_reveal_array(load_y(stego_path), encoding, errors)
+
+def dct_reveal_array(img, encoding="utf-8", errors="replace") -> str:
+    """Reveal from a BGR array or an already extracted 2-D luma plane."""
+    Y = img if img.ndim == 2 else cv2.cvtColor(img, cv2.COLOR_BGR2YCrCb)[:,:,0]
     h, w = Y.shape
     H8, W8 = (h//8)*8, (w//8)*8
     if H8 == 0 or W8 == 0:
         raise ValueError("Image must be at least 8x8.")
-    def iter_bits():
-        for i in range(0, H8, 8):
-            for j in range(0, W8, 8):
-                dct = cv2.dct(Y[i:i+8, j:j+8] - 128.0)
-                for (r,c) in COEFF_POSITIONS:
-                    q = int(np.rint(dct[r,c]/DELTA))
-                    yield (q & 1) if q != 0 else 0
-    bits = iter_bits()
-    # header
-    header_bits = []
-    try:
-        for _ in range(HEADER_BITS):
-            header_bits.append(next(bits))
-    except StopIteration:
+    capacity_bits = (H8//8)*(W8//8)*len(COEFF_POSITIONS)
+    if capacity_bits < HEADER_BITS:
         raise ValueError("Image too small for header.")
-    header = bits_to_bytes(header_bits)
-    if len(header) < 8 or header[:4] != MAGIC_DCT:
+    header = np.packbits(dct_read_bits(Y, 0, HEADER_BITS)).tobytes()
+    if header[:4] != MAGIC_DCT:
         raise ValueError("No valid DCT payload (bad header).")
     length = int.from_bytes(header[4:8], "big")
-    data_bits = []
-    try:
-        for _ in range(length*8):
-            data_bits.append(next(bits))
-    except StopIteration:
+    if HEADER_BITS + length*8 > capacity_bits:
         raise ValueError("Truncated DCT payload.")
-    return bits_to_bytes(data_bits).decode(encoding, errors=errors)
+    data_bits = dct_read_bits(Y, HEADER_BITS, HEADER_BITS + length*8)
+    return np.packbits(data_bits).tobytes().decode(encoding, errors=errors)
+
+# ---------------- Haar DWT (built-in) ----------------
+# Matches pywt.dwt2(..., "haar", mode="symmetric"). Each 2x2 block is one
+# sum/difference butterfly per axis with the two 1/sqrt(2) factors folded
+# into an exact 1/2, so untouched blocks reconstruct bit-exactly. Strips of
+# HAAR_TILE_ROWS pixel rows keep float temporaries bounded; no full-size
+# float copy of the image is made. This is a float butterfly, not integer
+# lifting: coefficients are float32 (halves for odd sums). stego_tools/dwt/
+# haar.py holds a copy for the package; tests pin the two to each other and
+# to pywt, since the DWT wire format depends on the exact coefficients.
+HAAR_TILE_ROWS = 512
+
+def haar_dwt2(img, tile_rows: int = HAAR_TILE_ROWS, out=None):
+    """(cA, (cH, cV, cD)) of a 2-D image; odd edges repeat the last row/column.
+
+    out, if given, is four float32 arrays of the band shape to fill.
+    """
+    h, w = img.shape
+    shape = ((h + 1)//2, (w + 1)//2)
+    cA, cH, cV, cD = out if out is not None else (np.empty(shape, np.float32) for _ in range(4))
+    step = max(2, tile_rows - tile_rows % 2)
+    for r0 in range(0, h, step):
+        strip = np.asarray(img[r0:r0+step], dtype=np.float32)
+        if strip.shape[0] % 2: strip = np.concatenate([strip, strip[-1:]], axis=0)
+        if w % 2: strip = np.concatenate([strip, strip[:, -1:]], axis=1)
+        rows = slice(r0//2, r0//2 + strip.shape[0]//2)
+        even, odd = strip[0::2], strip[1::2]
+        s0, d0 = even[:, 0::2] + even[:, 1::2], even[:, 0::2] - even[:, 1::2]
+        s1, d1 = odd[:, 0::2] + odd[:, 1::2], odd[:, 0::2] - odd[:, 1::2]
+        np.add(s0, s1, out=cA[rows]); np.subtract(s0, s1, out=cH[rows])
+        np.add(d0, d1, out=cV[rows]); np.subtract(d0, d1, out=cD[rows])
+    for band in (cA, cH, cV, cD):
+        band *= 0.5
+    return cA, (cH, cV, cD)
+
+def haar_idwt2(coeffs, out, tile_rows: int = HAAR_TILE_ROWS):
+    """Rebuild into out (cropped to its shape; clipped and truncated if out is uint8)."""
+    cA, (cH, cV, cD) = coeffs
+    hc, wc = cA.shape
+    h, w = out.shape
+    step = max(1, tile_rows//2)
+    for b0 in range(0, min(hc, -(-h//2)), step):
+        rows = slice(b0, min(hc, b0 + step))
+        p, m = cA[rows] + cH[rows], cA[rows] - cH[rows]
+        q, r = cV[rows] + cD[rows], cV[rows] - cD[rows]
+        strip = np.empty((2*p.shape[0], 2*wc), np.float32)
+        strip[0::2, 0::2], strip[0::2, 1::2] = p + q, p - q
+        strip[1::2, 0::2], strip[1::2, 1::2] = m + r, m - r
+        strip *= 0.5
+        if out.dtype == np.uint8:
+            np.clip(strip, 0, 255, out=strip)
+        out[2*b0:2*b0 + strip.shape[0]] = strip[:h - 2*b0, :w]
+    return out
 
 # ---------------- DWT-QIM ----------------
 MAGIC_DWT = b"DWT1"
 WAVELET = "haar"
 Q = 14.0  # QIM step
+HAS_DWT = HAS_PYWT or WAVELET == "haar"
+
+def dwt2(img):
+    """Level-1 (cA, (cH, cV, cD)); Haar always uses the built-in tiled backend."""
+    if WAVELET == "haar":
+        return haar_dwt2(img)
+    return pywt.dwt2(img.astype(np.float32), wavelet=WAVELET, mode="symmetric")
+
+def idwt2(coeffs, shape):
+    """Inverse of dwt2 as a uint8 image of the given shape."""
+    if WAVELET == "haar":
+        return haar_idwt2(coeffs, np.empty(shape, np.uint8))
+    rec = pywt.idwt2(coeffs, wavelet=WAVELET, mode="symmetric")[:shape[0], :shape[1]]
+    return np.clip(rec, 0, 255).astype(np.uint8)
 
 def dwt_capacity_bytes(image_path: str) -> int:
-    if not HAS_PYWT: return 0
-    img = imread_gray(image_path).astype(np.float32)
-    cA,(cH,cV,cD) = pywt.dwt2(img, wavelet=WAVELET, mode="symmetric")
-    coeffs = cH.size + cV.size
-    return max(0, (coeffs - HEADER_BITS)//8)
+    if not HAS_DWT: return 0
+    return dwt_capacity_for(*image_size(image_path))
+
+def dwt_capacity_for(h: int, w: int) -> int:
+    """cH + cV coefficient count of a level-1 symmetric-mode transform, minus the header."""
+    if not HAS_DWT: return 0
+    if WAVELET == "haar":
+        hc, wc = (h + 1)//2, (w + 1)//2
+    else:
+        flen = pywt.Wavelet(WAVELET).dec_len
+        hc, wc = pywt.dwt_coeff_len(h, flen, "symmetric"), pywt.dwt_coeff_len(w, flen, "symmetric")
+    return max(0, (2*hc*wc - HEADER_BITS)//8)
 
 def dwt_hide(cover_path: str, out_path: str, text: str, encoding="utf-8"):
-    if not HAS_PYWT:
+    if not HAS_DWT:
+        raise RuntimeError("PyWavelets not installed. Use Python 3.12 or install pywavelets.")
+    rec = dwt_hide_array(imread_gray(cover_path), text, encoding)
+    if not cv_imwrite(out_path, rec):
+        raise ValueError(f"Failed to write: {out_path}")
+
+def dwt_hide_array(img, text: str, encoding="utf-8", out=None):
+    """DWT-QIM-embed into a grayscale (or BGR, converted) array; returns the grayscale stego array.
+
+    Writes into out (see output_buffer; pass out=img to embed in place on a
+    grayscale array), otherwise into a copy. With the built-in Haar only the
+    top strip of pixel rows whose cH/cV coefficients carry the payload is
+    transformed and rebuilt (untouched 2x2 blocks reconstruct exactly), with
+    bands in per-thread scratch: beyond out, peak extra memory is 16 bytes
+    per pixel of that strip. Other wavelets transform the whole image.
+    """
+    if not HAS_DWT:
         raise RuntimeError("PyWavelets not installed. Use Python 3.12 or install pywavelets.")
     data = text.encode(encoding)
-    img = imread_gray(cover_path).astype(np.float32)
-    H,W = img.shape
+    gray = img if img.ndim == 2 else cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    if WAVELET != "haar":
+        rec = dwt_embed(gray.shape, dwt2(gray), data)
+        return rec if out is None else output_buffer(rec, out)
+    h, w = gray.shape
+    hc, wc = (h + 1)//2, (w + 1)//2
+    needed = (len(data) + len(MAGIC_DWT) + 4)*8
+    if needed > 2*hc*wc:
+        raise ValueError(f"Not enough capacity (need {len(data)} bytes).")
+    nH = min(needed, hc*wc)
+    rows = max(-(-nH // wc), -(-(needed - nH) // wc))
+    if out is None and gray is not img:
+        out = gray  # converted from BGR, so already a private copy
+    gray = output_buffer(gray, out)
+    strip = gray[:2*rows]
+    bands = [scratch("dwt_" + name, (rows, wc)) for name in ("cA", "cH", "cV", "cD")]
+    haar_dwt2(strip, out=bands)
+    # The strip's bands are the first rows of the full image's bands, but
+    # cV must be addressed as if it had hc rows for the bit order to match
+    dwt_embed_bands(bands[1], bands[2], data, hc*wc)
+    haar_idwt2((bands[0], tuple(bands[1:])), strip)
+    return gray
+
+def dwt_embed_bands(cH, cV, data: bytes, band_size=None):
+    """QIM-embed the DWT payload in place: cH carries the first band_size bits, cV the rest."""
     payload = MAGIC_DWT + len(data).to_bytes(4,"big") + data
     needed = len(payload)*8
-    cA,(cH,cV,cD) = pywt.dwt2(img, wavelet=WAVELET, mode="symmetric")
-    coeffs = cH.size + cV.size
-    if needed > coeffs:
+    band_size = cH.size if band_size is None else band_size
+    bits = np.unpackbits(np.frombuffer(payload, dtype=np.uint8))
+    nH = min(needed, band_size)
+    flatH, flatV = cH.ravel(), cV.ravel()
+    flatH[:nH] = qim_embed(flatH[:nH], bits[:nH], Q)
+    flatV[:needed - nH] = qim_embed(flatV[:needed - nH], bits[nH:], Q)
+
+def dwt_embed(shape, bands, data: bytes):
+    """QIM-embed data into cH then cV of (cA, (cH, cV, cD)) in place and rebuild a uint8 image of shape."""
+    (H,W), (cA,(cH,cV,cD)) = shape, bands
+    if len(data)*8 + HEADER_BITS > cH.size + cV.size:
         raise ValueError(f"Not enough capacity (need {len(data)} bytes).")
-    bit_it = bytes_to_bits(payload)
-    def embed(arr, written):
-        flat = arr.ravel()
-        for i in range(flat.size):
-            if written >= needed: break
-            try:
-                bit = next(bit_it)
-            except StopIteration:
-                break
-            cval = flat[i]
-            q = int(np.rint(cval/Q))
-            if (q & 1) != bit:
-                q += 1 if cval >= 0 else -1
-            if q == 0 and bit == 1:
-                q = 1 if cval >= 0 else -1
-            flat[i] = float(q*Q)
-            written += 1
-        return written
-    written = 0
-    written = embed(cH, written)
-    written = embed(cV, written)
-    if written < needed:
-        raise RuntimeError("Internal error: ran out of coefficients.")
-    rec = pywt.idwt2((cA,(cH,cV,cD)), wavelet=WAVELET, mode="symmetric")
-    rec = rec[:H,:W]
-    rec = np.clip(rec, 0, 255).astype(np.uint8)
-    if not cv_imwrite(out_path, rec):
-        raise ValueError(f"Failed to write: {out_path}")
+    dwt_embed_bands(cH, cV, data)
+    return idwt2((cA,(cH,cV,cD)), (H,W))
+
+def dwt_detail_rows(img, r0: int, r1: int):
+    """Rows r0..r1-1 of cH and cV, transforming only the pixel rows they depend on.
+
+    The 2-tap Haar filter makes each coefficient row depend on two pixel
+    rows only; other wavelets fall back to a full transform.
+    """
+    if WAVELET != "haar":
+        _, (cH, cV, _) = dwt2(img)
+        return cH[r0:r1], cV[r0:r1]
+    _, (cH, cV, _) = haar_dwt2(img[2*r0:2*r1])
+    return cH, cV
+
+def dwt_read_bits(img, start: int, stop: int):
+    """QIM bits of coefficients start..stop-1 in cH-then-cV order."""
+    Hc, Wc = (img.shape[0] + 1)//2, (img.shape[1] + 1)//2
+    band_size = Hc*Wc
+    parts = []
+    for band, a, b in ((0, start, min(stop, band_size)), (1, max(start - band_size, 0), stop - band_size)):
+        step = max(Wc, REVEAL_CHUNK - REVEAL_CHUNK % Wc)
+        for c0 in range(a, b, step):
+            c1 = min(b, c0 + step)
+            r0, r1 = c0//Wc, -(-c1//Wc)
+            coeffs = dwt_detail_rows(img, r0, r1)[band].ravel()
+            parts.append(qim_extract(coeffs[c0 - r0*Wc:c1 - r0*Wc], Q))
+    return np.concatenate(parts) if parts else np.zeros(0, dtype=np.uint8)
 
 def dwt_reveal(stego_path: str, encoding="utf-8", errors="replace") -> str:
-    if not HAS_PYWT:
+    if not HAS_DWT:
         raise RuntimeError("PyWavelets not installed.")
-    img = imread_gray(stego_path).astype(np.float32)
-    cA,(cH,cV,cD) = pywt.dwt2(img, wavelet=WAVELET, mode="symmetric")
-    def iter_bits():
-        for cval in cH.ravel():
-            q = int(np.rint(cval/Q)); yield (q & 1) if q != 0 else 0
-        for cval in cV.ravel():
-            q = int(np.rint(cval/Q)); yield (q & 1) if q != 0 else 0
-    bits = iter_bits()
-    header_bits = []
-    try:
-        for _ in range(HEADER_BITS):
-            header_bits.append(next(bits))
-    except StopIteration:
+    return dwt_reveal_array(imread_gray(stego_path), encoding, errors)
+
+def dwt_reveal_array(img, encoding="utf-8", errors="replace") -> str:
+    """Reveal from a grayscale (or BGR, converted) array."""
+    if not HAS_DWT:
+        raise RuntimeError("PyWavelets not installed.")
+    if img.ndim == 3:
+        img = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    capacity_bits = 2*((img.shape[0] + 1)//2)*((img.shape[1] + 1)//2)
+    if capacity_bits < HEADER_BITS:
         raise ValueError("Image too small for header.")
-    header = bits_to_bytes(header_bits)
-    if len(header) < 8 or header[:4] != MAGIC_DWT:
+    header = np.packbits(dwt_read_bits(img, 0, HEADER_BITS)).tobytes()
+    if header[:4] != MAGIC_DWT:
         raise ValueError("No valid DWT payload (bad header).")
     length = int.from_bytes(header[4:8], "big")
-    data_bits = []
-    try:
-        for _ in range(length*8):
-            data_bits.append(next(bits))
-    except StopIteration:
+    if HEADER_BITS + length*8 > capacity_bits:
         raise ValueError("Truncated DWT payload.")
-    return bits_to_bytes(data_bits).decode(encoding, errors=errors)
+    data_bits = dwt_read_bits(img, HEADER_BITS, HEADER_BITS + length*8)
+    return np.packbits(data_bits).tobytes().decode(encoding, errors=errors)
+
+# ---------------- JPEG coefficient domain (baseline) ----------------
+# Baseline JPEG covers are embedded in their quantized DCT coefficients: the
+# scan is Huffman-decoded, bits go into the magnitude parity of AC
+# coefficients with |v| >= 2 (a set that embedding never changes), and the
+# scan is re-encoded with optimized tables. There is no IDCT, colour
+# conversion or requantization, and the output is still a JPEG.
+MAGIC_JPG = b"JPG1"
+M_SOS, M_DHT, M_DRI = 0xDA, 0xC4, 0xDD
+BASELINE_SOF = (0xC0, 0xC1)
+OTHER_SOF = (0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF)
+SCAN_END = re.compile(rb"\xff(?=[^\x00\xd0-\xd7])")
+RST_MARKER = re.compile(rb"\xff[\xd0-\xd7]")
+PACK_CHUNK = 1 << 16
+
+def jpeg_segments(data: bytes):
+    """Split a JPEG into [(marker, body)] up to and including SOS, the scan bytes and the trailer."""
+    if data[:2] != b"\xff\xd8":
+        raise ValueError("Not a JPEG file.")
+    segs, pos = [], 2
+    while True:
+        while data[pos:pos+2] == b"\xff\xff":
+            pos += 1
+        if len(data) < pos + 4 or data[pos] != 0xFF:
+            raise ValueError("Corrupt JPEG marker stream.")
+        marker = data[pos+1]
+        length = struct.unpack(">H", data[pos+2:pos+4])[0]
+        segs.append((marker, data[pos+4:pos+2+length]))
+        pos += 2 + length
+        if marker == M_SOS:
+            break
+    end = SCAN_END.search(data, pos)
+    end = end.start() if end else len(data)
+    return segs, data[pos:end], data[end:]
+
+def huff_table(counts, symbols):
+    """Canonical codes of a DHT table as 256-entry (code, length) arrays."""
+    code_of = np.zeros(256, dtype=np.int64)
+    len_of = np.zeros(256, dtype=np.int64)
+    code, k = 0, 0
+    for L in range(1, 17):
+        for _ in range(counts[L-1]):
+            code_of[symbols[k]], len_of[symbols[k]] = code, L
+            code += 1; k += 1
+        code <<= 1
+    return code_of, len_of
+
+def huff_lut(counts, symbols):
+    """16-bit peek -> (length << 8) | symbol decode table (0 marks an invalid code)."""
+    code_of, len_of = huff_table(counts, symbols)
+    lut = [0]*65536
+    for sym in symbols:
+        L, c = int(len_of[sym]), int(code_of[sym])
+        lut[c << (16-L):(c+1) << (16-L)] = [(L << 8) | sym]*(1 << (16-L))
+    return lut
+
+def huff_optimal(freq):
+    """Length-limited optimal (counts, symbols) for symbol frequencies (ITU T.81 Annex K.2)."""
+    freq = [int(f) for f in freq] + [1]  # reserved symbol keeps the all-ones code unused
+    codesize, others = [0]*257, [-1]*257
+    while True:
+        c1 = c2 = -1
+        for i in range(257):
+            if freq[i] and (c1 < 0 or freq[i] <= freq[c1]):
+                c1 = i
+        for i in range(257):
+            if freq[i] and i != c1 and (c2 < 0 or freq[i] <= freq[c2]):
+                c2 = i
+        if c2 < 0:
+            break
+        freq[c1] += freq[c2]; freq[c2] = 0
+        codesize[c1] += 1
+        while others[c1] >= 0:
+            c1 = others[c1]; codesize[c1] += 1
+        others[c1] = c2
+        codesize[c2] += 1
+        while others[c2] >= 0:
+            c2 = others[c2]; codesize[c2] += 1
+    bits = [0]*33
+    for size in codesize:
+        if size:
+            bits[size] += 1
+    for i in range(32, 16, -1):
+        while bits[i] > 0:
+            j = i - 2
+            while bits[j] == 0:
+                j -= 1
+            bits[i] -= 2; bits[i-1] += 1; bits[j+1] += 2; bits[j] -= 1
+    i = 16
+    while bits[i] == 0:
+        i -= 1
+    bits[i] -= 1
+    symbols = [s for L in range(1, 33) for s in range(256) if codesize[s] == L]
+    return bytes(bits[1:17]), bytes(symbols)
+
+# Upper bound on the entropy-coded bytes one block can consume: a DC code
+# and magnitude (16 + 32 bits) plus 63 AC codes and magnitudes (16 + 15 bits).
+# The bit reader is padded by this much, so a truncated or corrupt scan runs
+# into the padding, not past the buffer, before the per-block check fires.
+JPEG_BLOCK_MAX_BYTES = 256
+
+def _jpeg_decode_interval(buf: bytes, nmcu: int, plan, row0: int, idx, val):
+    """Huffman-decode nmcu MCUs of one restart interval, appending nonzero (flat index, value) pairs."""
+    nbits = len(buf)*8
+    raw = np.frombuffer(buf + b"\xff"*(JPEG_BLOCK_MAX_BYTES + 4), dtype=np.uint8).astype(np.uint32)
+    w = array("I")
+    w.frombytes(((raw[:-3] << 24) | (raw[1:-2] << 16) | (raw[2:-1] << 8) | raw[3:]).tobytes())
+    p, r = 0, row0
+    pred = {}
+    for _ in range(nmcu):
+        for c, dlut, alut in plan:
+            v = dlut[(w[p >> 3] << (p & 7)) >> 16 & 0xFFFF]
+            if not v:
+                raise ValueError("Corrupt JPEG scan (bad DC code).")
+            p += v >> 8; s = v & 0xFF
+            e = 0
+            if s:
+                e = ((w[p >> 3] << (p & 7)) & 0xFFFFFFFF) >> (32 - s); p += s
+                if e < 1 << (s - 1):
+                    e -= (1 << s) - 1
+            pred[c] = pred.get(c, 0) + e
+            base = r*64
+            idx.append(base); val.append(pred[c])
+            k = 1
+            while k < 64:
+                v = alut[(w[p >> 3] << (p & 7)) >> 16 & 0xFFFF]
+                if not v:
+                    raise ValueError("Corrupt JPEG scan (bad AC code).")
+                p += v >> 8; rs = v & 0xFF
+                s = rs & 15
+                if s:
+                    k += rs >> 4
+                    if k > 63:
+                        raise ValueError("Corrupt JPEG scan (run past block end).")
+                    e = ((w[p >> 3] << (p & 7)) & 0xFFFFFFFF) >> (32 - s); p += s
+                    if e < 1 << (s - 1):
+                        e -= (1 << s) - 1
+                    idx.append(base + k); val.append(e)
+                    k += 1
+                elif rs == 0xF0:
+                    k += 16
+                else:
+                    break
+            r += 1
+            if p > nbits:
+                raise ValueError("Truncated JPEG scan.")
+
+def jpeg_read(path: str, max_mcus=None):
+    """Parse a single-scan baseline JPEG into its quantized coefficients (no IDCT).
+
+    Returns a dict whose "coeffs" is an (N, 64) int32 array of blocks in scan
+    (MCU) order, each block in zigzag order, with "comp" and "mcu" giving the
+    scan component and MCU index of every block. With max_mcus only the first
+    MCUs are decoded (for header probes; such a result cannot be written).
+    """
+    with open(path, "rb") as f:
+        return jpeg_parse(f.read(), max_mcus)
+
+def jpeg_parse(data: bytes, max_mcus=None):
+    """jpeg_read() on the bytes of a JPEG file.
+
+    Malformed input raises ValueError, like unsupported input does.
+    """
+    try:
+        return _jpeg_parse(data, max_mcus)
+    except (IndexError, KeyError, ZeroDivisionError, struct.error) as e:
+        raise ValueError(f"Corrupt JPEG header ({e}).") from e
+
+def _jpeg_parse(data: bytes, max_mcus=None):
+    segs, scan, trailer = jpeg_segments(data)
+    frame, tables, restart = None, {}, 0
+    for marker, body in segs:
+        if marker in OTHER_SOF:
+            raise ValueError("Only baseline (sequential Huffman) JPEGs are supported.")
+        if marker in BASELINE_SOF:
+            prec, height, width, nf = struct.unpack(">BHHB", body[:6])
+            if prec != 8 or height == 0:
+                raise ValueError("Unsupported JPEG frame (needs 8-bit samples and a known height).")
+            frame = (height, width, [(body[6+3*i], body[7+3*i] >> 4, body[7+3*i] & 15) for i in range(nf)])
+        elif marker == M_DHT:
+            i = 0
+            while i < len(body):
+                n = sum(body[i+1:i+17])
+                if len(body) < i + 17 + n:
+                    raise ValueError("Corrupt JPEG Huffman table.")
+                tables[(body[i] >> 4, body[i] & 15)] = (body[i+1:i+17], body[i+17:i+17+n])
+                i += 17 + n
+        elif marker == M_DRI:
+            restart = struct.unpack(">H", body[:2])[0]
+    if frame is None:
+        raise ValueError("No baseline frame header found.")
+    height, width, comps = frame
+    sos = segs[-1][1]
+    ns = sos[0]
+    ids = [c[0] for c in comps]
+    scomps = [(ids.index(sos[1+2*i]), sos[2+2*i] >> 4, sos[2+2*i] & 15) for i in range(ns)]
+    if ns != len(comps) or tuple(sos[1+2*ns:3+2*ns]) != (0, 63) or not trailer.startswith(b"\xff\xd9"):
+        raise ValueError("Only single-scan baseline JPEGs are supported.")
+    if ns == 1:
+        # Non-interleaved: one block per MCU, sampling factors ignored
+        hmax, vmax = max(c[1] for c in comps), max(c[2] for c in comps)
+        _, h, v = comps[scomps[0][0]]
+        mcux = -(-(-(-width*h // hmax)) // 8)
+        mcuy = -(-(-(-height*v // vmax)) // 8)
+        layout = [(scomps[0][0], 1)]
+    else:
+        hmax, vmax = max(c[1] for c in comps), max(c[2] for c in comps)
+        mcux, mcuy = -(-width // (8*hmax)), -(-height // (8*vmax))
+        layout = [(ci, comps[ci][1]*comps[ci][2]) for ci, _, _ in scomps]
+    mcus = mcux*mcuy
+    total_mcus = mcus
+    if max_mcus is not None:
+        mcus = min(mcus, max_mcus)
+    luts = {}
+    def lut(tc, th):
+        if (tc, th) not in tables:
+            raise ValueError("JPEG scan references a missing Huffman table.")
+        if (tc, th) not in luts:
+            luts[(tc, th)] = huff_lut(*tables[(tc, th)])
+        return luts[(tc, th)]
+    plan = []
+    for (ci, td, ta), (_, nblk) in zip(scomps, layout):
+        plan += [(ci, lut(0, td), lut(1, ta))]*nblk
+    pieces = RST_MARKER.split(scan) if restart else [scan]
+    per = restart or total_mcus
+    if len(pieces) < -(-total_mcus // per):
+        raise ValueError("Truncated JPEG scan (missing restart intervals).")
+    idx, val = [], []
+    for i in range(-(-mcus // per)):
+        _jpeg_decode_interval(pieces[i].replace(b"\xff\x00", b"\xff"), min(per, mcus - i*per),
+                              plan, i*per*len(plan), idx, val)
+    coeffs = np.zeros(mcus*len(plan)*64, dtype=np.int32)
+    coeffs[np.array(idx, dtype=np.int64)] = val
+    return {"segments": segs, "trailer": trailer, "restart": restart, "scan": scomps,
+            "coeffs": coeffs.reshape(-1, 64),
+            "comp": np.tile([c for c, _, _ in plan], mcus),
+            "mcu": np.repeat(np.arange(mcus), len(plan)),
+            "tables": {c: (td, ta) for c, td, ta in scomps}}
+
+def _size_bits(v):
+    """JPEG magnitude category and appended bits of each value."""
+    s = np.frexp(np.abs(v).astype(np.float64))[1].astype(np.int64)
+    return s, np.where(v >= 0, v, v + (1 << s) - 1)
+
+def _pack_codes(vals, lens):
+    """Concatenate variable-length codes (MSB first, at most 32 bits each) into bytes."""
+    out = []
+    for a in range(0, vals.size, PACK_CHUNK):
+        v, L = vals[a:a+PACK_CHUNK, None], lens[a:a+PACK_CHUNK, None]
+        j = np.arange(32)
+        bits = (v >> np.maximum(L - 1 - j, 0)) & 1
+        out.append(bits[j < L].astype(np.uint8))
+    return np.packbits(np.concatenate(out)).tobytes() if out else b""
+
+def jpeg_write(jpg, path: str):
+    """Entropy-code jpeg_read() output (optimized Huffman tables) and write it as a JPEG."""
+    data = jpeg_encode(jpg)
+    folder = os.path.dirname(path)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data)
+
+def jpeg_encode(jpg) -> bytes:
+    """Entropy-code jpeg_read() output into the bytes of a JPEG file."""
+    S = jpg["coeffs"].astype(np.int64)
+    comp, mcu, restart = jpg["comp"], jpg["mcu"], jpg["restart"]
+    N = S.shape[0]
+    interval = mcu // restart if restart else np.zeros(N, dtype=np.int64)
+    dct_tab = np.array([jpg["tables"][c][0] for c in comp], dtype=np.int64)
+    act_tab = np.array([jpg["tables"][c][1] for c in comp], dtype=np.int64)
+    # DC: differences against the previous block of the same component,
+    # with the predictor reset at every restart interval
+    dc = S[:, 0]
+    diff = np.empty(N, dtype=np.int64)
+    for c in np.unique(comp):
+        r = np.flatnonzero(comp == c)
+        prev = np.concatenate([[0], dc[r][:-1]])
+        prev[np.concatenate([[True], interval[r][1:] != interval[r][:-1]])] = 0
+        diff[r] = dc[r] - prev
+    dc_s, dc_e = _size_bits(diff)
+    # AC: (run, size) symbols, ZRL for runs of 16+ zeros, EOB unless position 63 is set
+    rows, cols = np.nonzero(S[:, 1:])
+    k = cols + 1
+    v = S[rows, k]
+    first = np.concatenate([[True], rows[1:] != rows[:-1]]) if rows.size else np.zeros(0, bool)
+    prev_k = np.concatenate([[0], k[:-1]]) if rows.size else k
+    run = k - np.where(first, 0, prev_k) - 1
+    nzrl = run // 16
+    ac_s, ac_e = _size_bits(v)
+    last_k = np.zeros(N, dtype=np.int64)
+    if rows.size:
+        ends = np.concatenate([rows[1:] != rows[:-1], [True]])
+        last_k[rows[ends]] = k[ends]
+    eob = np.flatnonzero(last_k < 63)
+    zr = np.repeat(np.arange(rows.size), nzrl)
+    zr_sub = np.arange(zr.size) - np.repeat(np.cumsum(nzrl) - nzrl, nzrl)
+    # Every item: (owning row, sort key, table class, table id, symbol, extra bits, extra length)
+    items = [
+        (np.arange(N), np.zeros(N, np.int64), 0, dct_tab, dc_s, dc_e, dc_s),
+        (rows, k*4 + 3, 1, act_tab[rows], (run % 16)*16 + ac_s, ac_e, ac_s),
+        (rows[zr], k[zr]*4 + zr_sub, 1, act_tab[rows[zr]], np.full(zr.size, 0xF0), np.zeros(zr.size, np.int64), np.zeros(zr.size, np.int64)),
+        (eob, np.full(eob.size, 1000), 1, act_tab[eob], np.zeros(eob.size, np.int64), np.zeros(eob.size, np.int64), np.zeros(eob.size, np.int64)),
+    ]
+    new_tables, codes = {}, {}
+    for tc in (0, 1):
+        for th in sorted({tabs[tc] for tabs in jpg["tables"].values()}):
+            freq = np.zeros(256, dtype=np.int64)
+            for _, _, itc, tab, sym, _, _ in items:
+                if itc == tc:
+                    freq += np.bincount(sym[tab == th], minlength=256)
+            new_tables[(tc, th)] = huff_optimal(freq)
+            codes[(tc, th)] = huff_table(*new_tables[(tc, th)])
+    keys, vals, lens = [], [], []
+    for row, key, tc, tab, sym, e, s in items:
+        code = np.zeros(row.size, dtype=np.int64); L = np.zeros(row.size, dtype=np.int64)
+        for th in np.unique(tab):
+            m = tab == th
+            code[m] = codes[(tc, th)][0][sym[m]]; L[m] = codes[(tc, th)][1][sym[m]]
+        keys.append(row*1024 + key); vals.append((code << s) | e); lens.append(L + s)
+    # Pad each restart interval to a byte boundary with 1-bits
+    row_keys = np.concatenate(keys)
+    lens_all = np.concatenate(lens)
+    nint = int(interval[-1]) + 1 if N else 0
+    totals = np.bincount(interval[row_keys // 1024], weights=lens_all, minlength=nint).astype(np.int64)
+    pad = (-totals) % 8
+    last_rows = np.flatnonzero(np.concatenate([interval[1:] != interval[:-1], [True]]))
+    keys.append(last_rows*1024 + 1023); vals.append((1 << pad) - 1); lens.append(pad)
+    order = np.argsort(np.concatenate(keys), kind="stable")
+    scan = _pack_codes(np.concatenate(vals)[order], np.concatenate(lens)[order])
+    bounds = np.concatenate([[0], np.cumsum((totals + pad)//8)])
+    out = bytearray()
+    for i in range(nint):
+        if i:
+            out += bytes([0xFF, 0xD0 + (i - 1) % 8])
+        out += scan[bounds[i]:bounds[i+1]].replace(b"\xff", b"\xff\x00")
+    dht = b"".join(bytes([tc << 4 | th]) + counts + symbols for (tc, th), (counts, symbols) in sorted(new_tables.items()))
+    head = bytearray(b"\xff\xd8")
+    for marker, body in jpg["segments"]:
+        if marker == M_DHT:
+            continue
+        if marker == M_SOS:
+            head += b"\xff" + bytes([M_DHT]) + struct.pack(">H", len(dht) + 2) + dht
+        head += b"\xff" + bytes([marker]) + struct.pack(">H", len(body) + 2) + body
+    return bytes(head) + bytes(out) + jpg["trailer"]
+
+def jpeg_carriers(coeffs):
+    """Flat indices of the AC coefficients with |v| >= 2, in scan order."""
+    mask = np.abs(coeffs) >= 2
+    mask[:, 0] = False
+    return np.flatnonzero(mask)
+
+def jpeg_capacity_bytes(image) -> int:
+    """JPEG-technique capacity of a JPEG path, its bytes or a file-like object."""
+    try:
+        jpg = jpeg_read(image) if isinstance(image, (str, os.PathLike)) else jpeg_parse(read_source(image))
+    except ValueError:
+        return 0
+    return max(0, (jpeg_carriers(jpg["coeffs"]).size - HEADER_BITS)//8)
+
+def jpeg_hide(cover_path: str, out_path: str, text: str, encoding="utf-8"):
+    jpg = jpeg_read(cover_path)
+    jpeg_embed(jpg, text.encode(encoding))
+    jpeg_write(jpg, out_path)
+
+def jpeg_hide_bytes(cover, text: str, encoding="utf-8") -> bytes:
+    """jpeg_hide() from JPEG bytes (or a file-like object) to JPEG bytes."""
+    jpg = jpeg_parse(read_source(cover))
+    jpeg_embed(jpg, text.encode(encoding))
+    return jpeg_encode(jpg)
+
+def jpeg_embed(jpg, data: bytes):
+    """Write the JPG1 header and data into the carrier parities of parsed coefficients, in place."""
+    flat = jpg["coeffs"].reshape(-1)
+    pos = jpeg_carriers(jpg["coeffs"])
+    payload = MAGIC_JPG + len(data).to_bytes(4, "big") + data
+    bits = np.unpackbits(np.frombuffer(payload, dtype=np.uint8)).astype(np.int32)
+    if bits.size > pos.size:
+        raise ValueError(f"Not enough capacity (need {len(data)} bytes).")
+    pos = pos[:bits.size]
+    v = flat[pos]
+    flat[pos] = np.sign(v)*((np.abs(v) & ~1) | bits)
+
+def jpeg_reveal(stego_path: str, encoding="utf-8", errors="replace") -> str:
+    return jpeg_extract(jpeg_read(stego_path), encoding, errors)
+
+def jpeg_reveal_bytes(stego, encoding="utf-8", errors="replace") -> str:
+    return jpeg_extract(jpeg_parse(read_source(stego)), encoding, errors)
+
+def jpeg_extract(jpg, encoding="utf-8", errors="replace") -> str:
+    flat = jpg["coeffs"].reshape(-1)
+    pos = jpeg_carriers(jpg["coeffs"])
+    if pos.size < HEADER_BITS:
+        raise ValueError("Image too small for header.")
+    header = np.packbits(np.abs(flat[pos[:HEADER_BITS]]) & 1).tobytes()
+    if header[:4] != MAGIC_JPG:
+        raise ValueError("No valid JPEG payload (bad header).")
+    length = int.from_bytes(header[4:8], "big")
+    if HEADER_BITS + length*8 > pos.size:
+        raise ValueError("Truncated JPEG payload.")
+    data_bits = np.abs(flat[pos[HEADER_BITS:HEADER_BITS + length*8]]) & 1
+    return np.packbits(data_bits).tobytes().decode(encoding, errors=errors)
+
+# ---------------- Capacity planning ----------------
+IMAGE_EXTS = (".png", ".bmp", ".tif", ".tiff", ".webp", ".gif", ".jpg", ".jpeg", ".ppm", ".pgm")
+
+def capacity_plan(image) -> dict:
+    """Capacity in bytes per technique ("LSB1".."LSB4", "DCT", "DWT") from the header only.
+
+    image is a path, encoded bytes, a file-like object or a decoded array.
+    JPEG-coefficient capacity depends on coefficient values, so it is left
+    out; use jpeg_capacity_bytes() for that.
+    """
+    if isinstance(image, (str, os.PathLike)):
+        h, w = image_size(image)
+    elif isinstance(image, np.ndarray):
+        h, w = image.shape[:2]
+    else:
+        data = read_source(image)
+        try:
+            size = header_size(io.BytesIO(data))
+        except struct.error:
+            size = None
+        h, w = size or decode_image(data).shape[:2]
+    plan = {f"LSB{k}": lsb_capacity_for(h, w, k) for k in range(1, LSB_MAX_BITS + 1)}
+    plan["DCT"] = dct_capacity_for(h, w)
+    if HAS_DWT:
+        plan["DWT"] = dwt_capacity_for(h, w)
+    return plan
+
+def covers_that_fit(directory: str, payload_bytes: int):
+    """[(path, [techniques whose capacity fits the payload])] for images in a directory, without decoding pixels."""
+    fits = []
+    for name in sorted(os.listdir(directory)):
+        path = os.path.join(directory, name)
+        if not name.lower().endswith(IMAGE_EXTS) or not os.path.isfile(path):
+            continue
+        try:
+            plan = capacity_plan(path)
+        except (OSError, ValueError, struct.error):
+            continue
+        techs = [tech for tech, cap in plan.items() if cap >= payload_bytes]
+        if techs:
+            fits.append((path, techs))
+    return fits
 
 # ---------------- GUI ----------------
-TECHS = ["LSB", "DCT"] + (["DWT"] if HAS_PYWT else [])
+TECHS = ["LSB", "DCT"] + (["DWT"] if HAS_DWT else []) + ["JPEG"]
+
+def hide(tech: str, cover_path: str, out_path: str, text: str, bits_per_channel: int = 1, key=None):
+    if tech == "LSB":
+        lsb_hide(cover_path, out_path, text, bits_per_channel=bits_per_channel, key=key)
+    elif tech == "DCT":
+        dct_hide(cover_path, out_path, text)
+    elif tech == "DWT":
+        dwt_hide(cover_path, out_path, text)
+    elif tech == "JPEG":
+        jpeg_hide(cover_path, out_path, text)
+    else:
+        raise RuntimeError("Unknown technique")
+
+def reveal(tech: str, stego_path: str, key=None) -> str:
+    if tech == "LSB":
+        return lsb_reveal(stego_path, key=key)
+    elif tech == "DCT":
+        return dct_reveal(stego_path)
+    elif tech == "DWT":
+        return dwt_reveal(stego_path)
+    elif tech == "JPEG":
+        return jpeg_reveal(stego_path)
+    raise RuntimeError("Unknown technique")
+
+def default_out(cover_path: str, tech: str, stream: bool = False) -> str:
+    """Default stego path next to the cover; with stream, LSB keeps an uncompressed cover's format (so lsb_hide maps it)."""
+    root, ext = os.path.splitext(cover_path)
+    if stream and tech == "LSB" and lsb_streamable(cover_path):
+        return root + "_stego" + ext
+    return root + ("_stego.jpg" if tech == "JPEG" else "_stego.png")
+
+# In-memory counterparts of hide()/reveal(): images are encoded bytes,
+# binary file-like objects or decoded arrays (BGR, or grayscale for DWT),
+# and nothing touches the disk. JPEG works on the encoded bytes themselves.
+def hide_array(tech: str, image, text: str, bits_per_channel: int = 1, key=None, out=None):
+    """Stego image as an array (BGR, or grayscale for DWT), written into out if given.
+
+    A caller's array is never modified unless it is passed as out as well;
+    images decoded here are embedded in place.
+    """
+    if tech == "JPEG":
+        raise ValueError("The JPEG technique works on encoded JPEG bytes; use hide_bytes().")
+    img = decode_image(image, cv2.IMREAD_GRAYSCALE if tech == "DWT" else cv2.IMREAD_COLOR)
+    if out is None and img is not image:
+        out = img
+    if tech == "LSB":
+        return lsb_hide_array(img, text, bits_per_channel=bits_per_channel, key=key, out=out)
+    elif tech == "DCT":
+        return dct_hide_array(img, text, out=out)
+    elif tech == "DWT":
+        return dwt_hide_array(img, text, out=out)
+    raise RuntimeError("Unknown technique")
+
+def hide_bytes(tech: str, image, text: str, ext: str = ".png", bits_per_channel: int = 1, key=None) -> bytes:
+    """Stego image encoded as ext (always a JPEG for the JPEG technique)."""
+    if tech == "JPEG":
+        if isinstance(image, np.ndarray):
+            raise ValueError("The JPEG technique needs the encoded JPEG, not pixels.")
+        return jpeg_hide_bytes(image, text)
+    return encode_image(hide_array(tech, image, text, bits_per_channel, key), ext)
+
+def reveal_image(tech: str, image, key=None) -> str:
+    if tech == "LSB":
+        return lsb_reveal_array(decode_image(image), key=key)
+    elif tech == "DCT":
+        return dct_reveal_array(decode_image(image))
+    elif tech == "DWT":
+        return dwt_reveal_array(decode_image(image, cv2.IMREAD_GRAYSCALE))
+    elif tech == "JPEG":
+        if isinstance(image, np.ndarray):
+            raise ValueError("The JPEG technique needs the encoded JPEG, not pixels.")
+        return jpeg_reveal_bytes(image)
+    raise RuntimeError("Unknown technique")
+
+# ---------------- Auto-detect ----------------
+# Every technique starts with the same 64-bit header (4-byte magic + length),
+# so auto-detect reads just those bits per technique from one shared decode
+# (a few DCT blocks, two DWT coefficient rows, the first JPEG MCUs) and only
+# runs the full reveal where the magic matches. Probes and reveals take a
+# sources dict of zero-argument callables returning the planes they need
+# ("bgr", "y", "gray") and the encoded JPEG ("jpeg", None if not a JPEG), so
+# files (path_sources) and in-memory images (image_sources) share one routine.
+JPEG_PROBE_MCUS = 64
+
+def probe_gray(path: str):
+    """Grayscale plane for probing, taken from the BGR decode when all channels agree.
+
+    DWT stego images are written as grayscale, and for those this equals
+    imread_gray() without decoding the file a second time.
+    """
+    bgr = load_bgr(path)
+    if (bgr[:,:,0] == bgr[:,:,1]).all() and (bgr[:,:,0] == bgr[:,:,2]).all():
+        return cached_plane(path, "gray", lambda p: np.ascontiguousarray(bgr[:,:,0]))
+    return imread_gray(path)
+
+def path_sources(path: str) -> dict:
+    """Auto-detect sources of an image file; planes come from the image cache."""
+    def jpeg():
+        with open(path, "rb") as f:
+            if f.read(2) != b"\xff\xd8":
+                return None
+            return b"\xff\xd8" + f.read()
+    return {"bgr": lambda: load_bgr(path), "y": lambda: load_y(path),
+            "gray": lambda: probe_gray(path), "jpeg": jpeg}
+
+def image_sources(image) -> dict:
+    """Auto-detect sources of encoded bytes, a file-like object or a decoded array (decoded once, here)."""
+    data = None if isinstance(image, np.ndarray) else read_source(image)
+    bgr = decode_image(image if data is None else data)
+    if (bgr[:,:,0] == bgr[:,:,1]).all() and (bgr[:,:,0] == bgr[:,:,2]).all():
+        gray = np.ascontiguousarray(bgr[:,:,0])
+    else:
+        gray = decode_image(image if data is None else data, cv2.IMREAD_GRAYSCALE)
+    y = cv2.extractChannel(cv2.cvtColor(bgr, cv2.COLOR_BGR2YCrCb), 0)
+    jpeg = data if data is not None and data[:2] == b"\xff\xd8" else None
+    return {"bgr": lambda: bgr, "y": lambda: y, "gray": lambda: gray, "jpeg": lambda: jpeg}
 
-def try_decode_all(stego_path: str):
+def lsb_probe(src: dict, key=None) -> bool:
+    flat = src["bgr"]().reshape(-1)
+    if flat.size < HEADER_BITS:
+        return False
+    header = unpack_chunks(flat[lsb_positions(flat.size, 0, HEADER_BITS, key)] & 1, 1, HEADER_BITS//8)
+    return header[:3] == MAGIC_LSB[:3] and header[3:4] in b"1234"
+
+def dct_probe(src: dict, key=None) -> bool:
+    Y = src["y"]()
+    if (Y.shape[0]//8)*(Y.shape[1]//8)*len(COEFF_POSITIONS) < HEADER_BITS:
+        return False
+    return np.packbits(dct_read_bits(Y, 0, HEADER_BITS)).tobytes()[:4] == MAGIC_DCT
+
+def dwt_probe(src: dict, key=None) -> bool:
+    img = src["gray"]()
+    if 2*((img.shape[0] + 1)//2)*((img.shape[1] + 1)//2) < HEADER_BITS:
+        return False
+    return np.packbits(dwt_read_bits(img, 0, HEADER_BITS)).tobytes()[:4] == MAGIC_DWT
+
+def jpeg_probe(src: dict, key=None) -> bool:
+    data = src["jpeg"]()
+    if data is None:
+        return False
+    jpg = jpeg_parse(data, max_mcus=JPEG_PROBE_MCUS)
+    pos = jpeg_carriers(jpg["coeffs"])
+    if pos.size < HEADER_BITS:
+        jpg = jpeg_parse(data)  # sparse start of scan: the header spans more MCUs
+        pos = jpeg_carriers(jpg["coeffs"])
+        if pos.size < HEADER_BITS:
+            return False
+    flat = jpg["coeffs"].reshape(-1)
+    return np.packbits(np.abs(flat[pos[:HEADER_BITS]]) & 1).tobytes()[:4] == MAGIC_JPG
+
+PROBES = {"LSB": lsb_probe, "DCT": dct_probe, "DWT": dwt_probe, "JPEG": jpeg_probe}
+
+def reveal_sources(tech: str, src: dict, key=None) -> str:
+    """reveal() on auto-detect sources."""
+    if tech == "LSB":
+        return lsb_reveal_array(src["bgr"](), key=key)
+    elif tech == "DCT":
+        return dct_reveal_array(src["y"]())
+    elif tech == "DWT":
+        return dwt_reveal_array(src["gray"]())
+    elif tech == "JPEG":
+        data = src["jpeg"]()
+        if data is None:
+            raise ValueError("Not a JPEG file.")
+        return jpeg_reveal_bytes(data)
+    raise RuntimeError("Unknown technique")
+
+def try_decode_sources(src: dict, key=None, workers: int = 0):
+    """Return (technique, text) of the first technique, in TECHS order, that reveals a payload.
+
+    Header probes run in a thread pool of the given size when workers > 1.
+    """
+    names = [name for name in TECHS if name != "DWT" or HAS_DWT]
     errors = {}
-    # Try LSB, then DCT, then DWT (if available)
-    order = TECHS
-    for name in order:
+    def probe(name):
+        try:
+            return PROBES[name](src, key)
+        except Exception as e:
+            errors[name] = str(e)
+            return False
+    src["bgr"]()  # one shared decode before the probes fan out
+    if workers > 1:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            hits = list(pool.map(probe, names))
+    else:
+        hits = [probe(name) for name in names]
+    for name, hit in zip(names, hits):
+        if not hit:
+            errors.setdefault(name, "bad header")
+            continue
         try:
-            if name == "LSB":
-                return "LSB", lsb_reveal(stego_path)
-            elif name == "DCT":
-                return "DCT", dct_reveal(stego_path)
-            elif name == "DWT" and HAS_PYWT:
-                return "DWT", dwt_reveal(stego_path)
+            return name, reveal_sources(name, src, key=key)
         except Exception as e:
             errors[name] = str(e)
     raise RuntimeError(f"No valid payload found with any technique.\nErrors: {errors}")
 
+def try_decode_all(stego_path: str, key=None, workers: int = 0):
+    """try_decode_sources() on an image file."""
+    return try_decode_sources(path_sources(stego_path), key, workers)
+
+def try_decode_image(image, key=None, workers: int = 0):
+    """try_decode_sources() on encoded bytes, a file-like object or a decoded array."""
+    return try_decode_sources(image_sources(image), key, workers)
+
+# ---------------- Batch (headless) ----------------
+# python tri_tool_minimal.py batch encode --tech DCT --message-file msg.txt --out-dir out/ covers/
+# python tri_tool_minimal.py batch decode --results found.jsonl --checkpoint run.ckpt stego/ more.jsonl
+# Sources are directories (scanned recursively for IMAGE_EXTS), image files,
+# or .jsonl manifests with one job per line ({"input": ...} plus optional
+# "id", "output", "tech", "message", "bits", "key"). One JSON result per job
+# is streamed to --results (appended) or stdout; progress goes to stderr.
+# With --stream, LSB outputs of uncompressed covers keep the cover's format,
+# so huge BMP/PPM/TIFF covers are embedded via mmap instead of decoded.
+# Finished jobs are appended to --checkpoint as their job_key, and a rerun
+# with the same checkpoint skips jobs whose key is listed: the same input
+# with another technique, message, bits, key or output runs again.
+BATCH_QUEUE_PER_WORKER = 4
+BATCH_KEY_FIELDS = ("tech", "message", "bits", "key", "output")
+
+def batch_jobs(op: str, sources, defaults: dict, out_dir=None, stream: bool = False):
+    """Expand directories, image files and JSONL manifests into job dicts (stream: see default_out)."""
+    jobs = []
+    def add(job, base=None):
+        job = {**defaults, **job, "op": op}
+        job.setdefault("id", f"{op}:{os.path.abspath(job['input'])}")
+        if op == "encode" and not job.get("output"):
+            out = default_out(job["input"], job["tech"], stream)
+            if out_dir:
+                rel = os.path.relpath(out, base) if base else os.path.basename(out)
+                out = os.path.join(out_dir, rel)
+            job["output"] = out
+        jobs.append(job)
+    for src in sources:
+        if os.path.isdir(src):
+            for folder, dirs, files in os.walk(src):
+                dirs.sort()
+                for name in sorted(files):
+                    # Encoding skips earlier outputs that sit among the covers
+                    if name.lower().endswith(IMAGE_EXTS) and (op == "decode" or "_stego." not in name):
+                        add({"input": os.path.join(folder, name)}, src)
+        elif src.lower().endswith(".jsonl"):
+            with open(src, encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        add(json.loads(line))
+        else:
+            add({"input": src})
+    return jobs
+
+def job_key(job: dict) -> str:
+    """Checkpoint key of a job: its id plus a digest of everything that shapes its result."""
+    params = {name: job.get(name) for name in BATCH_KEY_FIELDS}
+    params.update(op=job["op"], input=os.path.abspath(job["input"]), bits=int(job.get("bits", 1)))
+    if params["output"]:
+        params["output"] = os.path.abspath(params["output"])
+    digest = hashlib.sha256(json.dumps(params, sort_keys=True).encode("utf-8")).hexdigest()
+    return f"{job['id']}#{digest[:32]}"
+
+def run_job(job: dict) -> dict:
+    """Run one batch job; errors are reported in the result, never raised."""
+    t0 = time.perf_counter()
+    result = {"id": job["id"], "op": job["op"], "input": job["input"]}
+    try:
+        if job["op"] == "encode":
+            hide(job["tech"], job["input"], job["output"], job["message"],
+                 bits_per_channel=int(job.get("bits", 1)), key=job.get("key"))
+            result.update(output=job["output"], tech=job["tech"])
+        elif job.get("tech"):
+            result.update(tech=job["tech"], message=reveal(job["tech"], job["input"], key=job.get("key")))
+        else:
+            tech, message = try_decode_all(job["input"], key=job.get("key"))
+            result.update(tech=tech, message=message)
+        result["ok"] = True
+    except Exception as e:
+        result.update(ok=False, error=str(e))
+    result["seconds"] = round(time.perf_counter() - t0, 4)
+    return result
+
+def run_jobs(jobs, workers: int):
+    """Yield (job, run_job result) pairs as they finish, keeping at most a few jobs queued per worker."""
+    if workers <= 1:
+        for job in jobs:
+            yield job, run_job(job)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = {}
+        for job in jobs:
+            pending[pool.submit(run_job, job)] = job
+            if len(pending) >= workers*BATCH_QUEUE_PER_WORKER:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                yield from ((pending.pop(f), f.result()) for f in done)
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            yield from ((pending.pop(f), f.result()) for f in done)
+
+def _progress(done: int, total: int, failed: int, t0: float):
+    elapsed = time.perf_counter() - t0
+    rate = done/elapsed if elapsed > 0 else 0.0
+    eta = int((total - done)/rate) if rate else 0
+    sys.stderr.write(f"\r{done}/{total} done, {failed} failed, {rate:.1f}/s, "
+                     f"ETA {eta//3600}:{eta//60 % 60:02d}:{eta % 60:02d} ")
+    sys.stderr.flush()
+
+def batch_main(argv) -> int:
+    parser = argparse.ArgumentParser(prog="tri_tool_minimal.py batch",
+                                     description="Headless batch encode/decode")
+    parser.add_argument("op", choices=["encode", "decode"])
+    parser.add_argument("sources", nargs="+", help="Directories, image files or .jsonl manifests")
+    parser.add_argument("--tech", choices=["LSB", "DCT", "DWT", "JPEG"],
+                        help="Technique (decode auto-detects when omitted)")
+    parser.add_argument("--message", help="Text to hide")
+    parser.add_argument("--message-file", help="UTF-8 file with the text to hide")
+    parser.add_argument("--bits", type=int, default=1, choices=range(1, LSB_MAX_BITS + 1), help="LSB bits per channel")
+    parser.add_argument("--key", help="LSB scatter key")
+    parser.add_argument("--out-dir", help="Directory for stego images (default: next to each cover)")
+    parser.add_argument("--stream", action="store_true",
+                        help="LSB: keep uncompressed BMP/PPM/TIFF covers in their format and embed via mmap")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--results", help="JSONL file to append results to (default: stdout)")
+    parser.add_argument("--checkpoint", help="File of finished job keys; rerun with it to resume")
+    args = parser.parse_args(argv)
+
+    defaults = {"bits": args.bits}
+    if args.tech:
+        defaults["tech"] = args.tech
+    if args.key:
+        defaults["key"] = args.key
+    if args.op == "encode":
+        if args.message_file:
+            with open(args.message_file, encoding="utf-8") as f:
+                defaults["message"] = f.read()
+        elif args.message is not None:
+            defaults["message"] = args.message
+    jobs = batch_jobs(args.op, args.sources, defaults, args.out_dir, args.stream)
+    if args.op == "encode":
+        missing = [j["input"] for j in jobs if "message" not in j or "tech" not in j]
+        if missing:
+            parser.error(f"encode needs --tech and --message/--message-file (or per-job values): {missing[0]}")
+
+    finished = set()
+    if args.checkpoint and os.path.exists(args.checkpoint):
+        with open(args.checkpoint, encoding="utf-8") as f:
+            finished = {line.rstrip("\n") for line in f if line.strip()}
+    todo = [j for j in jobs if job_key(j) not in finished]
+    if finished:
+        sys.stderr.write(f"Resuming: {len(jobs) - len(todo)} of {len(jobs)} jobs already done\n")
+
+    out = open(args.results, "a", encoding="utf-8") if args.results else sys.stdout
+    ckpt = open(args.checkpoint, "a", encoding="utf-8") if args.checkpoint else None
+    failed, t0 = 0, time.perf_counter()
+    shown = t0
+    try:
+        for done, (job, result) in enumerate(run_jobs(todo, args.workers), 1):
+            out.write(json.dumps(result, ensure_ascii=False) + "\n"); out.flush()
+            if ckpt:
+                ckpt.write(job_key(job) + "\n"); ckpt.flush()
+            failed += not result["ok"]
+            if time.perf_counter() - shown > 0.2 or done == len(todo):
+                _progress(done, len(todo), failed, t0)
+                shown = time.perf_counter()
+    finally:
+        if out is not sys.stdout:
+            out.close()
+        if ckpt:
+            ckpt.close()
+        sys.stderr.write("\n")
+    return 1 if failed else 0
+
+# ---------------- HTTP service ----------------
+# python tri_tool_minimal.py serve --port 8765 --workers 4 --queue 16 [--processes]
+# POST /encode, /decode, /detect, /capacity with the image bytes as the body
+# and parameters (tech, message, bits, key, format) in the query string, or a
+# JSON body {"image": <base64>, ...parameters}. /encode answers with the
+# stego image bytes, the rest with JSON. GET /health reports the load.
+# At most workers + queue requests are admitted; the rest get 429 with
+# Retry-After before their body is read. The engines stay loaded in the
+# long-running workers.
+SERVICE_MAX_BYTES = 64 << 20
+SERVICE_FORMATS = {"png": ".png", "bmp": ".bmp", "tif": ".tif", "tiff": ".tif", "webp": ".webp"}
+
+def service_call(op: str, params: dict, data: bytes):
+    """Run one service request on image bytes; returns (content_type, body bytes)."""
+    key = params.get("key") or None
+    if op == "encode":
+        tech = params.get("tech", "LSB")
+        ext = ".jpg" if tech == "JPEG" else SERVICE_FORMATS.get(params.get("format", "png"))
+        if ext is None:
+            raise ValueError(f"Unsupported output format: {params['format']}")
+        out = hide_bytes(tech, data, params.get("message", ""), ext, int(params.get("bits", 1)), key)
+        return ("image/jpeg" if ext == ".jpg" else "image/" + ext[1:]), out
+    if op == "capacity":
+        result = capacity_plan(data)
+        if data[:2] == b"\xff\xd8":
+            result["JPEG"] = jpeg_capacity_bytes(data)
+    elif op == "decode" and params.get("tech"):
+        result = {"tech": params["tech"], "message": reveal_image(params["tech"], data, key=key)}
+    else:
+        tech, message = try_decode_image(data, key=key)
+        result = {"tech": tech, "message": message}
+    return "application/json", json.dumps(result, ensure_ascii=False).encode("utf-8")
+
+class StegoService(ThreadingHTTPServer):
+    """ThreadingHTTPServer that runs requests on a bounded worker pool."""
+    daemon_threads = True
+
+    def __init__(self, address, workers: int = 4, queue: int = 16, processes: bool = False):
+        super().__init__(address, StegoHandler)
+        self.pool = (ProcessPoolExecutor if processes else ThreadPoolExecutor)(max_workers=workers)
+        self.slots = threading.BoundedSemaphore(workers + queue)
+        self.workers, self.capacity, self.active = workers, workers + queue, 0
+        self.lock = threading.Lock()
+
+    def server_close(self):
+        super().server_close()
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+class StegoHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, fmt, *args):
+        dprint("[HTTP] " + fmt % args)
+
+    def reply(self, code: int, body: bytes, content_type: str = "application/json", headers=()):
+        self.send_response(code)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def reply_json(self, code: int, obj, headers=()):
+        self.reply(code, json.dumps(obj).encode("utf-8"), headers=headers)
+
+    def do_GET(self):
+        if urlsplit(self.path).path != "/health":
+            return self.reply_json(404, {"error": "not found"})
+        srv = self.server
+        self.reply_json(200, {"ok": True, "workers": srv.workers, "in_flight": srv.active, "capacity": srv.capacity})
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        op = url.path.strip("/")
+        length = int(self.headers.get("Content-Length") or 0)
+        if op not in ("encode", "decode", "detect", "capacity"):
+            self.rfile.read(length)
+            return self.reply_json(404, {"error": "not found"})
+        if length > SERVICE_MAX_BYTES:
+            self.close_connection = True
+            return self.reply_json(413, {"error": f"body larger than {SERVICE_MAX_BYTES} bytes"})
+        srv = self.server
+        # Admit before reading the body so a saturated server does not buffer
+        # up to SERVICE_MAX_BYTES per rejected request.
+        if not srv.slots.acquire(blocking=False):
+            self.close_connection = True
+            return self.reply_json(429, {"error": "busy"}, headers=[("Retry-After", "1")])
+        with srv.lock:
+            srv.active += 1
+        try:
+            data = self.rfile.read(length)
+            params = dict(parse_qsl(url.query))
+            if self.headers.get("Content-Type", "").startswith("application/json"):
+                try:
+                    body = json.loads(data)
+                    data = base64.b64decode(body.pop("image"))
+                except (ValueError, KeyError, TypeError) as e:
+                    return self.reply_json(400, {"error": f"bad JSON body: {e}"})
+                params.update({k: str(v) for k, v in body.items()})
+            content_type, out = srv.pool.submit(service_call, op, params, data).result()
+        except (ValueError, RuntimeError) as e:
+            return self.reply_json(422, {"error": str(e)})
+        except Exception as e:
+            return self.reply_json(500, {"error": str(e)})
+        finally:
+            with srv.lock:
+                srv.active -= 1
+            srv.slots.release()
+        self.reply(200, out, content_type)
+
+def serve_main(argv) -> int:
+    parser = argparse.ArgumentParser(prog="tri_tool_minimal.py serve", description="Local HTTP embed/extract service")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--queue", type=int, default=16, help="Requests waiting beyond the busy workers before 429")
+    parser.add_argument("--processes", action="store_true", help="Run requests in worker processes instead of threads")
+    args = parser.parse_args(argv)
+    server = StegoService((args.host, args.port), args.workers, args.queue, args.processes)
+    print(f"Serving on http://{args.host}:{server.server_address[1]} ({args.workers} workers, queue {args.queue})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
 class MultiStegoGUI(tk.Tk):
     def __init__(self):
         super().__init__()
@@ -317,6 +1910,15 @@ class MultiStegoGUI(tk.Tk):
         self.tech_combo = ttk.Combobox(row1, values=TECHS, textvariable=self.tech_var, state="readonly", width=10)
         self.tech_combo.pack(side="left", padx=6)
         self.tech_combo.bind("<<ComboboxSelected>>", self.update_capacity)
+        ttk.Label(row1, text="LSB bits/channel:").pack(side="left", padx=(12,0))
+        self.bits_var = tk.StringVar(value="1")
+        self.bits_combo = ttk.Combobox(row1, values=[str(k) for k in range(1, LSB_MAX_BITS+1)],
+            textvariable=self.bits_var, state="readonly", width=4)
+        self.bits_combo.pack(side="left", padx=6)
+        self.bits_combo.bind("<<ComboboxSelected>>", self.update_capacity)
+        ttk.Label(row1, text="LSB key (optional):").pack(side="left", padx=(12,0))
+        self.key_var = tk.StringVar()
+        ttk.Entry(row1, textvariable=self.key_var, show="*", width=16).pack(side="left", padx=6)
 
         lf = ttk.LabelFrame(top, text="Paths"); lf.pack(fill="x", pady=6)
         self.cover_var = tk.StringVar(); self.out_var = tk.StringVar(); self.stego_var = tk.StringVar()
@@ -346,8 +1948,8 @@ class MultiStegoGUI(tk.Tk):
         ttk.Button(btns, text="Encode", command=self.do_encode).pack(side="left", padx=6)
         ttk.Button(btns, text="Decode", command=self.do_decode).pack(side="left", padx=6)
 
-        tip_text = "Tip: Use PNG/BMP; JPEG is lossy and can break DCT/DWT. DWT requires PyWavelets."
-        if not HAS_PYWT: tip_text += " (DWT disabled: PyWavelets not detected)"
+        tip_text = "Tip: Use PNG/BMP; JPEG is lossy and can break DCT/DWT (use JPEG mode for baseline .jpg covers). Non-Haar DWT requires PyWavelets."
+        if not HAS_DWT: tip_text += " (DWT disabled: PyWavelets not detected)"
         ttk.Label(top, foreground="#666", text=tip_text).pack(anchor="w", pady=(4,0))
 
     def update_msglen(self, *_):
@@ -359,13 +1961,15 @@ class MultiStegoGUI(tk.Tk):
             filetypes=[("Images","*.png *.bmp *.tif *.tiff *.webp *.gif *.jpg *.jpeg"), ("All files","*.*")])
         if p:
             self.cover_var.set(p)
-            root, _ = os.path.splitext(p)
-            self.out_var.set(root + "_stego.png")
+            self.out_var.set(self.default_out(p))
             self.update_capacity()
 
+    def default_out(self, cover):
+        return default_out(cover, self.tech_var.get())
+
     def pick_out(self):
         p = filedialog.asksaveasfilename(title="Save stego as", defaultextension=".png",
-            filetypes=[("PNG","*.png"), ("BMP","*.bmp"), ("All files","*.*")])
+            filetypes=[("PNG","*.png"), ("BMP","*.bmp"), ("JPEG","*.jpg *.jpeg"), ("All files","*.*")])
         if p: self.out_var.set(p)
 
     def pick_stego(self):
@@ -380,11 +1984,13 @@ class MultiStegoGUI(tk.Tk):
         tech = self.tech_var.get()
         try:
             if tech == "LSB":
-                cap = lsb_capacity_bytes(path)
+                cap = lsb_capacity_bytes(path, int(self.bits_var.get()))
             elif tech == "DCT":
                 cap = dct_capacity_bytes(path)
-            elif tech == "DWT" and HAS_PYWT:
+            elif tech == "DWT" and HAS_DWT:
                 cap = dwt_capacity_bytes(path)
+            elif tech == "JPEG":
+                cap = jpeg_capacity_bytes(path)
             else:
                 cap = 0
         except Exception:
@@ -400,20 +2006,13 @@ class MultiStegoGUI(tk.Tk):
         if not cover or not os.path.exists(cover):
             messagebox.showwarning("Encode", "Select a valid cover image."); return
         if not outp:
-            root, _ = os.path.splitext(cover); outp = root + "_stego.png"; self.out_var.set(outp)
-        if outp.lower().endswith((".jpg",".jpeg")):
+            outp = self.default_out(cover); self.out_var.set(outp)
+        if tech != "JPEG" and outp.lower().endswith((".jpg",".jpeg")):
             if not messagebox.askyesno("Warning","JPEG is lossy and may break DCT/DWT. Continue?"): return
 
         dprint(f"[ENC] tech={tech} cover={cover} out={outp} len={len(msg.encode('utf-8'))}")
         try:
-            if tech == "LSB":
-                lsb_hide(cover, outp, msg)
-            elif tech == "DCT":
-                dct_hide(cover, outp, msg)
-            elif tech == "DWT":
-                dwt_hide(cover, outp, msg)
-            else:
-                raise RuntimeError("Unknown technique")
+            hide(tech, cover, outp, msg, bits_per_channel=int(self.bits_var.get()), key=self.key_var.get() or None)
             messagebox.showinfo("Encode", f"Saved stego to:\n{outp}")
         except Exception as e:
             messagebox.showerror("Encode", f"Failed to encode:\n{e}")
@@ -425,14 +2024,7 @@ class MultiStegoGUI(tk.Tk):
         tech = self.tech_var.get()
         dprint(f"[DEC] try={tech} stego={stego}")
         try:
-            if tech == "LSB":
-                msg = lsb_reveal(stego)
-            elif tech == "DCT":
-                msg = dct_reveal(stego)
-            elif tech == "DWT":
-                msg = dwt_reveal(stego)
-            else:
-                raise RuntimeError("Unknown technique")
+            msg = reveal(tech, stego, key=self.key_var.get() or None)
             self.msg_text.delete("1.0","end"); self.msg_text.insert("1.0", msg)
             messagebox.showinfo("Decode", f"Message revealed using {tech}.")
             return
@@ -441,7 +2033,7 @@ class MultiStegoGUI(tk.Tk):
 
         # Auto-detect
         try:
-            name, msg = try_decode_all(stego)
+            name, msg = try_decode_all(stego, key=self.key_var.get() or None)
             self.tech_var.set(name)
             self.msg_text.delete("1.0","end"); self.msg_text.insert("1.0", msg)
             messagebox.showinfo("Decode", f"Message revealed (auto-detected: {name}).")
@@ -449,5 +2041,9 @@ class MultiStegoGUI(tk.Tk):
             messagebox.showerror("Decode", f"Failed to decode with any technique:\n{e}")
 
 if __name__ == "__main__":
+    if sys.argv[1:2] == ["batch"]:
+        sys.exit(batch_main(sys.argv[2:]))
+    if sys.argv[1:2] == ["serve"]:
+        sys.exit(serve_main(sys.argv[2:]))
     app = MultiStegoGUI()
     app.mainloop()
\ No newline at end of file
@@ -1,8 +1,15 @@
 import numpy as np
 from PIL import Image
 import cv2
+from stego_tools.utils.bit_utils import BitStream, BitUtils, DELIMITER_BITS
+from stego_tools.utils.io_utils import IOUtils
+from stego_tools.utils.buffers import BufferUtils
 from scipy.fftpack import dct, idct
 
+# Orthonormal 8x8 DCT-II matrix: dct(dct(B.T).T) == DCT_BASIS @ B @ DCT_BASIS.T
+DCT_BASIS = dct(np.eye(8), norm='ortho', axis=0)
+SCAN_CHUNK_BLOCKS = 1 << 14
+
 class DCTSteganography:
     """
     DCT (Discrete Cosine Transform) based Steganography
@@ -15,7 +22,7 @@ class DCTSteganography:
         
         Args:
             image_path (str): Path to cover image
-            secret_data (str): Secret message to hide
+            secret_data (str or BitStream): Secret message or payload stream to hide
             output_path (str): Path to save stego image
             quality (float): Embedding strength (0-1)
             
@@ -23,45 +30,8 @@ class DCTSteganography:
             bool: Success status
         """
         try:
-            # Read and convert to YCbCr
             img = cv2.imread(image_path)
-            img_yuv = cv2.cvtColor(img, cv2.COLOR_BGR2YUV)
-            
-            # Convert secret to binary
-            binary_secret = ''.join(format(ord(i), '08b') for i in secret_data)
-            binary_secret += '1111111111111110'  # End delimiter
-            
-            # Process Y channel (luminance)
-            y_channel = img_yuv[:,:,0].astype(np.float32)
-            h, w = y_channel.shape
-            
-            # Embed in 8x8 blocks
-            data_index = 0
-            for i in range(0, h-7, 8):
-                for j in range(0, w-7, 8):
-                    if data_index >= len(binary_secret):
-                        break
-                    
-                    # Extract 8x8 block
-                    block = y_channel[i:i+8, j:j+8]
-                    
-                    # Apply DCT
-                    dct_block = dct(dct(block.T, norm='ortho').T, norm='ortho')
-                    
-                    # Embed bit in mid-frequency coefficient
-                    if data_index < len(binary_secret):
-                        bit = int(binary_secret[data_index])
-                        # Modify a mid-frequency coefficient
-                        dct_block[4,4] = dct_block[4,4] * (1 - quality) + bit * quality * 10
-                        data_index += 1
-                    
-                    # Inverse DCT
-                    idct_block = idct(idct(dct_block.T, norm='ortho').T, norm='ortho')
-                    y_channel[i:i+8, j:j+8] = idct_block
-            
-            # Convert back to BGR
-            img_yuv[:,:,0] = np.clip(y_channel, 0, 255)
-            stego_img = cv2.cvtColor(img_yuv, cv2.COLOR_YUV2BGR)
+            stego_img = DCTSteganography.embed(img, secret_data, quality, out=img)
             
             # Save image
             cv2.imwrite(output_path, stego_img)
@@ -72,54 +42,206 @@ class DCTSteganography:
             return False
     
     @staticmethod
-    def decode(image_path, quality=0.1):
+    def encode_bytes(image, secret_data, ext='.png', quality=0.1):
+        """
+        Encode secret data into an in-memory image
+        
+        Args:
+            image: Encoded image bytes, a binary file-like object, or a BGR array
+            secret_data (str or BitStream): Secret message or payload stream to hide
+            ext (str): Output format extension (lossless, e.g. '.png')
+            quality (float): Embedding strength (0-1)
+            
+        Returns:
+            bytes: Encoded stego image, or None on failure
+        """
+        try:
+            img = IOUtils.decode_image(image)
+            out = BufferUtils.decoded_out(img, image)
+            stego_img = DCTSteganography.embed(img, secret_data, quality, out=out)
+            return IOUtils.encode_image(stego_img, ext)
+        except Exception as e:
+            print(f"DCT Encoding Error: {e}")
+            return None
+    
+    @staticmethod
+    def embed(img, secret_data, quality=0.1, out=None):
+        """
+        Embed secret data into a BGR image array
+        
+        Only the 8-pixel block rows that carry the payload are converted to
+        YUV and back; the rest of the image is copied unchanged. Those rows
+        are processed in per-thread scratch buffers, so beyond the output
+        array peak extra memory is about 7 bytes per pixel of the payload
+        rows (3 for YUV, 4 for the float luma) plus a few float64 copies of
+        the payload blocks (512 bytes per block each).
+        
+        Args:
+            img (np.ndarray): BGR cover image (not modified unless it is out)
+            secret_data (str or BitStream): Secret message or payload stream to hide
+            quality (float): Embedding strength (0-1)
+            out (np.ndarray): Optional destination like img; img itself
+                embeds in place
+            
+        Returns:
+            np.ndarray: BGR stego image (out if given)
+        """
+        # Convert secret to binary
+        stream = BitStream.coerce(secret_data)
+        binary_secret = np.concatenate(list(stream.bits()) + [DELIMITER_BITS])  # End delimiter
+        
+        h, w = img.shape[:2]
+        bw = w // 8
+        stego = BufferUtils.output(img, out)
+        
+        # Embed one bit per 8x8 block, raster order, all blocks in one batch
+        n = min(len(binary_secret), (h // 8) * bw)
+        if n == 0:
+            return stego
+        rows = -(-n // bw) * 8
+        
+        # Process the Y channel (luminance) of the payload rows only
+        img_yuv = cv2.cvtColor(stego[:rows], cv2.COLOR_BGR2YUV,
+                               dst=BufferUtils.scratch('dct_yuv', (rows, w, 3), np.uint8))
+        y_channel = BufferUtils.scratch('dct_y', (rows, w))
+        y_channel[...] = img_yuv[:,:,0]
+        blocks = DCTSteganography._blocks(y_channel, n)
+        dct_blocks = DCT_BASIS @ blocks @ DCT_BASIS.T
+        
+        # Modify a mid-frequency coefficient
+        bits = binary_secret[:n]
+        dct_blocks[:, 4, 4] = dct_blocks[:, 4, 4] * (1 - quality) + bits * quality * 10
+        
+        # Inverse DCT
+        DCTSteganography._put_blocks(y_channel, DCT_BASIS.T @ dct_blocks @ DCT_BASIS)
+        
+        # Convert back to BGR
+        img_yuv[:,:,0] = np.clip(y_channel, 0, 255, out=y_channel)
+        cv2.cvtColor(img_yuv, cv2.COLOR_YUV2BGR, dst=stego[:rows])
+        return stego
+    
+    @staticmethod
+    def decode(image_path, quality=0.1, output=None):
         """
         Decode secret data from DCT stego image
         
         Args:
             image_path (str): Path to stego image
             quality (float): Embedding strength used during encoding
+            output: Optional binary file-like object that receives the payload
             
         Returns:
-            str: Decoded secret message
+            str: Decoded secret message (bytes written when output is given)
         """
         try:
-            # Read and convert to YCbCr
-            img = cv2.imread(image_path)
-            img_yuv = cv2.cvtColor(img, cv2.COLOR_BGR2YUV)
-            y_channel = img_yuv[:,:,0].astype(np.float32)
-            h, w = y_channel.shape
-            
-            binary_data = ""
+            return DCTSteganography.extract(cv2.imread(image_path), quality, output)
+        
+        except Exception as e:
+            print(f"DCT Decoding Error: {e}")
+            return ""
+    
+    @staticmethod
+    def decode_bytes(image, quality=0.1, output=None):
+        """
+        Decode secret data from an in-memory DCT stego image
+        
+        Args:
+            image: Encoded image bytes, a binary file-like object, or a BGR array
+            quality (float): Embedding strength used during encoding
+            output: Optional binary file-like object that receives the payload
             
-            # Extract from 8x8 blocks
-            for i in range(0, h-7, 8):
-                for j in range(0, w-7, 8):
-                    # Extract 8x8 block
-                    block = y_channel[i:i+8, j:j+8]
-                    
-                    # Apply DCT
-                    dct_block = dct(dct(block.T, norm='ortho').T, norm='ortho')
-                    
-                    # Extract bit from mid-frequency coefficient
-                    coefficient = dct_block[4,4]
-                    bit = '1' if coefficient > 5 else '0'
-                    binary_data += bit
+        Returns:
+            str: Decoded secret message (bytes written when output is given)
+        """
+        try:
+            return DCTSteganography.extract(IOUtils.decode_image(image), quality, output)
+        except Exception as e:
+            print(f"DCT Decoding Error: {e}")
+            return ""
+    
+    @staticmethod
+    def extract(img, quality=0.1, output=None):
+        """
+        Extract secret data from a BGR stego image array
+        
+        Args:
+            img (np.ndarray): BGR stego image
+            quality (float): Embedding strength used during encoding
+            output: Optional binary file-like object that receives the payload
             
-            # Find end delimiter and extract message
-            delimiter = '1111111111111110'
-            if delimiter in binary_data:
-                binary_data = binary_data[:binary_data.index(delimiter)]
+        Returns:
+            str: Decoded secret message (bytes written when output is given)
+        """
+        h, w = img.shape[:2]
+        
+        # Scan bands of block rows until the end delimiter shows up, so
+        # short messages never convert or transform the rest of the image
+        band = max(1, SCAN_CHUNK_BLOCKS // max(1, w // 8))
+        chunks = []
+        tail = np.zeros(0, dtype=np.uint8)
+        scanned = 0
+        for row in range(0, h // 8, band):
+            # Convert this band to YCbCr
+            img_yuv = cv2.cvtColor(img[row*8:(row + band)*8], cv2.COLOR_BGR2YUV)
+            y_channel = img_yuv[:,:,0].astype(np.float32)
             
-            # Convert binary to string
-            secret_text = ""
-            for i in range(0, len(binary_data), 8):
-                byte = binary_data[i:i+8]
-                if len(byte) == 8:
-                    secret_text += chr(int(byte, 2))
+            # Extract the mid-frequency coefficient of every 8x8 block; only
+            # (4,4) is needed, so skip the full transform
+            blocks = DCTSteganography._blocks(y_channel)
+            coefficient = np.einsum('i,nij,j->n', DCT_BASIS[4], blocks, DCT_BASIS[4])
+            # Round to float32 so exact ties at the threshold do not read as 1
+            chunk = (coefficient.astype(np.float32) > 5).astype(np.uint8)
+            chunks.append(chunk)
             
-            return secret_text
+            # Find end delimiter (possibly straddling the previous band)
+            window = np.concatenate([tail, chunk])
+            end = BitUtils.find_delimiter(window)
+            if end >= 0:
+                end += scanned - tail.size
+                break
+            scanned += chunk.size
+            tail = window[-(DELIMITER_BITS.size - 1):]
+        else:
+            end = -1
+        bits = np.concatenate(chunks) if chunks else np.zeros(0, dtype=np.uint8)
+        if end >= 0:
+            bits = bits[:end]
+        
+        # Convert binary to string
+        bits = bits[:bits.size - bits.size % 8]
+        return BitStream.deliver(np.packbits(bits).tobytes(), output)
+    
+    @staticmethod
+    def _blocks(plane, count=None):
+        """
+        Gather 8x8 blocks in raster order
+        
+        Args:
+            plane (np.ndarray): 2-D channel
+            count (int): Number of leading blocks to return (all if None)
             
-        except Exception as e:
-            print(f"DCT Decoding Error: {e}")
-            return ""
\ No newline at end of file
+        Returns:
+            np.ndarray: (count, 8, 8) array of blocks
+        """
+        bw = plane.shape[1] // 8
+        if count is None:
+            count = (plane.shape[0] // 8) * bw
+        rows = -(-count // bw) if bw else 0
+        blocks = plane[:rows*8, :bw*8].reshape(rows, 8, bw, 8).swapaxes(1, 2).reshape(-1, 8, 8)
+        return blocks[:count]
+    
+    @staticmethod
+    def _put_blocks(plane, blocks):
+        """
+        Write 8x8 blocks back in raster order (inverse of _blocks)
+        
+        Args:
+            plane (np.ndarray): 2-D channel, modified in place
+            blocks (np.ndarray): (count, 8, 8) array of blocks
+        """
+        bw = plane.shape[1] // 8
+        full, rest = divmod(blocks.shape[0], bw)
+        if full:
+            plane[:full*8, :bw*8] = blocks[:full*bw].reshape(full, bw, 8, 8).swapaxes(1, 2).reshape(full*8, bw*8)
+        if rest:
+            plane[full*8:full*8+8, :rest*8] = blocks[full*bw:].swapaxes(0, 1).reshape(8, rest*8)
\ No newline at end of file
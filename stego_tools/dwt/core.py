@@ -1,80 +1,197 @@
+import os
+import threading
+from collections import OrderedDict
 import numpy as np
 from PIL import Image
-import pywt
 import cv2
+from stego_tools.utils.bit_utils import BitStream, BitUtils, DELIMITER_BITS
+from stego_tools.dwt.haar import haar_wavedec2, haar_waverec2
+from stego_tools.utils.io_utils import IOUtils
+from stego_tools.utils.buffers import BufferUtils
+
+# PyWavelets is only required for wavelets other than 'haar'
+try:
+    import pywt
+    HAS_PYWT = True
+except ImportError:
+    HAS_PYWT = False
+
+# QIM step for level-1 detail coefficients (same step as the tri-tool's
+# DWT-QIM). A level-k Haar detail spreads over 4**k pixels at 1/2**k each,
+# so the step doubles per level to keep the same per-pixel amplitude.
+QIM_STEP = 14.0
+
+# Wavelets the QIM plan round-trips with. Longer filters (db2, sym4,
+# bior2.2, ...) take their boundary coefficients from the symmetric
+# extension, and together with the uint8 rounding of the rebuilt image
+# their embedded bits do not survive, so they are rejected.
+SUPPORTED_WAVELETS = ('haar', 'db1')
+
+# Decompositions of recently used images, keyed by (path, mtime, size,
+# wavelet, level), so capacity checks, embedding and verification share
+# one transform. Cached bands are read-only; least recently used entries
+# are evicted once DECOMPOSITION_CACHE_BYTES is exceeded, and every access
+# holds _decompositions_lock.
+DECOMPOSITION_CACHE_BYTES = 128 << 20
+_decompositions = OrderedDict()
+_decompositions_lock = threading.Lock()
 
 class DWTSteganography:
     """
     DWT (Discrete Wavelet Transform) based Steganography
+    
+    Bits are QIM-embedded in the detail sub-bands of a multi-level
+    decomposition of the luminance channel. The capacity plan fills the
+    horizontal and vertical details from the coarsest level down, then the
+    diagonal details, and stops at the first band the payload does not need.
+    Only the Haar wavelet (SUPPORTED_WAVELETS) is supported.
     """
     
     @staticmethod
-    def encode(image_path, secret_data, output_path, wavelet='haar', level=1):
+    def encode(image_path, secret_data, output_path, wavelet='haar', level=1, verify=False):
         """
         Encode secret data using DWT coefficients
         
         Args:
             image_path (str): Path to cover image
-            secret_data (str): Secret message to hide
+            secret_data (str or BitStream): Secret message or payload stream to hide
             output_path (str): Path to save stego image
             wavelet (str): Wavelet type
             level (int): Decomposition level
-            
+            verify (bool): Re-read the payload from the stego image before saving
+        
         Returns:
             bool: Success status
         """
         try:
-            # Read image
             img = cv2.imread(image_path)
-            img_yuv = cv2.cvtColor(img, cv2.COLOR_BGR2YUV)
-            y_channel = img_yuv[:,:,0].astype(np.float32)
-            
-            # Convert secret to binary
-            binary_secret = ''.join(format(ord(i), '08b') for i in secret_data)
-            binary_secret += '1111111111111110'  # End delimiter
-            
-            # Apply DWT
-            coeffs = pywt.wavedec2(y_channel, wavelet, level=level)
-            cA = coeffs[0]  # Approximation coefficients
-            cHVs = coeffs[1:]  # Detail coefficients
-            
-            # Embed in detail coefficients (cH - horizontal details)
-            cH = cHVs[0][0]
-            data_index = 0
-            
-            # Flatten and embed
-            cH_flat = cH.flatten()
-            for i in range(len(cH_flat)):
-                if data_index >= len(binary_secret):
-                    break
-                if abs(cH_flat[i]) > 1.0:  # Only modify significant coefficients
-                    bit = int(binary_secret[data_index])
-                    cH_flat[i] = cH_flat[i] * 0.99 + bit * 0.1
-                    data_index += 1
-            
-            cH_modified = cH_flat.reshape(cH.shape)
-            cHVs_modified = [(cH_modified, cHVs[0][1], cHVs[0][2])] + cHVs[1:]
-            
-            # Inverse DWT
-            coeffs_modified = [cA] + cHVs_modified
-            y_channel_modified = pywt.waverec2(coeffs_modified, wavelet)
-            
-            # Ensure same shape
-            y_channel_modified = y_channel_modified[:y_channel.shape[0], :y_channel.shape[1]]
-            
-            # Convert back
-            img_yuv[:,:,0] = np.clip(y_channel_modified, 0, 255)
-            stego_img = cv2.cvtColor(img_yuv, cv2.COLOR_YUV2BGR)
-            
+            if img is None:
+                raise ValueError(f"Failed to read image: {image_path}")
+            # Decomposition of the Y channel (cached, shared with decode)
+            coeffs, shape = DWTSteganography._decompose(image_path, wavelet, level, img)
+            stego_img, stego_coeffs = DWTSteganography._embed_coeffs(img, coeffs, shape, secret_data,
+                                                                     wavelet, verify, out=img)
             cv2.imwrite(output_path, stego_img)
+            if stego_coeffs is not None:
+                DWTSteganography._remember(output_path, wavelet, level, stego_coeffs, shape)
             return True
-            
+        
         except Exception as e:
             print(f"DWT Encoding Error: {e}")
             return False
     
     @staticmethod
-    def decode(image_path, wavelet='haar', level=1):
+    def encode_bytes(image, secret_data, ext='.png', wavelet='haar', level=1, verify=False):
+        """
+        Encode secret data into an in-memory image
+        
+        Args:
+            image: Encoded image bytes, a binary file-like object, or a BGR array
+            secret_data (str or BitStream): Secret message or payload stream to hide
+            ext (str): Output format extension (lossless, e.g. '.png')
+            wavelet (str): Wavelet type
+            level (int): Decomposition level
+            verify (bool): Re-read the payload from the stego image before returning
+        
+        Returns:
+            bytes: Encoded stego image, or None on failure
+        """
+        try:
+            img = IOUtils.decode_image(image)
+            out = BufferUtils.decoded_out(img, image)
+            stego_img = DWTSteganography.embed(img, secret_data, wavelet, level, verify, out=out)
+            return IOUtils.encode_image(stego_img, ext)
+        except Exception as e:
+            print(f"DWT Encoding Error: {e}")
+            return None
+    
+    @staticmethod
+    def embed(img, secret_data, wavelet='haar', level=1, verify=False, out=None):
+        """
+        Embed secret data into a BGR image array
+        
+        Args:
+            img (np.ndarray): BGR cover image (not modified unless it is out)
+            secret_data (str or BitStream): Secret message or payload stream to hide
+            wavelet (str): Wavelet type
+            level (int): Decomposition level
+            verify (bool): Re-read the payload from the stego image before returning
+            out (np.ndarray): Optional destination like img; img itself
+                embeds in place
+        
+        Returns:
+            np.ndarray: BGR stego image (out if given)
+        """
+        if out is not None:
+            BufferUtils.check(img, out)
+        y_channel = cv2.cvtColor(img, cv2.COLOR_BGR2YUV)[:,:,0].astype(np.float32)
+        coeffs = DWTSteganography._wavedec2(y_channel, wavelet, level)
+        return DWTSteganography._embed_coeffs(img, coeffs, y_channel.shape, secret_data, wavelet, verify, out)[0]
+    
+    @staticmethod
+    def _embed_coeffs(img, coeffs, shape, secret_data, wavelet, verify, out=None):
+        """
+        QIM-embed into a decomposition of img's Y channel and rebuild the image
+        
+        Args:
+            img (np.ndarray): BGR cover image
+            coeffs (list): Read-only wavedec2-style decomposition of its Y channel
+            shape (tuple): (height, width) of the channel
+            secret_data (str or BitStream): Secret message or payload stream to hide
+            wavelet (str): Wavelet type
+            verify (bool): Re-read the payload from the rebuilt image
+            out (np.ndarray): Optional destination for the stego image
+        
+        Returns:
+            tuple: (BGR stego image, its decomposition if verified else None)
+        """
+        img_yuv = cv2.cvtColor(img, cv2.COLOR_BGR2YUV)
+        level = len(coeffs) - 1
+        
+        # Convert secret to binary
+        stream = BitStream.coerce(secret_data)
+        binary_secret = np.concatenate(list(stream.bits()) + [DELIMITER_BITS])  # End delimiter
+        
+        plan = DWTSteganography._plan(DWTSteganography._regions(DWTSteganography._shapes(coeffs), shape), binary_secret.size)
+        if sum(p[-1] for p in plan) < binary_secret.size:
+            raise ValueError("Secret data too large for image")
+        
+        # QIM-embed into writable copies of the planned bands only
+        details = [list(bands) for bands in coeffs[1:]]
+        start = 0
+        for i, j, rows, cols, n in plan:
+            band = np.array(coeffs[i][j])
+            values = band[:rows, :cols].ravel()
+            step = DWTSteganography._step(coeffs, i)
+            values[:n] = DWTSteganography._qim_embed(values[:n], binary_secret[start:start + n], step)
+            band[:rows, :cols] = values.reshape(rows, cols)
+            details[i - 1][j] = band
+            start += n
+        
+        # Inverse DWT
+        coeffs_modified = [coeffs[0]] + [tuple(bands) for bands in details]
+        y_channel_modified = DWTSteganography._waverec2(coeffs_modified, wavelet)
+        
+        # Ensure same shape
+        y_channel_modified = y_channel_modified[:img.shape[0], :img.shape[1]]
+        
+        # Convert back (rounded, so deep levels stay within the QIM margin)
+        img_yuv[:,:,0] = np.clip(np.rint(y_channel_modified), 0, 255)
+        stego_img = cv2.cvtColor(img_yuv, cv2.COLOR_YUV2BGR, dst=out)
+        if out is not None:
+            stego_img = out
+        
+        stego_coeffs = None
+        if verify:
+            stego_y = cv2.cvtColor(stego_img, cv2.COLOR_BGR2YUV)[:,:,0]
+            stego_coeffs = DWTSteganography._wavedec2(stego_y.astype(np.float32), wavelet, level)
+            bits = DWTSteganography._read_bits(stego_coeffs, plan)
+            if not np.array_equal(bits, binary_secret):
+                raise ValueError("Verification failed: payload does not survive reconstruction")
+        return stego_img, stego_coeffs
+    
+    @staticmethod
+    def decode(image_path, wavelet='haar', level=1, output=None):
         """
         Decode secret data from DWT stego image
         
@@ -82,43 +199,322 @@ class DWTSteganography:
             image_path (str): Path to stego image
             wavelet (str): Wavelet type used during encoding
             level (int): Decomposition level used during encoding
-            
+            output: Optional binary file-like object that receives the payload
+        
         Returns:
-            str: Decoded secret message
+            str: Decoded secret message (bytes written when output is given)
         """
         try:
-            # Read image
-            img = cv2.imread(image_path)
-            img_yuv = cv2.cvtColor(img, cv2.COLOR_BGR2YUV)
-            y_channel = img_yuv[:,:,0].astype(np.float32)
-            
-            # Apply DWT
-            coeffs = pywt.wavedec2(y_channel, wavelet, level=level)
-            cH = coeffs[1][0]  # Horizontal detail coefficients
-            
-            binary_data = ""
-            cH_flat = cH.flatten()
-            
-            # Extract bits from significant coefficients
-            for i in range(len(cH_flat)):
-                if abs(cH_flat[i]) > 1.0:
-                    bit = '1' if cH_flat[i] > 0.05 else '0'
-                    binary_data += bit
-            
-            # Find end delimiter and extract message
-            delimiter = '1111111111111110'
-            if delimiter in binary_data:
-                binary_data = binary_data[:binary_data.index(delimiter)]
-            
-            # Convert binary to string
-            secret_text = ""
-            for i in range(0, len(binary_data), 8):
-                byte = binary_data[i:i+8]
-                if len(byte) == 8:
-                    secret_text += chr(int(byte, 2))
-            
-            return secret_text
-            
+            coeffs, shape = DWTSteganography._decompose(image_path, wavelet, level)
+            return DWTSteganography._extract_coeffs(coeffs, shape, output)
+        
         except Exception as e:
             print(f"DWT Decoding Error: {e}")
-            return ""
\ No newline at end of file
+            return ""
+    
+    @staticmethod
+    def decode_bytes(image, wavelet='haar', level=1, output=None):
+        """
+        Decode secret data from an in-memory DWT stego image
+        
+        Args:
+            image: Encoded image bytes, a binary file-like object, or a BGR array
+            wavelet (str): Wavelet type used during encoding
+            level (int): Decomposition level used during encoding
+            output: Optional binary file-like object that receives the payload
+        
+        Returns:
+            str: Decoded secret message (bytes written when output is given)
+        """
+        try:
+            return DWTSteganography.extract(IOUtils.decode_image(image), wavelet, level, output)
+        except Exception as e:
+            print(f"DWT Decoding Error: {e}")
+            return ""
+    
+    @staticmethod
+    def extract(img, wavelet='haar', level=1, output=None):
+        """
+        Extract secret data from a BGR stego image array
+        
+        Args:
+            img (np.ndarray): BGR stego image
+            wavelet (str): Wavelet type used during encoding
+            level (int): Decomposition level used during encoding
+            output: Optional binary file-like object that receives the payload
+        
+        Returns:
+            str: Decoded secret message (bytes written when output is given)
+        """
+        y_channel = cv2.cvtColor(img, cv2.COLOR_BGR2YUV)[:,:,0].astype(np.float32)
+        coeffs = DWTSteganography._wavedec2(y_channel, wavelet, level)
+        return DWTSteganography._extract_coeffs(coeffs, y_channel.shape, output)
+    
+    @staticmethod
+    def _extract_coeffs(coeffs, shape, output=None):
+        """
+        Read the delimiter-terminated payload from a decomposition
+        
+        Args:
+            coeffs (list): wavedec2-style decomposition of the Y channel
+            shape (tuple): (height, width) of the channel
+            output: Optional binary file-like object that receives the payload
+        
+        Returns:
+            str: Decoded secret message (bytes written when output is given)
+        """
+        # Read band by band in plan order until the end delimiter shows up
+        overlap = DELIMITER_BITS.size - 1
+        parts = []
+        tail = np.zeros(0, dtype=np.uint8)
+        seen = 0
+        for i, j, rows, cols in DWTSteganography._regions(DWTSteganography._shapes(coeffs), shape):
+            bits = DWTSteganography._qim_extract(coeffs[i][j][:rows, :cols].ravel(),
+                                                 DWTSteganography._step(coeffs, i))
+            window = np.concatenate([tail, bits])
+            pos = BitUtils.find_delimiter(window)
+            parts.append(bits)
+            if pos >= 0:
+                end = seen - tail.size + pos
+                break
+            seen += bits.size
+            tail = window[-overlap:]
+        else:
+            end = seen
+        bits = np.concatenate(parts)[:end]
+        
+        # Convert binary to bytes (trailing partial byte is dropped)
+        bits = bits[:bits.size - bits.size % 8]
+        return BitStream.deliver(np.packbits(bits).tobytes(), output)
+    
+    @staticmethod
+    def get_capacity(image_path, wavelet='haar', level=1):
+        """
+        Calculate maximum capacity of image for DWT steganography
+        
+        Args:
+            image_path (str): Path to image
+            wavelet (str): Wavelet type
+            level (int): Decomposition level
+        
+        Returns:
+            int: Maximum bytes that can be hidden
+        """
+        # Only the band shapes matter, and they follow from the image size
+        with Image.open(image_path) as img:
+            shape = img.size[::-1]
+        shapes = DWTSteganography._band_shapes(shape, wavelet, level)
+        total = sum(rows * cols for _, _, rows, cols in DWTSteganography._regions(shapes, shape))
+        return max(0, (total - DELIMITER_BITS.size) // 8)  # Reserve room for the delimiter
+    
+    @staticmethod
+    def _regions(shapes, shape):
+        """
+        Carrier regions of the detail sub-bands in embedding order
+        
+        cH and cV come from the coarsest level down, then cD likewise. When a
+        level's input has an odd height (width), the last row (column) of its
+        Haar bands that detail that axis is mirrored padding, always zero
+        after reconstruction, and is left out.
+        
+        Args:
+            shapes (list): Band shapes of a wavedec2-style decomposition
+            shape (tuple): (height, width) of the decomposed channel
+        
+        Returns:
+            list: (level index, band index, rows, cols) per sub-band; the
+            carriers are band[:rows, :cols] in row-major order
+        """
+        level = len(shapes) - 1
+        order = [(i, j) for i in range(1, level + 1) for j in (0, 1)]
+        order += [(i, 2) for i in range(1, level + 1)]
+        regions = []
+        for i, j in order:
+            h, w = shape if i == level else shapes[i + 1][0]
+            rows, cols = shapes[i][j]
+            if h % 2 and rows == (h + 1) // 2 and j in (0, 2):
+                rows -= 1
+            if w % 2 and cols == (w + 1) // 2 and j in (1, 2):
+                cols -= 1
+            regions.append((i, j, rows, cols))
+        return regions
+    
+    @staticmethod
+    def _shapes(coeffs):
+        """Band shapes of a decomposition, laid out like the decomposition"""
+        return [coeffs[0].shape] + [tuple(band.shape for band in bands) for bands in coeffs[1:]]
+    
+    @staticmethod
+    def _band_shapes(shape, wavelet, level):
+        """
+        Band shapes of a decomposition computed from the channel size alone
+        
+        Args:
+            shape (tuple): (height, width) of the channel
+            wavelet (str): Wavelet type
+            level (int): Decomposition level
+        
+        Returns:
+            list: Shapes laid out like _shapes(_wavedec2(...))
+        """
+        DWTSteganography._check_wavelet(wavelet)
+        # Every supported wavelet has two taps: bands are ceil(n / 2) long
+        coeff_len = lambda n: (n + 1) // 2
+        details = []
+        h, w = shape
+        for _ in range(level):
+            h, w = coeff_len(h), coeff_len(w)
+            details.insert(0, ((h, w),) * 3)
+        return [(h, w)] + details
+    
+    @staticmethod
+    def _plan(regions, nbits):
+        """
+        Capacity plan for a payload
+        
+        Args:
+            regions (list): Carrier regions from _regions
+            nbits (int): Number of payload bits
+        
+        Returns:
+            list: (level index, band index, rows, cols, bit count) per region used
+        """
+        plan = []
+        for i, j, rows, cols in regions:
+            if nbits <= 0:
+                break
+            n = min(nbits, rows * cols)
+            plan.append((i, j, rows, cols, n))
+            nbits -= n
+        return plan
+    
+    @staticmethod
+    def _read_bits(coeffs, plan):
+        """QIM bits stored at the positions of a capacity plan"""
+        return np.concatenate([DWTSteganography._qim_extract(coeffs[i][j][:rows, :cols].ravel()[:n],
+                                                             DWTSteganography._step(coeffs, i))
+                               for i, j, rows, cols, n in plan])
+    
+    @staticmethod
+    def _step(coeffs, i):
+        """QIM step of the detail bands at index i of a wavedec2 list"""
+        return QIM_STEP * 2 ** (len(coeffs) - 1 - i)
+    
+    @staticmethod
+    def _qim_embed(values, bits, step):
+        """
+        Snap coefficients to a multiple of step whose parity is the bit
+        
+        Args:
+            values (np.ndarray): Coefficients
+            bits (np.ndarray): 0/1 values, one per coefficient
+            step (float): Quantization step
+        
+        Returns:
+            np.ndarray: Quantized coefficients
+        """
+        q = np.rint(values / step)
+        away = np.where(values >= 0, 1, -1)
+        q = np.where((q.astype(np.int64) & 1) != bits, q + away, q)
+        q = np.where((q == 0) & (bits == 1), away, q)
+        return (q * step).astype(values.dtype)
+    
+    @staticmethod
+    def _qim_extract(values, step):
+        """Parity of the nearest multiple of step, as uint8 bits"""
+        return (np.rint(values / step).astype(np.int64) & 1).astype(np.uint8)
+    
+    @staticmethod
+    def _cache_key(image_path, wavelet, level):
+        """Cache key identifying one version of a file and one transform"""
+        st = os.stat(image_path)
+        return (os.path.abspath(image_path), st.st_mtime_ns, st.st_size, wavelet, level)
+    
+    @staticmethod
+    def _remember(image_path, wavelet, level, coeffs, shape):
+        """Store a decomposition (made read-only) and its channel shape in the cache"""
+        bands = [coeffs[0]] + [b for level_bands in coeffs[1:] for b in level_bands]
+        for band in bands:
+            band.setflags(write=False)
+        entry = (coeffs, tuple(shape))
+        size = sum(band.nbytes for band in bands)
+        if size > DECOMPOSITION_CACHE_BYTES:
+            return entry
+        key = DWTSteganography._cache_key(image_path, wavelet, level)
+        with _decompositions_lock:
+            _decompositions[key] = (entry, size)
+            _decompositions.move_to_end(key)
+            used = sum(n for _, n in _decompositions.values())
+            while used > DECOMPOSITION_CACHE_BYTES:
+                used -= _decompositions.popitem(last=False)[1][1]
+        return entry
+    
+    @staticmethod
+    def _decompose(image_path, wavelet, level, img=None):
+        """
+        Cached decomposition of an image's Y channel
+        
+        Args:
+            image_path (str): Path to image
+            wavelet (str): Wavelet type
+            level (int): Decomposition level
+            img (np.ndarray): Optional BGR pixels of image_path, already
+                decoded by the caller; used on a cache miss
+        
+        Returns:
+            tuple: (read-only [cA, (cH, cV, cD), ...] as returned by
+            pywt.wavedec2, (height, width) of the channel)
+        """
+        key = DWTSteganography._cache_key(image_path, wavelet, level)
+        with _decompositions_lock:
+            if key in _decompositions:
+                _decompositions.move_to_end(key)
+                return _decompositions[key][0]
+        if img is None:
+            img = cv2.imread(image_path)
+        if img is None:
+            raise ValueError(f"Failed to read image: {image_path}")
+        y_channel = cv2.cvtColor(img, cv2.COLOR_BGR2YUV)[:,:,0].astype(np.float32)
+        coeffs = DWTSteganography._wavedec2(y_channel, wavelet, level)
+        return DWTSteganography._remember(image_path, wavelet, level, coeffs, y_channel.shape)
+    
+    @staticmethod
+    def _check_wavelet(wavelet):
+        """
+        Reject wavelets whose embedded bits cannot be read back
+        
+        Raises:
+            ValueError: If wavelet is not in SUPPORTED_WAVELETS
+        """
+        if wavelet not in SUPPORTED_WAVELETS:
+            raise ValueError(f"Unsupported wavelet '{wavelet}': DWT steganography only "
+                             f"round-trips with {', '.join(SUPPORTED_WAVELETS)}")
+    
+    @staticmethod
+    def _wavedec2(channel, wavelet, level):
+        """
+        Multi-level 2-D decomposition (built-in tiled backend for 'haar')
+        
+        Args:
+            channel (np.ndarray): 2-D image channel
+            wavelet (str): Wavelet type
+            level (int): Decomposition level
+        
+        Returns:
+            list: [cA, (cH, cV, cD), ...] as returned by pywt.wavedec2
+        """
+        DWTSteganography._check_wavelet(wavelet)
+        if wavelet == 'haar':
+            return haar_wavedec2(channel, level)
+        if not HAS_PYWT:
+            raise RuntimeError(f"PyWavelets is required for wavelet '{wavelet}'")
+        return pywt.wavedec2(channel, wavelet, level=level)
+    
+    @staticmethod
+    def _waverec2(coeffs, wavelet):
+        """Inverse of _wavedec2"""
+        if wavelet == 'haar':
+            return haar_waverec2(coeffs)
+        if not HAS_PYWT:
+            raise RuntimeError(f"PyWavelets is required for wavelet '{wavelet}'")
+        return pywt.waverec2(coeffs, wavelet)
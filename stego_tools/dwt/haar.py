@@ -0,0 +1,99 @@
+import numpy as np
+
+# Built-in Haar DWT. Matches pywt's 'haar' wavelet with mode='symmetric'
+# (odd edges repeat the last sample) and its cA/cH/cV/cD naming, so it can
+# stand in when PyWavelets is missing. Each 2x2 block is one sum/difference
+# butterfly per axis; the two 1/sqrt(2) factors combine into an exact 1/2,
+# so integer pixels transform (and untouched blocks reconstruct) without
+# rounding error. It is a float butterfly, not integer lifting: coefficients
+# are floats and may be odd multiples of 1/2. Work is done one strip of
+# TILE_ROWS pixel rows at a time: only the strip is converted to float and
+# temporaries never exceed it. haar_dwt2/haar_idwt2 in
+# models/tri_tool_minimal.py are a standalone copy; keep the two in step.
+TILE_ROWS = 512
+
+def _pad_even(strip):
+    """Repeat the last row/column of a strip so both dimensions are even"""
+    if strip.shape[0] % 2:
+        strip = np.concatenate([strip, strip[-1:]], axis=0)
+    if strip.shape[1] % 2:
+        strip = np.concatenate([strip, strip[:, -1:]], axis=1)
+    return strip
+
+def haar_dwt2(img, tile_rows=TILE_ROWS, dtype=np.float32):
+    """
+    Single-level 2-D Haar transform
+
+    Args:
+        img (np.ndarray): 2-D image of any numeric dtype (never copied whole)
+        tile_rows (int): Pixel rows transformed per strip
+        dtype: Float dtype of the coefficients
+
+    Returns:
+        tuple: (cA, (cH, cV, cD)) like pywt.dwt2
+    """
+    h, w = img.shape
+    hc, wc = (h + 1) // 2, (w + 1) // 2
+    cA, cH, cV, cD = (np.empty((hc, wc), dtype=dtype) for _ in range(4))
+    step = max(2, tile_rows - tile_rows % 2)
+    for r0 in range(0, h, step):
+        strip = _pad_even(np.asarray(img[r0:r0 + step], dtype=dtype))
+        rows = slice(r0 // 2, r0 // 2 + strip.shape[0] // 2)
+        # Butterflies along each pixel row, then across row pairs
+        even, odd = strip[0::2], strip[1::2]
+        s0, d0 = even[:, 0::2] + even[:, 1::2], even[:, 0::2] - even[:, 1::2]
+        s1, d1 = odd[:, 0::2] + odd[:, 1::2], odd[:, 0::2] - odd[:, 1::2]
+        np.add(s0, s1, out=cA[rows]); np.subtract(s0, s1, out=cH[rows])
+        np.add(d0, d1, out=cV[rows]); np.subtract(d0, d1, out=cD[rows])
+    for band in (cA, cH, cV, cD):
+        band *= 0.5
+    return cA, (cH, cV, cD)
+
+def haar_idwt2(coeffs, tile_rows=TILE_ROWS, out=None):
+    """
+    Inverse of haar_dwt2
+
+    Args:
+        coeffs (tuple): (cA, (cH, cV, cD)) with equal band shapes
+        tile_rows (int): Pixel rows rebuilt per strip
+        out (np.ndarray): Optional destination of at most twice the band
+            shape; rows/columns beyond it are cropped and integer
+            destinations receive values clipped to their range
+
+    Returns:
+        np.ndarray: Reconstructed image (out if given)
+    """
+    cA, (cH, cV, cD) = coeffs
+    hc, wc = cA.shape
+    if out is None:
+        out = np.empty((2 * hc, 2 * wc), dtype=np.result_type(cA.dtype, np.float32))
+    h, w = out.shape
+    clip = np.iinfo(out.dtype) if np.issubdtype(out.dtype, np.integer) else None
+    step = max(1, tile_rows // 2)
+    for b0 in range(0, min(hc, -(-h // 2)), step):
+        rows = slice(b0, min(hc, b0 + step))
+        p, m = cA[rows] + cH[rows], cA[rows] - cH[rows]
+        q, r = cV[rows] + cD[rows], cV[rows] - cD[rows]
+        strip = np.empty((2 * p.shape[0], 2 * wc), dtype=p.dtype)
+        strip[0::2, 0::2], strip[0::2, 1::2] = p + q, p - q
+        strip[1::2, 0::2], strip[1::2, 1::2] = m + r, m - r
+        strip *= 0.5
+        if clip is not None:
+            np.clip(strip, clip.min, clip.max, out=strip)
+        out[2 * b0:2 * b0 + strip.shape[0]] = strip[:h - 2 * b0, :w]
+    return out
+
+def haar_wavedec2(img, level=1, tile_rows=TILE_ROWS):
+    """Multi-level Haar decomposition, laid out like pywt.wavedec2"""
+    cA, details = img, []
+    for _ in range(level):
+        cA, bands = haar_dwt2(cA, tile_rows)
+        details.insert(0, bands)
+    return [cA] + details
+
+def haar_waverec2(coeffs, tile_rows=TILE_ROWS):
+    """Inverse of haar_wavedec2 (odd intermediate sizes are cropped as pywt.waverec2 does)"""
+    cA = coeffs[0]
+    for cH, cV, cD in coeffs[1:]:
+        cA = haar_idwt2((cA[:cH.shape[0], :cH.shape[1]], (cH, cV, cD)), tile_rows)
+    return cA
@@ -1,6 +1,27 @@
+import hashlib
 import numpy as np
 from PIL import Image
 import cv2
+from stego_tools.utils.bit_utils import BitStream, BitUtils, CHUNK_SIZE, DELIMITER_BITS
+from stego_tools.utils.io_utils import IOUtils
+from stego_tools.utils.buffers import BufferUtils
+
+# Versioned header, always stored at 1 bit per channel:
+#   v1: MAGIC + version byte + 4-byte big-endian payload length
+#   v2: MAGIC + version byte + bits-per-channel byte + 4-byte length
+MAGIC = b'LSBS'
+VERSION = 2
+HEADER_BYTES = {1: len(MAGIC) + 1 + 4, 2: len(MAGIC) + 2 + 4}
+HEADER_BITS = HEADER_BYTES[VERSION] * 8
+MAX_BITS_PER_CHANNEL = 4
+
+# Legacy (pre-header) images end their payload with DELIMITER_BITS
+SCAN_CHUNK_BITS = 1 << 20
+
+# Keyed scatter: slot i is stored at perm(i), a Feistel permutation of the
+# carrier indices evaluated lazily in batches (same construction as the tri-tool)
+SCATTER_ROUNDS = 4
+SCATTER_BATCH = 1 << 16
 
 class LSBSteganography:
     """
@@ -8,55 +29,27 @@ class LSBSteganography:
     """
     
     @staticmethod
-    def encode(image_path, secret_data, output_path):
+    def encode(image_path, secret_data, output_path, bits_per_channel=1, key=None):
         """
         Encode secret data into image using LSB
         
         Args:
             image_path (str): Path to cover image
-            secret_data (str): Secret message to hide
+            secret_data (str or BitStream): Secret message or payload stream to hide
             output_path (str): Path to save stego image
+            bits_per_channel (int): Low bits of each channel used for the payload (1-4)
+            key (str): Optional key; scatters header and payload over the image
             
         Returns:
             bool: Success status
         """
         try:
             # Read image
-            img = Image.open(image_path)
-            img_array = np.array(img)
-            
-            # Convert secret data to binary
-            binary_secret = ''.join(format(ord(i), '08b') for i in secret_data)
-            binary_secret += '1111111111111110'  # End delimiter
-            
-            # Get image dimensions
-            h, w = img_array.shape[:2]
-            if len(img_array.shape) == 3:
-                c = img_array.shape[2]
-            else:
-                c = 1
-                img_array = img_array.reshape(h, w, 1)
-            
-            # Check capacity
-            total_pixels = h * w * c
-            if len(binary_secret) > total_pixels:
-                raise ValueError("Secret data too large for image")
-            
-            # Embed data
-            data_index = 0
-            for i in range(h):
-                for j in range(w):
-                    for k in range(c):
-                        if data_index < len(binary_secret):
-                            # Clear LSB and set to secret bit
-                            pixel = img_array[i, j, k]
-                            pixel_bin = format(pixel, '08b')
-                            new_pixel_bin = pixel_bin[:-1] + binary_secret[data_index]
-                            img_array[i, j, k] = int(new_pixel_bin, 2)
-                            data_index += 1
+            img = np.array(Image.open(image_path))
+            stego_array = LSBSteganography.embed(img, secret_data, bits_per_channel, key, out=img)
             
             # Save stego image
-            stego_img = Image.fromarray(img_array.astype('uint8'))
+            stego_img = Image.fromarray(stego_array.astype('uint8', copy=False))
             stego_img.save(output_path)
             return True
             
@@ -65,71 +58,374 @@ class LSBSteganography:
             return False
     
     @staticmethod
-    def decode(image_path):
+    def encode_bytes(image, secret_data, ext='.png', bits_per_channel=1, key=None):
+        """
+        Encode secret data into an in-memory image
+        
+        Args:
+            image: Encoded image bytes, a binary file-like object, or an
+                array laid out like np.array(PIL.Image) (RGB/RGBA order)
+            secret_data (str or BitStream): Secret message or payload stream to hide
+            ext (str): Output format extension (lossless, e.g. '.png')
+            bits_per_channel (int): Low bits of each channel used for the payload (1-4)
+            key (str): Optional key; scatters header and payload over the image
+            
+        Returns:
+            bytes: Encoded stego image, or None on failure
+        """
+        try:
+            img = LSBSteganography._pil_order(image)
+            out = BufferUtils.decoded_out(img, image)
+            stego_array = LSBSteganography.embed(img, secret_data, bits_per_channel, key, out=out)
+            return IOUtils.encode_image(LSBSteganography._cv_order(stego_array), ext)
+        except Exception as e:
+            print(f"LSB Encoding Error: {e}")
+            return None
+    
+    @staticmethod
+    def embed(img_array, secret_data, bits_per_channel=1, key=None, out=None):
+        """
+        Embed secret data into an image array
+        
+        Pixels are modified through a flat view of the destination, so
+        beyond it peak extra memory is one payload chunk (CHUNK_SIZE bytes
+        of secret, as packed values) plus, when keyed, 8 bytes per carrier
+        and about 64 more per carrier of the SCATTER_BATCH being scattered.
+        
+        Args:
+            img_array (np.ndarray): Cover pixels, (h, w) or (h, w, channels)
+            secret_data (str or BitStream): Secret message or payload stream to hide
+            bits_per_channel (int): Low bits of each channel used for the payload (1-4)
+            key (str): Optional key; scatters header and payload over the image
+            out (np.ndarray): Optional destination like img_array;
+                img_array itself embeds in place (default: a copy)
+            
+        Returns:
+            np.ndarray: Stego pixels, same shape as the cover (out if given)
+        
+        Raises:
+            ValueError: If the payload does not fit or bits_per_channel is invalid
+        """
+        img_array = np.asarray(img_array)
+        k = bits_per_channel
+        if not 1 <= k <= MAX_BITS_PER_CHANNEL:
+            raise ValueError(f"bits_per_channel must be between 1 and {MAX_BITS_PER_CHANNEL}")
+        
+        # Header bits go one per channel, the secret k bits per channel
+        stream = BitStream.coerce(secret_data)
+        length = len(stream)
+        header = MAGIC + bytes([VERSION, k]) + length.to_bytes(4, 'big')
+        header_bits = LSBSteganography._pack_chunks(header, 1)
+        count = -(-length * 8 // k)
+        
+        # Check capacity
+        if HEADER_BITS + count > img_array.size:
+            raise ValueError("Secret data too large for image")
+        
+        # Embed data: clear the low bits of the leading values and set the secret bits
+        img_array = BufferUtils.output(img_array, out)
+        flat = img_array.ravel()
+        pos = LSBSteganography._positions(flat.size, 0, HEADER_BITS, key)
+        flat[pos] = LSBSteganography._embed(flat[pos], header_bits, 1)
+        start = HEADER_BITS
+        for chunk in stream.chunks(multiple=k):
+            chunks = LSBSteganography._pack_chunks(chunk, k)
+            pos = LSBSteganography._positions(flat.size, start, start + chunks.size, key)
+            flat[pos] = LSBSteganography._embed(flat[pos], chunks, k)
+            start += chunks.size
+        return img_array
+    
+    @staticmethod
+    def decode(image_path, key=None, output=None):
         """
         Decode secret data from LSB stego image
         
+        Images carrying the versioned header are read up to the declared
+        length only; older delimiter-terminated images fall back to a
+        chunked scan that stops at the first delimiter.
+        
         Args:
             image_path (str): Path to stego image
+            key (str): Key used at encode time, if any
+            output: Optional binary file-like object that receives the payload
             
         Returns:
-            str: Decoded secret message
+            str: Decoded secret message (bytes written when output is given)
         """
         try:
             # Read image
             img = Image.open(image_path)
-            img_array = np.array(img)
-            
-            # Get image dimensions
-            h, w = img_array.shape[:2]
-            if len(img_array.shape) == 3:
-                c = img_array.shape[2]
-            else:
-                c = 1
-                img_array = img_array.reshape(h, w, 1)
-            
-            # Extract LSBs
-            binary_data = ""
-            for i in range(h):
-                for j in range(w):
-                    for k in range(c):
-                        pixel = img_array[i, j, k]
-                        binary_data += format(pixel, '08b')[-1]
-            
-            # Find end delimiter and extract message
-            delimiter = '1111111111111110'
-            if delimiter in binary_data:
-                binary_data = binary_data[:binary_data.index(delimiter)]
-            
-            # Convert binary to string
-            secret_text = ""
-            for i in range(0, len(binary_data), 8):
-                byte = binary_data[i:i+8]
-                if len(byte) == 8:
-                    secret_text += chr(int(byte, 2))
-            
-            return secret_text
+            return LSBSteganography.extract(np.array(img), key, output)
             
         except Exception as e:
             print(f"LSB Decoding Error: {e}")
             return ""
     
     @staticmethod
-    def get_capacity(image_path):
+    def decode_bytes(image, key=None, output=None):
+        """
+        Decode secret data from an in-memory LSB stego image
+        
+        Args:
+            image: Encoded image bytes, a binary file-like object, or an
+                array laid out like np.array(PIL.Image) (RGB/RGBA order)
+            key (str): Key used at encode time, if any
+            output: Optional binary file-like object that receives the payload
+            
+        Returns:
+            str: Decoded secret message (bytes written when output is given)
+        """
+        try:
+            return LSBSteganography.extract(LSBSteganography._pil_order(image), key, output)
+        except Exception as e:
+            print(f"LSB Decoding Error: {e}")
+            return ""
+    
+    @staticmethod
+    def extract(img_array, key=None, output=None):
+        """
+        Extract secret data from a stego image array
+        
+        Args:
+            img_array (np.ndarray): Stego pixels
+            key (str): Key used at encode time, if any
+            output: Optional binary file-like object that receives the payload
+            
+        Returns:
+            str: Decoded secret message (bytes written when output is given)
+        """
+        flat = np.asarray(img_array).reshape(-1)
+        
+        # Versioned header: read exactly header + payload bits
+        header = LSBSteganography._read_header(flat, key)
+        if header is not None:
+            k, length, start = header
+            count = -(-length * 8 // k)
+            if start + count > flat.size:
+                raise ValueError("Truncated LSB payload")
+            if output is None:
+                pos = LSBSteganography._positions(flat.size, start, start + count, key)
+                values = flat[pos] & ((1 << k) - 1)
+                return LSBSteganography._unpack_chunks(values, k, length).decode('latin-1')
+            # Stream whole bytes to the output, one chunk of carriers at a time
+            step = CHUNK_SIZE * 8
+            for first in range(0, count, step):
+                last = min(count, first + step)
+                pos = LSBSteganography._positions(flat.size, start + first, start + last, key)
+                values = flat[pos] & ((1 << k) - 1)
+                nbytes = min(length, last * k // 8) - first * k // 8
+                output.write(LSBSteganography._unpack_chunks(values, k, nbytes))
+            return length
+        
+        # Legacy delimiter format (never keyed)
+        if key is not None:
+            raise ValueError("No LSB header found for this key")
+        bits = LSBSteganography._scan_to_delimiter(flat)
+        
+        # Convert binary to string (trailing partial byte is dropped)
+        bits = bits[:bits.size - bits.size % 8]
+        return BitStream.deliver(np.packbits(bits).tobytes(), output)
+    
+    @staticmethod
+    def _pil_order(image):
+        """
+        Pixels of an in-memory image in the channel order Image.open gives
+        
+        Args:
+            image: Encoded bytes, a binary file-like object, or an array
+                (returned unchanged)
+            
+        Returns:
+            np.ndarray: Pixels with RGB/RGBA channel order
+        """
+        if isinstance(image, np.ndarray):
+            return image
+        img = IOUtils.decode_image(image, cv2.IMREAD_UNCHANGED)
+        return LSBSteganography._cv_order(img)
+    
+    @staticmethod
+    def _cv_order(img_array):
+        """Swap RGB(A) and BGR(A) channel order (same operation both ways)"""
+        if img_array.ndim == 3 and img_array.shape[2] in (3, 4):
+            return np.ascontiguousarray(img_array[:, :, [2, 1, 0] + [3] * (img_array.shape[2] == 4)])
+        return img_array
+    
+    @staticmethod
+    def _read_header(flat, key=None):
+        """
+        Parse the versioned header from the LSBs of a flat pixel array
+        
+        Args:
+            flat (np.ndarray): Flattened image values
+            key (str): Optional scatter key
+            
+        Returns:
+            tuple: (bits_per_channel, length, payload_start) or None if absent
+        """
+        if flat.size < HEADER_BYTES[1] * 8:
+            return None
+        pos = LSBSteganography._positions(flat.size, 0, (len(MAGIC) + 1) * 8, key)
+        prefix = LSBSteganography._unpack_chunks(flat[pos] & 1, 1, len(MAGIC) + 1)
+        version = prefix[len(MAGIC)]
+        if prefix[:len(MAGIC)] != MAGIC or version not in HEADER_BYTES:
+            return None
+        size = HEADER_BYTES[version]
+        if flat.size < size * 8:
+            return None
+        pos = LSBSteganography._positions(flat.size, 0, size * 8, key)
+        header = LSBSteganography._unpack_chunks(flat[pos] & 1, 1, size)
+        k = header[len(MAGIC) + 1] if version >= 2 else 1
+        if not 1 <= k <= MAX_BITS_PER_CHANNEL:
+            return None
+        return k, int.from_bytes(header[-4:], 'big'), size * 8
+    
+    @staticmethod
+    def _pack_chunks(data, k):
+        """
+        Split bytes into k-bit values, most significant bits first
+        
+        Args:
+            data (bytes): Bytes to split
+            k (int): Bits per value
+            
+        Returns:
+            np.ndarray: uint8 values, the last one zero-padded
+        """
+        bits = np.unpackbits(np.frombuffer(data, dtype=np.uint8))
+        pad = (-bits.size) % k
+        if pad:
+            bits = np.concatenate([bits, np.zeros(pad, dtype=np.uint8)])
+        weights = (1 << np.arange(k - 1, -1, -1)).astype(np.uint8)
+        return (bits.reshape(-1, k) * weights).sum(axis=1, dtype=np.uint8)
+    
+    @staticmethod
+    def _unpack_chunks(values, k, count):
+        """
+        Rebuild bytes from the low k bits of each value
+        
+        Args:
+            values (np.ndarray): Carrier values
+            k (int): Bits per value
+            count (int): Number of bytes to rebuild
+            
+        Returns:
+            bytes: Reassembled bytes
+        """
+        shifts = np.arange(k - 1, -1, -1, dtype=np.uint8)
+        bits = (np.asarray(values).astype(np.uint8)[:, None] >> shifts) & 1
+        return np.packbits(bits.ravel()[:count * 8]).tobytes()
+    
+    @staticmethod
+    def _embed(values, chunks, k):
+        """
+        Replace the low k bits of carrier values
+        
+        Args:
+            values (np.ndarray): Carrier values
+            chunks (np.ndarray): k-bit values to store
+            k (int): Bits per value
+            
+        Returns:
+            np.ndarray: Updated carrier values
+        """
+        return (values & ~np.array((1 << k) - 1, dtype=values.dtype)) | chunks.astype(values.dtype)
+    
+    @staticmethod
+    def _positions(n, start, stop, key=None):
+        """
+        Carrier indices for payload slots start..stop-1
+        
+        Args:
+            n (int): Number of carrier values in the image
+            start (int): First slot
+            stop (int): One past the last slot
+            key (str): Optional scatter key
+            
+        Returns:
+            slice or np.ndarray: Sequential slice, or keyed scattered indices
+        """
+        if key is None:
+            return slice(start, stop)
+        digest = hashlib.sha256(key.encode('utf-8') + n.to_bytes(8, 'big')).digest()
+        round_keys = np.frombuffer(digest, dtype='>u8').astype(np.uint64)[:SCATTER_ROUNDS]
+        half = max(1, ((n - 1).bit_length() + 1) // 2)
+        out = np.empty(max(0, stop - start), dtype=np.int64)
+        for b in range(start, stop, SCATTER_BATCH):
+            x = np.arange(b, min(stop, b + SCATTER_BATCH), dtype=np.uint64)
+            x = LSBSteganography._feistel(x, half, round_keys)
+            # Cycle-walk values that land outside [0, n)
+            walk = np.flatnonzero(x >= n)
+            while walk.size:
+                x[walk] = LSBSteganography._feistel(x[walk], half, round_keys)
+                walk = walk[x[walk] >= n]
+            out[b - start:b - start + x.size] = x
+        return out
+    
+    @staticmethod
+    def _feistel(x, half, round_keys):
+        """
+        Balanced Feistel network over 2*half-bit integers
+        
+        Args:
+            x (np.ndarray): uint64 inputs below 2**(2*half)
+            half (int): Bits per half
+            round_keys (np.ndarray): uint64 round keys
+            
+        Returns:
+            np.ndarray: Permuted uint64 values
+        """
+        mask = np.uint64((1 << half) - 1)
+        shift = np.uint64(half)
+        left, right = x >> shift, x & mask
+        for rk in round_keys:
+            # splitmix64 finalizer as the round function
+            z = (right ^ rk) + np.uint64(0x9E3779B97F4A7C15)
+            z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+            z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+            z ^= z >> np.uint64(31)
+            left, right = right, left ^ (z & mask)
+        return (left << shift) | right
+    
+    @staticmethod
+    def _scan_to_delimiter(flat):
+        """
+        Collect LSBs chunk by chunk until the end delimiter appears
+        
+        Args:
+            flat (np.ndarray): Flattened image values
+            
+        Returns:
+            np.ndarray: Bits preceding the delimiter (all bits if absent)
+        """
+        overlap = DELIMITER_BITS.size - 1
+        chunks = []
+        tail = np.zeros(0, dtype=np.uint8)
+        for start in range(0, flat.size, SCAN_CHUNK_BITS):
+            chunk = (flat[start:start + SCAN_CHUNK_BITS] & 1).astype(np.uint8)
+            # Keep the previous chunk's tail so delimiters spanning a boundary are found
+            window = np.concatenate([tail, chunk])
+            pos = BitUtils.find_delimiter(window)
+            if pos >= 0:
+                end = start - tail.size + pos
+                chunks.append(chunk)
+                return np.concatenate(chunks)[:end]
+            chunks.append(chunk)
+            tail = window[-overlap:]
+        return np.concatenate(chunks) if chunks else np.zeros(0, dtype=np.uint8)
+    
+    @staticmethod
+    def get_capacity(image_path, bits_per_channel=1):
         """
         Calculate maximum capacity of image for LSB steganography
         
         Args:
             image_path (str): Path to image
+            bits_per_channel (int): Low bits of each channel used for the payload
             
         Returns:
             int: Maximum bytes that can be hidden
         """
-        img = Image.open(image_path)
-        img_array = np.array(img)
-        h, w = img_array.shape[:2]
-        if len(img_array.shape) == 3:
-            c = img_array.shape[2]
-        else:
-            c = 1
-        return (h * w * c) // 8 - 2  # Reserve 2 bytes for delimiter
\ No newline at end of file
+        # The header gives the same size and channel count as a full decode
+        with Image.open(image_path) as img:
+            (w, h), c = img.size, len(img.getbands())
+        return max(0, (h * w * c - HEADER_BITS) * bits_per_channel // 8)  # Reserve room for the header
\ No newline at end of file
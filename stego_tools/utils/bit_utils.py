@@ -1,5 +1,12 @@
+import os
 import numpy as np
 
+CHUNK_SIZE = 1 << 16
+
+# End marker of the legacy delimiter-terminated formats ('1111111111111110')
+DELIMITER = b'\xff\xfe'
+DELIMITER_BITS = np.unpackbits(np.frombuffer(DELIMITER, dtype=np.uint8))
+
 class BitUtils:
     """Utility functions for bit manipulation"""
     
@@ -11,28 +18,153 @@ class BitUtils:
     @staticmethod
     def binary_to_text(binary_str):
         """Convert binary string to text"""
-        text = ""
-        for i in range(0, len(binary_str), 8):
-            byte = binary_str[i:i+8]
-            if len(byte) == 8:
-                text += chr(int(byte, 2))
-        return text
+        return BitUtils.binary_to_bytes(binary_str).decode('latin-1')
+    
+    @staticmethod
+    def binary_to_bytes(binary_str):
+        """Convert binary string to bytes, dropping a trailing partial byte"""
+        usable = len(binary_str) - len(binary_str) % 8
+        bits = np.frombuffer(binary_str[:usable].encode('ascii'), dtype=np.uint8) - ord('0')
+        return np.packbits(bits).tobytes()
+    
+    @staticmethod
+    def find_delimiter(bits):
+        """
+        Locate the first end delimiter in a bit array
+        
+        Args:
+            bits (np.ndarray): uint8 array of 0/1 values
+            
+        Returns:
+            int: Bit offset of the delimiter, or -1 if absent
+        """
+        n = bits.size - DELIMITER_BITS.size + 1
+        if n <= 0:
+            return -1
+        # Slide a 16-bit window over the stream, one shift per pattern bit
+        window = np.zeros(n, dtype=np.uint16)
+        for k in range(DELIMITER_BITS.size):
+            window <<= 1
+            window |= bits[k:k + n]
+        hits = np.flatnonzero(window == int.from_bytes(DELIMITER, 'big'))
+        return int(hits[0]) if hits.size else -1
     
     @staticmethod
     def file_to_binary(file_path):
-        """Convert file to binary string"""
+        """Convert file to binary string (prefer BitStream for large files)"""
         with open(file_path, 'rb') as file:
             binary_data = file.read()
-        return ''.join(format(byte, '08b') for byte in binary_data)
+        bits = np.unpackbits(np.frombuffer(binary_data, dtype=np.uint8))
+        return (bits + ord('0')).tobytes().decode('ascii')
     
     @staticmethod
     def binary_to_file(binary_str, output_path):
         """Convert binary string to file"""
-        bytes_data = bytearray()
-        for i in range(0, len(binary_str), 8):
-            byte = binary_str[i:i+8]
-            if len(byte) == 8:
-                bytes_data.append(int(byte, 2))
-        
         with open(output_path, 'wb') as file:
-            file.write(bytes_data)
\ No newline at end of file
+            file.write(BitUtils.binary_to_bytes(binary_str))
+
+class BitStream:
+    """Byte-oriented payload source that yields bits chunk by chunk"""
+    
+    def __init__(self, source, chunk_size=CHUNK_SIZE):
+        """
+        Args:
+            source: bytes-like object or binary file-like object with read()
+            chunk_size (int): Bytes handed out per chunk
+        """
+        self.source = source
+        self.chunk_size = chunk_size
+        self._owned = False
+    
+    @classmethod
+    def from_file(cls, file_path, chunk_size=CHUNK_SIZE):
+        """Open a file as a payload stream (use as a context manager)"""
+        stream = cls(open(file_path, 'rb'), chunk_size)
+        stream._owned = True
+        return stream
+    
+    @staticmethod
+    def coerce(secret_data):
+        """Wrap a str (latin-1 encoded) or bytes-like payload; pass BitStreams through"""
+        if isinstance(secret_data, BitStream):
+            return secret_data
+        if isinstance(secret_data, str):
+            secret_data = secret_data.encode('latin-1')
+        return BitStream(secret_data)
+    
+    @staticmethod
+    def deliver(data, output=None):
+        """
+        Hand decoded bytes to the caller
+        
+        Args:
+            data (bytes): Decoded payload
+            output: Optional binary file-like object to write to
+            
+        Returns:
+            str or int: Text (latin-1) when no output is given, else bytes written
+        """
+        if output is None:
+            return bytes(data).decode('latin-1')
+        output.write(data)
+        return len(data)
+    
+    def __len__(self):
+        """Number of payload bytes remaining in the stream"""
+        if not hasattr(self.source, 'read'):
+            return memoryview(self.source).nbytes
+        try:
+            return os.fstat(self.source.fileno()).st_size - self.source.tell()
+        except (AttributeError, OSError, ValueError):
+            pass
+        if not self.source.seekable():
+            raise TypeError("Length of a non-seekable stream is unknown")
+        pos = self.source.tell()
+        end = self.source.seek(0, os.SEEK_END)
+        self.source.seek(pos)
+        return end - pos
+    
+    def chunks(self, multiple=1):
+        """
+        Yield payload bytes as memoryviews
+        
+        Args:
+            multiple (int): Every chunk but the last has a length divisible by this
+            
+        Yields:
+            memoryview: Next chunk of payload bytes
+        """
+        step = max(multiple, self.chunk_size - self.chunk_size % multiple)
+        if not hasattr(self.source, 'read'):
+            view = memoryview(self.source).cast('B')
+            for start in range(0, view.nbytes, step):
+                yield view[start:start + step]
+            return
+        buf = bytearray()
+        while True:
+            block = self.source.read(step - len(buf))
+            if block:
+                buf += block
+                if len(buf) < step:
+                    continue
+            if buf:
+                yield memoryview(bytes(buf))
+                buf.clear()
+            if not block:
+                return
+    
+    def bits(self, multiple=1):
+        """Yield payload bits as uint8 arrays of 0/1, one array per chunk"""
+        for chunk in self.chunks(multiple):
+            yield np.unpackbits(np.frombuffer(chunk, dtype=np.uint8))
+    
+    def close(self):
+        """Close the underlying file if this stream opened it"""
+        if self._owned:
+            self.source.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
\ No newline at end of file
@@ -0,0 +1,98 @@
+"""
+Output-buffer and scratch-buffer helpers for the stego_tools array cores
+
+These mirror output_buffer, scratch and clear_scratch in
+models/tri_tool_minimal.py, which are the reference: the semantics are kept
+identical, and a change to one side must be made to the other.
+"""
+import threading
+import numpy as np
+
+# Per-thread scratch buffers, reused across embed calls so that repeated
+# same-sized jobs do not reallocate their float working planes
+_SCRATCH = threading.local()
+
+class BufferUtils:
+    """Output-buffer and scratch-buffer helpers for the array cores"""
+
+    @staticmethod
+    def output(img, out=None):
+        """
+        Destination array of an embed
+
+        Args:
+            img (np.ndarray): Cover pixels
+            out (np.ndarray): Optional destination with img's shape and dtype,
+                writable and C-contiguous; img itself means embed in place
+
+        Returns:
+            np.ndarray: out filled with img, or a fresh copy of img
+
+        Raises:
+            ValueError: If out does not match img or is not writable/contiguous
+        """
+        if out is None:
+            return img.copy()
+        BufferUtils.check(img, out)
+        if out is not img:
+            np.copyto(out, img)
+        return out
+
+    @staticmethod
+    def decoded_out(img, source):
+        """
+        out= argument for embedding into a decoded image
+        
+        Decoding bytes or a file (or converting a caller's array) yields a
+        private array, which can be embedded into in place without a copy;
+        a caller's array passed through unchanged must not be modified.
+        
+        Args:
+            img (np.ndarray): Result of decoding source
+            source: What the caller passed in
+        
+        Returns:
+            np.ndarray: img if it is private, otherwise None (embed into a copy)
+        """
+        return img if img is not source else None
+    
+    @staticmethod
+    def check(img, out):
+        """
+        Validate a caller-provided destination without filling it
+
+        Raises:
+            ValueError: If out does not match img or is not writable/contiguous
+        """
+        if out.shape != img.shape or out.dtype != img.dtype:
+            raise ValueError(f"out must be {img.dtype} {img.shape}, got {out.dtype} {out.shape}")
+        if not out.flags.c_contiguous or not out.flags.writeable:
+            raise ValueError("out must be a writable C-contiguous array")
+
+    @staticmethod
+    def scratch(name, shape, dtype=np.float32):
+        """
+        Reusable per-thread buffer (contents undefined)
+
+        The buffer grows to the largest size requested under name and is
+        kept for the thread's lifetime; see clear_scratch.
+
+        Args:
+            name (str): Buffer name, unique per use site
+            shape (tuple): Shape of the returned view
+            dtype: Element type
+
+        Returns:
+            np.ndarray: View of the buffer with the given shape
+        """
+        pool = _SCRATCH.__dict__
+        n = int(np.prod(shape))
+        buf = pool.get((name, np.dtype(dtype)))
+        if buf is None or buf.size < n:
+            buf = pool[(name, np.dtype(dtype))] = np.empty(n, dtype)
+        return buf[:n].reshape(shape)
+
+    @staticmethod
+    def clear_scratch():
+        """Release the calling thread's scratch buffers"""
+        _SCRATCH.__dict__.clear()
@@ -1,4 +1,6 @@
 from PIL import Image
+import numpy as np
+import cv2
 import os
 
 class IOUtils:
@@ -30,6 +32,55 @@ class IOUtils:
         except Exception as e:
             return None
     
+    @staticmethod
+    def decode_image(source, flags=cv2.IMREAD_COLOR):
+        """
+        Decode an in-memory image without touching the disk
+        
+        Args:
+            source: Encoded bytes, a binary file-like object, or an
+                already decoded np.ndarray
+            flags (int): cv2.imdecode flags; arrays are converted to match
+                them as cv2.imread would (gray to BGR for IMREAD_COLOR,
+                BGR to gray for IMREAD_GRAYSCALE) and otherwise returned
+                unchanged
+        
+        Returns:
+            np.ndarray: Decoded image (BGR channel order for color)
+        """
+        if isinstance(source, np.ndarray):
+            if flags == cv2.IMREAD_COLOR:
+                if source.ndim == 2:
+                    return cv2.cvtColor(source, cv2.COLOR_GRAY2BGR)
+                if source.shape[2] == 4:
+                    return cv2.cvtColor(source, cv2.COLOR_BGRA2BGR)
+            elif flags == cv2.IMREAD_GRAYSCALE and source.ndim == 3:
+                code = cv2.COLOR_BGRA2GRAY if source.shape[2] == 4 else cv2.COLOR_BGR2GRAY
+                return cv2.cvtColor(source, code)
+            return source
+        data = source.read() if hasattr(source, 'read') else bytes(source)
+        img = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), flags)
+        if img is None:
+            raise ValueError("Failed to decode image bytes")
+        return img
+    
+    @staticmethod
+    def encode_image(img, ext='.png'):
+        """
+        Encode an image array to bytes in memory
+        
+        Args:
+            img (np.ndarray): Image (BGR channel order for color)
+            ext (str): Output format extension, e.g. '.png'
+        
+        Returns:
+            bytes: Encoded image
+        """
+        ok, buf = cv2.imencode(ext, img)
+        if not ok:
+            raise ValueError(f"Failed to encode image as {ext}")
+        return buf.tobytes()
+    
     @staticmethod
     def create_directory(path):
         """Create directory if it doesn't exist"""
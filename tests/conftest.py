@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The repo is run from a checkout, not installed: make its packages importable
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,46 @@
+import json
+
+import cv2
+import numpy as np
+import pytest
+
+import models.tri_tool_minimal as tri
+
+
+@pytest.fixture
+def run(tmp_path):
+    cover = tmp_path / "covers" / "cover.png"
+    cover.parent.mkdir()
+    cv2.imwrite(str(cover), np.random.default_rng(0).integers(0, 256, (64, 96, 3), dtype=np.uint8))
+    results, ckpt = tmp_path / "results.jsonl", tmp_path / "run.ckpt"
+
+    def batch(*args, workers=1):
+        before = results.read_text().count("\n") if results.exists() else 0
+        code = tri.batch_main(["encode", str(cover.parent), "--out-dir", str(tmp_path / "out"),
+                               "--results", str(results), "--checkpoint", str(ckpt),
+                               "--workers", str(workers), *args])
+        assert code == 0
+        return [json.loads(line) for line in results.read_text().splitlines()[before:]]
+    return batch
+
+
+def test_rerun_skips_only_identical_jobs(run):
+    assert len(run("--tech", "LSB", "--message", "one")) == 1
+    assert run("--tech", "LSB", "--message", "one") == []
+    # Same input, different technique / message / bits / key: not done yet
+    assert [r["tech"] for r in run("--tech", "DCT", "--message", "one")] == ["DCT"]
+    assert len(run("--tech", "LSB", "--message", "two")) == 1
+    assert len(run("--tech", "LSB", "--message", "one", "--bits", "2")) == 1
+    assert len(run("--tech", "LSB", "--message", "one", "--key", "k")) == 1
+    assert run("--tech", "LSB", "--message", "one", "--key", "k") == []
+
+
+def test_parallel_run_checkpoints_every_job(run):
+    assert len(run("--tech", "DCT", "--message", "one", workers=2)) == 1
+    assert run("--tech", "DCT", "--message", "one", workers=2) == []
+
+
+def test_job_key_covers_output_path():
+    job = {"id": "encode:a.png", "op": "encode", "input": "a.png", "tech": "LSB", "message": "m"}
+    assert tri.job_key({**job, "output": "x.png"}) != tri.job_key({**job, "output": "y.png"})
+    assert tri.job_key({**job, "bits": "1"}) == tri.job_key({**job, "bits": 1}) == tri.job_key(job)
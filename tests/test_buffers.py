@@ -0,0 +1,38 @@
+import numpy as np
+import pytest
+
+import models.tri_tool_minimal as tri
+from stego_tools.utils.buffers import BufferUtils
+
+IMPLS = [(tri.output_buffer, tri.scratch), (BufferUtils.output, BufferUtils.scratch)]
+
+@pytest.mark.parametrize('output, scratch', IMPLS)
+def test_output_semantics(output, scratch):
+    img = np.arange(24, dtype=np.uint8).reshape(2, 4, 3)
+    copy = output(img)
+    assert copy is not img and np.array_equal(copy, img)
+    assert output(img, img) is img
+    out = np.zeros_like(img)
+    assert output(img, out) is out and np.array_equal(out, img)
+    for bad in (np.zeros((2, 4), np.uint8), np.zeros_like(img, np.float32),
+                np.zeros((4, 2, 3), np.uint8).transpose(1, 0, 2)):
+        with pytest.raises(ValueError):
+            output(img, bad)
+    frozen = np.zeros_like(img)
+    frozen.setflags(write=False)
+    with pytest.raises(ValueError):
+        output(img, frozen)
+
+@pytest.mark.parametrize('output, scratch', IMPLS)
+def test_scratch_reuses_and_grows(output, scratch):
+    a = scratch('test_buf', (4, 5))
+    assert a.shape == (4, 5) and a.dtype == np.float32
+    assert np.shares_memory(scratch('test_buf', (2, 10)), a)
+    assert scratch('test_buf', (3,), np.uint8).dtype == np.uint8
+    big = scratch('test_buf', (50, 50))
+    assert big.shape == (50, 50) and not np.shares_memory(big, a)
+
+def test_decoded_out():
+    img = np.zeros((2, 2), np.uint8)
+    assert BufferUtils.decoded_out(img, img) is None
+    assert BufferUtils.decoded_out(img, b'encoded') is img
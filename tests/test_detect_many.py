@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+
+torch = pytest.importorskip('torch')
+pytest.importorskip('torchvision')
+
+from detector.model import CLASSES, INPUT_SIZE, SteganoDetector, TriToolSteganoDetector
+
+
+@pytest.fixture(scope='module')
+def detector():
+    torch.manual_seed(0)
+    return SteganoDetector()
+
+
+def test_model_outputs_one_logit_per_class():
+    model = TriToolSteganoDetector().eval()
+    with torch.no_grad():
+        out = model(torch.zeros(2, 3, INPUT_SIZE, INPUT_SIZE))
+    assert out.shape == (2, len(CLASSES))
+
+
+def test_detect_many_matches_detect_in_order(detector):
+    rng = np.random.default_rng(0)
+    images = [rng.integers(0, 256, (40 + 8 * i, 48, 3), dtype=np.uint8) for i in range(7)]
+    images.insert(3, b'not an image')
+    results = list(detector.detect_many(images, batch_size=3, workers=2))
+    assert len(results) == len(images)
+    assert 'error' in results[3]
+    for image, result in zip(images, results):
+        if isinstance(image, bytes):
+            continue
+        single = detector.detect(image)
+        assert result['prediction'] == single['prediction']
+        for name in CLASSES:
+            assert result['probabilities'][name] == pytest.approx(single['probabilities'][name], abs=1e-5)
+
+
+def test_detect_many_is_lazy(detector):
+    consumed = []
+    
+    def images():
+        for i in range(1000):
+            consumed.append(i)
+            yield np.full((32, 32, 3), i % 256, dtype=np.uint8)
+    
+    results = detector.detect_many(images(), batch_size=2, workers=1)
+    first = [next(results) for _ in range(3)]
+    results.close()
+    assert all('prediction' in r for r in first)
+    # Only the batches yielded so far plus two prepared ahead are drawn
+    assert len(consumed) <= 4 * 2
@@ -0,0 +1,61 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+import pytest
+
+from stego_tools.dwt import core
+from stego_tools.dwt.core import DWTSteganography
+
+
+@pytest.fixture
+def covers(tmp_path):
+    rng = np.random.default_rng(3)
+    paths = []
+    for i in range(4):
+        img = cv2.GaussianBlur(rng.integers(0, 256, (96 + 16 * i, 128, 3), dtype=np.uint8), (5, 5), 0)
+        path = str(tmp_path / f'cover{i}.png')
+        cv2.imwrite(path, img)
+        paths.append(path)
+    with core._decompositions_lock:
+        core._decompositions.clear()
+    yield paths
+    with core._decompositions_lock:
+        core._decompositions.clear()
+
+
+def test_encode_decodes_the_cover_once(covers, tmp_path, monkeypatch):
+    reads = []
+    imread = cv2.imread
+    monkeypatch.setattr(core.cv2, 'imread', lambda *a: reads.append(a[0]) or imread(*a))
+    out = str(tmp_path / 'stego.png')
+    assert DWTSteganography.encode(covers[0], 'once', out)
+    assert reads == [covers[0]]
+    assert DWTSteganography.decode(out) == 'once'
+
+
+def test_cache_is_bounded_by_bytes(covers, monkeypatch):
+    one = DWTSteganography._decompose(covers[0], 'haar', 2)[0]
+    size = sum(b.nbytes for b in [one[0]] + [b for bands in one[1:] for b in bands])
+    monkeypatch.setattr(core, 'DECOMPOSITION_CACHE_BYTES', 2 * size)
+    for path in covers:
+        DWTSteganography._decompose(path, 'haar', 2)
+    assert sum(n for _, n in core._decompositions.values()) <= 2 * size
+    assert 0 < len(core._decompositions) < len(covers)
+    # The most recently used image is still cached
+    assert DWTSteganography._decompose(covers[-1], 'haar', 2) is \
+        DWTSteganography._decompose(covers[-1], 'haar', 2)
+
+
+def test_concurrent_decodes(covers, tmp_path, monkeypatch):
+    monkeypatch.setattr(core, 'DECOMPOSITION_CACHE_BYTES', 64 << 10)
+    stegos = {}
+    for i, path in enumerate(covers):
+        out = str(tmp_path / f'stego{i}.png')
+        assert DWTSteganography.encode(path, f'message {i}', out, level=2)
+        stegos[out] = f'message {i}'
+    jobs = list(stegos) * 10
+    with ThreadPoolExecutor(8) as pool:
+        decoded = list(pool.map(lambda p: DWTSteganography.decode(p, level=2), jobs))
+    assert decoded == [stegos[p] for p in jobs]
+    assert sum(n for _, n in core._decompositions.values()) <= 64 << 10
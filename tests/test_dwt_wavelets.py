@@ -0,0 +1,47 @@
+import numpy as np
+import cv2
+import pytest
+from stego_tools.dwt.core import DWTSteganography, SUPPORTED_WAVELETS
+
+pywt = pytest.importorskip('pywt')
+
+MESSAGES = ['hello world', 'x' * 600]
+
+@pytest.fixture(scope='module')
+def cover():
+    rng = np.random.default_rng(0)
+    noise = rng.integers(0, 256, (203, 311, 3), dtype=np.uint8)
+    return cv2.GaussianBlur(noise, (5, 5), 0)
+
+@pytest.mark.parametrize('wavelet', SUPPORTED_WAVELETS)
+@pytest.mark.parametrize('level', [1, 2, 3])
+@pytest.mark.parametrize('message', MESSAGES)
+def test_supported_wavelets_round_trip(cover, wavelet, level, message):
+    stego = DWTSteganography.embed(cover, message, wavelet, level)
+    assert DWTSteganography.extract(stego, wavelet, level) == message
+
+@pytest.mark.parametrize('wavelet', ['db2', 'sym4', 'bior2.2', 'coif1'])
+@pytest.mark.parametrize('level', [1, 2, 3])
+def test_long_filter_wavelets_are_rejected(cover, tmp_path, wavelet, level):
+    with pytest.raises(ValueError, match='Unsupported wavelet'):
+        DWTSteganography.embed(cover, MESSAGES[0], wavelet, level)
+    with pytest.raises(ValueError, match='Unsupported wavelet'):
+        DWTSteganography.extract(cover, wavelet, level)
+    
+    cover_path, stego_path = str(tmp_path / 'cover.png'), str(tmp_path / 'stego.png')
+    cv2.imwrite(cover_path, cover)
+    with pytest.raises(ValueError, match='Unsupported wavelet'):
+        DWTSteganography.get_capacity(cover_path, wavelet, level)
+    # encode reports failure instead of writing an undecodable image
+    assert DWTSteganography.encode(cover_path, MESSAGES[0], stego_path, wavelet, level) is False
+    assert not (tmp_path / 'stego.png').exists()
+
+@pytest.mark.parametrize('wavelet', SUPPORTED_WAVELETS)
+@pytest.mark.parametrize('level', [1, 2, 3])
+def test_capacity_is_usable(cover, tmp_path, wavelet, level):
+    cover_path = str(tmp_path / 'cover.png')
+    cv2.imwrite(cover_path, cover)
+    capacity = DWTSteganography.get_capacity(cover_path, wavelet, level)
+    message = 'q' * capacity
+    stego = DWTSteganography.embed(cover, message, wavelet, level)
+    assert DWTSteganography.extract(stego, wavelet, level) == message
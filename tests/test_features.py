@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+
+from detector.features import FeatureExtractor
+
+
+@pytest.mark.parametrize('shape', [(1, 40), (40, 1), (1, 1)])
+def test_lsb_features_on_single_row_or_column(shape):
+    img = np.random.default_rng(0).integers(0, 256, shape, dtype=np.uint8)
+    feats = FeatureExtractor.extract_all_features(img, ('lsb',))
+    assert feats.shape == (4,)
+    assert np.all(np.isfinite(feats))
+
+
+def test_correlation_of_empty_arrays_is_nan():
+    empty = np.zeros((0, 5), dtype=np.uint8)
+    assert np.isnan(FeatureExtractor.correlation(empty, empty))
+
+
+def _reference_dct_features(img):
+    """The per-block scipy dct(dct(...)) loop the vectorized path replaced"""
+    from scipy import stats
+    from scipy.fftpack import dct
+    mid = []
+    for i in range(0, img.shape[0] - 7, 8):
+        for j in range(0, img.shape[1] - 7, 8):
+            block = img[i:i+8, j:j+8].astype(np.float64)
+            d = dct(dct(block.T, norm='ortho').T, norm='ortho')
+            mid.extend([d[3, 4], d[4, 3], d[4, 4]])
+    return np.nan_to_num([np.mean(mid), np.std(mid), stats.skew(mid), stats.kurtosis(mid)])
+
+
+@pytest.mark.parametrize('fill', [None, 0, 37, 128, 255])
+def test_dct_features_match_scalar_reference(fill):
+    rng = np.random.default_rng(1)
+    if fill is None:
+        img = rng.integers(0, 256, (75, 133), dtype=np.uint8)
+    else:
+        img = np.full((75, 133), fill, dtype=np.uint8)
+    got = FeatureExtractor.dct_features(img)
+    np.testing.assert_allclose(got, _reference_dct_features(img), rtol=1e-6, atol=1e-9)
+    if fill is not None:
+        assert np.array_equal(got, np.zeros(4))
@@ -0,0 +1,78 @@
+import io
+
+import cv2
+import numpy as np
+import pytest
+from PIL import Image
+
+import models.tri_tool_minimal as tri
+
+SIZES = [(77, 123), (128, 96), (1, 301)]
+
+
+def _rgb(h, w, seed=0):
+    return np.random.default_rng(seed).integers(0, 256, (h, w, 3), dtype=np.uint8)
+
+
+def _pil(fmt, mode='RGB', **kw):
+    def write(arr):
+        img = Image.fromarray(arr)
+        if mode != 'RGB':
+            img = img.convert(mode)
+        buf = io.BytesIO()
+        img.save(buf, fmt, **kw)
+        return buf.getvalue()
+    return write
+
+
+def _cv(ext, *params):
+    return lambda arr: cv2.imencode(ext, arr[:, :, ::-1], list(params))[1].tobytes()
+
+
+def _pnm_with_comment(arr):
+    h, w = arr.shape[:2]
+    return b'P6\n# written by hand\n%d  %d\n# another\n255\n' % (w, h) + arr.tobytes()
+
+
+FORMATS = {
+    'png': _pil('PNG'),
+    'png_gray': _pil('PNG', 'L'),
+    'bmp': _pil('BMP'),
+    'bmp_cv': _cv('.bmp'),
+    'tiff': _pil('TIFF'),
+    'tiff_lzw': _pil('TIFF', compression='tiff_lzw'),
+    'tiff_cv': _cv('.tiff'),
+    'webp_lossy': _pil('WEBP', quality=80),
+    'webp_lossless': _pil('WEBP', lossless=True),
+    'webp_alpha': _pil('WEBP', 'RGBA', quality=80),
+    'webp_alpha_lossless': _pil('WEBP', 'RGBA', lossless=True),
+    'jpeg': _pil('JPEG', quality=90),
+    'jpeg_exif': _pil('JPEG', quality=90, exif=Image.Exif()),
+    'jpeg_progressive': _pil('JPEG', quality=90, progressive=True),
+    'jpeg_cv': _cv('.jpg'),
+    'ppm': _pil('PPM'),
+    'pgm': _pil('PPM', 'L'),
+    'pnm_comment': _pnm_with_comment,
+    'gif': _pil('GIF', 'P'),
+}
+
+
+@pytest.mark.parametrize('name', list(FORMATS))
+@pytest.mark.parametrize('shape', SIZES)
+def test_header_size_matches_decoded_shape(name, shape, tmp_path):
+    data = FORMATS[name](_rgb(*shape))
+    with Image.open(io.BytesIO(data)) as img:
+        decoded = img.size[::-1]
+    assert decoded == shape
+    # Read from the header alone, without the decode fallback
+    assert tri.header_size(io.BytesIO(data)) == shape
+    path = tmp_path / ('image.' + name.split('_')[0])
+    path.write_bytes(data)
+    assert tri.image_size(str(path)) == shape
+    if cv2.haveImageReader(str(path)):
+        assert cv2.imread(str(path)).shape[:2] == shape
+
+
+def test_unknown_header_falls_back_to_none():
+    assert tri.header_size(io.BytesIO(b'not an image at all' * 4)) is None
+    assert tri.header_size(io.BytesIO(b'\xff\xd8\xff\xd9')) is None
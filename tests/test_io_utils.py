@@ -0,0 +1,41 @@
+import cv2
+import numpy as np
+import pytest
+
+from stego_tools.dct.core import DCTSteganography
+from stego_tools.dwt.core import DWTSteganography
+from stego_tools.lsb.core import LSBSteganography
+from stego_tools.utils.io_utils import IOUtils
+
+@pytest.fixture(scope='module')
+def gray():
+    noise = np.random.default_rng(0).integers(0, 256, (96, 128), dtype=np.uint8)
+    return cv2.GaussianBlur(noise, (5, 5), 0)
+
+def test_arrays_are_converted_to_match_flags(gray):
+    bgr = IOUtils.decode_image(gray)
+    assert bgr.shape == gray.shape + (3,)
+    assert np.array_equal(bgr, cv2.cvtColor(gray, cv2.COLOR_GRAY2BGR))
+    bgra = cv2.cvtColor(bgr, cv2.COLOR_BGR2BGRA)
+    assert np.array_equal(IOUtils.decode_image(bgra), bgr)
+    assert np.array_equal(IOUtils.decode_image(bgr, cv2.IMREAD_GRAYSCALE), gray)
+    assert IOUtils.decode_image(gray, cv2.IMREAD_GRAYSCALE) is gray
+    assert IOUtils.decode_image(bgra, cv2.IMREAD_UNCHANGED) is bgra
+
+# The DCT scheme only reads back reliably at full strength
+@pytest.mark.parametrize('steg, kwargs', [(DCTSteganography, {'quality': 1.0}),
+                                          (DWTSteganography, {}), (LSBSteganography, {})])
+def test_encode_bytes_accepts_gray_arrays(gray, steg, kwargs):
+    before = gray.copy()
+    stego = steg.encode_bytes(gray, 'from a gray array', **kwargs)
+    assert stego is not None
+    assert np.array_equal(gray, before)
+    assert steg.decode_bytes(stego, **kwargs) == 'from a gray array'
+
+@pytest.mark.parametrize('steg', [DCTSteganography, DWTSteganography])
+def test_gray_array_matches_path_api(gray, steg, tmp_path):
+    cover, out = str(tmp_path / 'gray.png'), str(tmp_path / 'stego.png')
+    cv2.imwrite(cover, gray)
+    assert steg.encode(cover, 'same', out)
+    assert cv2.imdecode(np.frombuffer(steg.encode_bytes(gray, 'same'), np.uint8), cv2.IMREAD_UNCHANGED).tobytes() \
+        == cv2.imread(out, cv2.IMREAD_UNCHANGED).tobytes()
@@ -0,0 +1,54 @@
+import cv2
+import numpy as np
+import pytest
+
+import models.tri_tool_minimal as tri
+
+
+@pytest.fixture(scope="module")
+def stego():
+    rng = np.random.default_rng(0)
+    cover = cv2.GaussianBlur(rng.integers(0, 256, (64, 96, 3), dtype=np.uint8), (3, 3), 0)
+    ok, enc = cv2.imencode(".jpg", cover, [cv2.IMWRITE_JPEG_QUALITY, 90])
+    return tri.jpeg_hide_bytes(enc.tobytes(), "payload in a jpeg")
+
+
+def _damaged(stego):
+    _, scan, _ = tri.jpeg_segments(stego)
+    scan_start = len(stego) - len(scan) - 2
+    # Scans cut short (with and without an end marker), through the headers too
+    for n in range(2, len(stego) - 2, len(stego) // 60):
+        yield stego[:n] + b"\xff\xd9"
+        yield stego[:n]
+    rng = np.random.default_rng(1)
+    for _ in range(150):
+        data = bytearray(stego)
+        for _ in range(rng.integers(1, 5)):
+            data[rng.integers(scan_start, len(data) - 2)] = rng.integers(0, 256)
+        yield bytes(data)
+    for _ in range(60):
+        data = bytearray(stego)
+        data[rng.integers(2, scan_start)] = rng.integers(0, 256)
+        yield bytes(data)
+
+
+def test_damaged_jpegs_raise_value_error(stego):
+    for data in _damaged(stego):
+        assert tri.jpeg_capacity_bytes(data) >= 0
+        try:
+            tri.jpeg_parse(data)
+            tri.reveal_image("JPEG", data)
+        except ValueError:
+            pass
+
+
+def test_truncated_scan_probe_and_try_decode(stego, tmp_path):
+    _, scan, _ = tri.jpeg_segments(stego)
+    path = str(tmp_path / "truncated.jpg")
+    with open(path, "wb") as f:
+        f.write(stego[:len(stego) - len(scan) // 2] + b"\xff\xd9")
+    with pytest.raises(ValueError):
+        tri.jpeg_read(path)
+    with pytest.raises(ValueError):
+        tri.jpeg_probe(tri.path_sources(path))
+    assert tri.jpeg_capacity_bytes(path) == 0
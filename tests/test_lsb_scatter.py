@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+
+import models.tri_tool_minimal as tri
+from stego_tools.lsb.core import LSBSteganography, SCATTER_BATCH
+
+# Domains just above a power of 4 make the Feistel domain ~4x too large, so
+# most values cycle-walk; the last ones span several SCATTER_BATCH batches
+SIZES = [1, 2, 3, 5, 16, 17, 4**5 + 1, 4**8 + 1, 4**9 + 3, 3 * SCATTER_BATCH + 11]
+
+@pytest.mark.parametrize('n', SIZES)
+def test_keyed_positions_are_a_permutation(n):
+    pos = LSBSteganography._positions(n, 0, n, 'secret')
+    assert pos.dtype == np.int64 and pos.size == n
+    assert np.array_equal(np.sort(pos), np.arange(n))
+    # The tri-tool copy computes the same permutation
+    assert np.array_equal(tri.scatter_positions(n, 0, n, 'secret'), pos)
+
+@pytest.mark.parametrize('n', [4**9 + 3, 3 * SCATTER_BATCH + 11])
+def test_keyed_positions_are_consistent_across_ranges(n):
+    full = LSBSteganography._positions(n, 0, n, 'k')
+    cuts = [0, 5, SCATTER_BATCH - 1, SCATTER_BATCH + 7, 2 * SCATTER_BATCH + 3, n]
+    parts = [LSBSteganography._positions(n, a, b, 'k') for a, b in zip(cuts, cuts[1:])]
+    assert np.array_equal(np.concatenate(parts), full)
+    assert not np.array_equal(LSBSteganography._positions(n, 0, 64, 'other'), full[:64])
+
+@pytest.fixture(scope='module')
+def cover():
+    return np.random.default_rng(0).integers(0, 256, (97, 131, 3), dtype=np.uint8)
+
+def _reveals(extract, message):
+    try:
+        return extract() == message
+    except ValueError:
+        return False
+
+@pytest.mark.parametrize('bits', [1, 2, 3, 4])
+def test_keyed_round_trip(cover, bits):
+    message = 'scattered payload ' * 30
+    stego = LSBSteganography.embed(cover, message, bits, key='secret')
+    assert LSBSteganography.extract(stego, key='secret') == message
+    assert not _reveals(lambda: LSBSteganography.extract(stego, key='wrong'), message)
+    assert not _reveals(lambda: LSBSteganography.extract(stego), message)
+    stego = tri.lsb_hide_array(cover, message, bits_per_channel=bits, key='secret')
+    assert tri.lsb_reveal_array(stego, key='secret') == message
+    assert not _reveals(lambda: tri.lsb_reveal_array(stego, key='wrong'), message)
+
+def test_keyed_round_trip_at_capacity(cover):
+    capacity = tri.lsb_capacity_for(*cover.shape[:2])
+    message = 'x' * capacity
+    stego = tri.lsb_hide_array(cover, message, key='full')
+    assert tri.lsb_reveal_array(stego, key='full') == message
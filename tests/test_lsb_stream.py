@@ -0,0 +1,115 @@
+import os
+import struct
+
+import cv2
+import numpy as np
+import pytest
+from PIL import Image
+
+import models.tri_tool_minimal as tri
+
+MESSAGE = 'streamed through mmap ' * 8
+
+
+def _bmp(path, img, bpp, top_down=False):
+    """Uncompressed (BI_RGB) BMP written by hand, bottom-up unless top_down"""
+    h, w = img.shape[:2]
+    stride = ((w * bpp + 31) // 32) * 4
+    rows = np.zeros((h, stride), np.uint8)
+    px = img if bpp == 24 else np.dstack([img, np.full((h, w), 255, np.uint8)])
+    rows[:, :w * bpp // 8] = px.reshape(h, -1)
+    if not top_down:
+        rows = rows[::-1]
+    size = 54 + rows.size
+    with open(path, 'wb') as f:
+        f.write(b'BM' + struct.pack('<IHHI', size, 0, 0, 54))
+        f.write(struct.pack('<IiiHHIIiiII', 40, w, -h if top_down else h, 1, bpp, 0, rows.size, 2835, 2835, 0, 0))
+        f.write(rows.tobytes())
+
+
+@pytest.fixture(scope='module')
+def covers(tmp_path_factory):
+    root = tmp_path_factory.mktemp('raw')
+    img = np.random.default_rng(0).integers(0, 256, (301, 203, 3), dtype=np.uint8)
+    rgb = Image.fromarray(img[:, :, ::-1])
+    paths = {}
+    def add(name, write):
+        paths[name] = str(root / name)
+        write(paths[name])
+    add('bmp24.bmp', lambda p: _bmp(p, img, 24))
+    add('bmp32.bmp', lambda p: _bmp(p, img, 32))
+    add('topdown.bmp', lambda p: _bmp(p, img, 24, top_down=True))
+    add('opencv.bmp', lambda p: cv2.imwrite(p, img))
+    add('opencv.ppm', lambda p: cv2.imwrite(p, img))
+    add('pil.ppm', rgb.save)
+    add('opencv.tif', lambda p: cv2.imwrite(p, img, [cv2.IMWRITE_TIFF_COMPRESSION, 1]))
+    add('pil.tif', rgb.save)
+    add('pil_strips.tiff', lambda p: rgb.save(p, tiffinfo={278: 16}))
+    return img, paths
+
+
+def test_layouts_map_every_pixel_byte(covers):
+    img, paths = covers
+    for name, path in paths.items():
+        assert tri.lsb_streamable(path), name
+        assert np.array_equal(cv2.imread(path), img), name
+        layout = tri.raw_pixel_layout(path)
+        total = layout[0].size * layout[1] * 3
+        raw = np.fromfile(path, np.uint8)
+        assert np.array_equal(raw[tri.raw_offsets(layout, np.arange(total))], img.ravel()), name
+
+
+@pytest.mark.parametrize('key', [None, 'secret'])
+@pytest.mark.parametrize('bits', [1, 3])
+def test_lsb_hide_streams_uncompressed_covers(covers, tmp_path, monkeypatch, key, bits):
+    img, paths = covers
+    expected = tri.lsb_hide_array(img, MESSAGE, bits_per_channel=bits, key=key)
+    # Streamed covers must never be decoded
+    monkeypatch.setattr(tri, 'load_bgr', lambda p: pytest.fail(f'decoded {p}'))
+    for name, path in paths.items():
+        out = str(tmp_path / ('stego_' + name))
+        tri.lsb_hide(path, out, MESSAGE, bits_per_channel=bits, key=key)
+        assert os.path.getsize(out) == os.path.getsize(path)
+        assert np.array_equal(cv2.imread(out), expected), name
+        assert tri.lsb_reveal(out, key=key) == MESSAGE
+    monkeypatch.undo()
+    for name in paths:
+        assert tri.lsb_reveal_array(tri.load_bgr(str(tmp_path / ('stego_' + name))), key=key) == MESSAGE
+
+
+def test_other_outputs_and_formats_are_decoded(covers, tmp_path):
+    img, paths = covers
+    png = str(tmp_path / 'cover.png')
+    cv2.imwrite(png, img)
+    bgra = str(tmp_path / 'bgra.bmp')
+    cv2.imwrite(bgra, cv2.cvtColor(img, cv2.COLOR_BGR2BGRA))
+    assert not tri.lsb_streamable(png)
+    assert not tri.lsb_streamable(paths['bmp24.bmp'], str(tmp_path / 'x.png'))
+    assert tri.lsb_streamable(paths['pil.tif'], str(tmp_path / 'x.tiff'))
+    for cover in (png, paths['bmp24.bmp']):
+        out = str(tmp_path / 'out.png')
+        tri.lsb_hide(cover, out, MESSAGE)
+        assert np.array_equal(cv2.imread(out), tri.lsb_hide_array(img, MESSAGE))
+    out = str(tmp_path / 'out_bgra.bmp')
+    tri.hide('LSB', bgra, out, MESSAGE)
+    assert tri.reveal('LSB', out) == MESSAGE
+
+
+def test_hide_in_place(covers, tmp_path):
+    img, paths = covers
+    path = str(tmp_path / 'inplace.bmp')
+    _bmp(path, img, 24)
+    tri.lsb_hide_mmap(path, None, MESSAGE)
+    assert tri.try_decode_all(path) == ('LSB', MESSAGE)
+
+
+def test_batch_stream_keeps_cover_format(covers, tmp_path):
+    img, paths = covers
+    results = tmp_path / 'results.jsonl'
+    assert tri.batch_main(['encode', paths['bmp24.bmp'], paths['opencv.tif'], '--tech', 'LSB',
+                           '--message', MESSAGE, '--stream', '--out-dir', str(tmp_path / 'out'),
+                           '--results', str(results), '--workers', '1']) == 0
+    outputs = sorted(os.listdir(tmp_path / 'out'))
+    assert outputs == ['bmp24_stego.bmp', 'opencv_stego.tif']
+    for name in outputs:
+        assert tri.lsb_reveal(str(tmp_path / 'out' / name)) == MESSAGE
@@ -0,0 +1,86 @@
+import tracemalloc
+
+import numpy as np
+import pytest
+
+import models.tri_tool_minimal as tri
+from stego_tools.dct.core import DCTSteganography, DELIMITER_BITS
+from stego_tools.lsb.core import LSBSteganography, SCATTER_BATCH
+from stego_tools.utils.buffers import BufferUtils
+
+# Fixed allowance on top of each documented bound (interpreter and numpy
+# bookkeeping, small per-call arrays)
+SLACK = 64 << 10
+H, W = 1024, 1536
+MESSAGE = 'peak memory ' * 40
+
+
+@pytest.fixture(scope='module')
+def cover():
+    return np.random.default_rng(0).integers(0, 256, (H, W, 3), dtype=np.uint8)
+
+
+def extra_peak(embed):
+    """Peak bytes allocated by embed(), starting from empty scratch buffers"""
+    tri.clear_scratch()
+    BufferUtils.clear_scratch()
+    tracemalloc.start()
+    try:
+        embed()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def keyed_bound(carriers):
+    return 8 * carriers + 64 * min(carriers, SCATTER_BATCH)
+
+
+@pytest.mark.parametrize('key', [None, 'secret'])
+def test_tri_tool_lsb_hide_array(cover, key):
+    out = np.empty_like(cover)
+    carriers = tri.HEADER_BITS + len(MESSAGE) * 8
+    bound = len(MESSAGE) * 8 + (keyed_bound(carriers) if key else 0)
+    assert extra_peak(lambda: tri.lsb_hide_array(cover, MESSAGE, key=key, out=out)) < bound + SLACK
+
+
+def test_tri_tool_dct_hide_array(cover):
+    out = np.empty_like(cover)
+    needed = (len(MESSAGE) + len(tri.MAGIC_DCT) + 4) * 8
+    nblocks = -(-needed // len(tri.COEFF_POSITIONS))
+    block_rows = -(-nblocks // (W // 8))
+    bound = 7 * 8 * W * block_rows + nblocks * 3 * 64 * 8
+    assert 7 * 8 * W * block_rows < cover.nbytes // 4
+    assert extra_peak(lambda: tri.dct_hide_array(cover, MESSAGE, out=out)) < bound + SLACK
+
+
+def test_tri_tool_dwt_hide_array(cover):
+    if tri.WAVELET != 'haar':
+        pytest.skip('the strip bound only holds for the built-in Haar')
+    gray = np.ascontiguousarray(cover[:, :, 0])
+    out = np.empty_like(gray)
+    needed = (len(MESSAGE) + len(tri.MAGIC_DWT) + 4) * 8
+    wc = (W + 1) // 2
+    strip_rows = 2 * -(-min(needed, (H + 1) // 2 * wc) // wc)
+    bound = 16 * W * strip_rows
+    assert extra_peak(lambda: tri.dwt_hide_array(gray, MESSAGE, out=out)) < bound + SLACK
+
+
+@pytest.mark.parametrize('key', [None, 'secret'])
+def test_lsb_embed(cover, key):
+    out = np.empty_like(cover)
+    carriers = (len(MESSAGE) + 8) * 8
+    bound = len(MESSAGE) * 8 + (keyed_bound(carriers) if key else 0)
+    assert extra_peak(lambda: LSBSteganography.embed(cover, MESSAGE, key=key, out=out)) < bound + SLACK
+
+
+def test_dct_embed(cover):
+    # One bit per block: keep the payload rows a small part of the image
+    message = MESSAGE[:120]
+    out = np.empty_like(cover)
+    nblocks = len(message) * 8 + len(DELIMITER_BITS)
+    rows = -(-nblocks // (W // 8)) * 8
+    # 7 bytes per payload-row pixel, plus a few float64 copies of the blocks
+    bound = 7 * rows * W + 4 * 512 * nblocks
+    assert 7 * rows * W < cover.nbytes // 4
+    assert extra_peak(lambda: DCTSteganography.embed(cover, message, out=out)) < bound + SLACK
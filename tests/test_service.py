@@ -0,0 +1,89 @@
+import base64
+import http.client
+import json
+import socket
+import threading
+
+import cv2
+import numpy as np
+import pytest
+
+import models.tri_tool_minimal as tri
+
+
+@pytest.fixture
+def service():
+    srv = tri.StegoService(("127.0.0.1", 0), workers=1, queue=1)
+    thread = threading.Thread(target=srv.serve_forever, daemon=True)
+    thread.start()
+    yield srv
+    srv.shutdown()
+    srv.server_close()
+    thread.join(5)
+
+
+@pytest.fixture(scope="module")
+def cover():
+    rng = np.random.default_rng(0)
+    img = cv2.GaussianBlur(rng.integers(0, 256, (96, 128, 3), dtype=np.uint8), (5, 5), 0)
+    return cv2.imencode(".png", img)[1].tobytes()
+
+
+def _post(srv, path, body, content_type="application/octet-stream"):
+    conn = http.client.HTTPConnection(*srv.server_address, timeout=30)
+    try:
+        conn.request("POST", path, body, {"Content-Type": content_type})
+        resp = conn.getresponse()
+        return resp.status, dict(resp.getheaders()), resp.read()
+    finally:
+        conn.close()
+
+
+@pytest.mark.parametrize("tech,key", [("LSB", None), ("LSB", "k3y"), ("DWT", None)])
+def test_encode_decode_round_trip(service, cover, tech, key):
+    if tech == "DWT" and not tri.HAS_DWT:
+        pytest.skip("pywt not installed")
+    query = f"tech={tech}&message=hello+service" + (f"&key={key}" if key else "")
+    status, headers, stego = _post(service, "/encode?" + query, cover)
+    assert status == 200 and headers["Content-Type"] == "image/png"
+    status, _, body = _post(service, "/decode?" + query, stego)
+    assert status == 200
+    assert json.loads(body) == {"tech": tech, "message": "hello service"}
+
+
+def test_json_body_round_trip(service, cover):
+    payload = json.dumps({"image": base64.b64encode(cover).decode(), "tech": "LSB", "message": "json"})
+    status, _, stego = _post(service, "/encode", payload, "application/json")
+    assert status == 200
+    status, _, body = _post(service, "/decode", stego)
+    assert status == 200 and json.loads(body)["message"] == "json"
+
+
+@pytest.mark.parametrize("path,body", [
+    ("/decode?tech=LSB", b"not an image"),
+    ("/encode?tech=LSB&format=gif", b"ignored"),
+])
+def test_bad_input_is_422(service, path, body):
+    status, _, out = _post(service, path, body)
+    assert status == 422
+    assert "error" in json.loads(out)
+
+
+def test_saturated_service_rejects_before_reading_body(service, cover):
+    held = 0
+    while service.slots.acquire(blocking=False):
+        held += 1
+    assert held == service.capacity
+    try:
+        # Promise a body that never arrives: the 429 must come from the headers alone.
+        with socket.create_connection(service.server_address, timeout=5) as sock:
+            sock.sendall(b"POST /decode HTTP/1.1\r\nHost: x\r\nContent-Length: 1000000\r\n\r\n")
+            reply = sock.makefile("rb").readline()
+        assert reply.split()[1] == b"429"
+        status, headers, _ = _post(service, "/decode", cover)
+        assert status == 429 and headers["Retry-After"] == "1"
+    finally:
+        for _ in range(held):
+            service.slots.release()
+    status, _, _ = _post(service, "/capacity", cover)
+    assert status == 200
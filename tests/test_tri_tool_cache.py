@@ -0,0 +1,63 @@
+import random
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+import pytest
+
+import models.tri_tool_minimal as tri
+
+
+@pytest.fixture
+def images(tmp_path):
+    rng = np.random.default_rng(0)
+    paths = []
+    for i in range(6):
+        path = str(tmp_path / f"img{i}.png")
+        cv2.imwrite(path, rng.integers(0, 256, (64 + 8 * i, 96, 3), dtype=np.uint8))
+        paths.append(path)
+    tri.clear_image_cache()
+    yield paths
+    tri.clear_image_cache()
+
+
+def test_concurrent_access_keeps_cache_consistent(images, monkeypatch):
+    # Room for a few planes only, so threads constantly insert and evict
+    monkeypatch.setattr(tri, "IMAGE_CACHE_BYTES", 3 * 64 * 96 * 3)
+    expected = {p: (cv2.imread(p), cv2.cvtColor(cv2.imread(p), cv2.COLOR_BGR2YCrCb)[:, :, 0]) for p in images}
+
+    def worker(seed):
+        rnd = random.Random(seed)
+        for _ in range(200):
+            path = rnd.choice(images)
+            action = rnd.random()
+            if action < 0.45:
+                assert np.array_equal(tri.load_bgr(path), expected[path][0])
+            elif action < 0.9:
+                assert np.array_equal(tri.load_y(path), expected[path][1])
+            elif action < 0.97:
+                tri.forget_image(path)
+            else:
+                tri.image_cache_info()
+
+    with ThreadPoolExecutor(8) as pool:
+        list(pool.map(worker, range(8)))
+
+    info = tri.image_cache_info()
+    assert info["bytes"] <= tri.IMAGE_CACHE_BYTES
+    assert info["bytes"] == sum(a.nbytes for a in tri._IMAGE_CACHE.values())
+
+
+def test_cached_planes_own_their_memory(images):
+    # nbytes is what the budget counts, so no entry may be a view of a larger array
+    for load in (tri.load_bgr, tri.imread_gray, tri.load_y, tri.probe_gray):
+        load(images[0])
+    assert len(tri._IMAGE_CACHE) >= 3
+    for arr in tri._IMAGE_CACHE.values():
+        assert arr.base is None
+
+
+def test_cached_planes_are_read_only(images):
+    arr = tri.load_bgr(images[0])
+    assert tri.load_bgr(images[0]) is arr
+    assert not arr.flags.writeable
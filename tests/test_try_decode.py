@@ -0,0 +1,62 @@
+import cv2
+import numpy as np
+import pytest
+
+import models.tri_tool_minimal as tri
+
+CASES = [("LSB", None), ("LSB", "secret"), ("DCT", None), ("DWT", None), ("JPEG", None)]
+
+
+@pytest.fixture(scope="module")
+def stegos(tmp_path_factory):
+    root = tmp_path_factory.mktemp("stego")
+    rng = np.random.default_rng(0)
+    cover = cv2.GaussianBlur(rng.integers(0, 256, (160, 240, 3), dtype=np.uint8), (5, 5), 0)
+    png, jpg = str(root / "cover.png"), str(root / "cover.jpg")
+    cv2.imwrite(png, cover)
+    cv2.imwrite(jpg, cover, [cv2.IMWRITE_JPEG_QUALITY, 90])
+    paths = {"clean": (png, None)}
+    for tech, key in CASES:
+        if tech == "DWT" and not tri.HAS_DWT:
+            continue
+        out = str(root / f"{tech}_{key}.{'jpg' if tech == 'JPEG' else 'png'}")
+        tri.hide(tech, jpg if tech == "JPEG" else png, out, f"message via {tech}", key=key)
+        paths[(tech, key)] = (out, key)
+    return paths
+
+
+def _outcome(path, key, workers):
+    tri.clear_image_cache()
+    try:
+        return tri.try_decode_all(path, key=key, workers=workers)
+    except RuntimeError as e:
+        return "error", str(e).split("\n")[0]
+
+
+def test_parallel_probes_match_serial(stegos):
+    for case, (path, key) in stegos.items():
+        serial = _outcome(path, key, 0)
+        if case != "clean":
+            assert serial == (case[0], f"message via {case[0]}")
+        for _ in range(3):
+            assert _outcome(path, key, 4) == serial
+
+
+def _image_outcome(image, key, workers):
+    try:
+        return tri.try_decode_image(image, key=key, workers=workers)
+    except RuntimeError as e:
+        return "error", str(e).split("\n")[0]
+
+
+def test_in_memory_auto_detect_matches_path(stegos):
+    for case, (path, key) in stegos.items():
+        expected = _outcome(path, key, 0)
+        with open(path, "rb") as f:
+            data = f.read()
+        assert _image_outcome(data, key, 0) == expected
+        assert _image_outcome(data, key, 4) == expected
+        if case == "clean" or case[0] != "JPEG":
+            # Pixels alone cannot carry the JPEG technique
+            assert _image_outcome(cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_UNCHANGED),
+                                  key, 0) == expected